@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the analysis stages: four-call fan-out vs single pass.
+
+For each paper the contributions are summarised once, then the method,
+results and limitations analysis is run both ways against the live API:
+
+    fan_out      method, results and limitations as three concurrent
+                 requests, as generate_podcast_script_async does
+    single_pass  one structured request (paper_analysis.analyze_paper)
+
+The contributions request is shared by both modes and not counted. The
+response cache is bypassed for the measured calls so every run hits the
+provider. Token counts are the ones the provider reports (podcaist.usage).
+Results are written as JSON lines, one record per paper × mode × run.
+
+    python -m benchmarks.analysis_modes --model gemini-2.5-flash paper.pdf
+    python -m benchmarks.analysis_modes --model gemini-2.5-flash --runs 3 \\
+        --ablations --output analysis.jsonl a.pdf b.pdf
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+from podcaist.clients import run_closing_clients
+from podcaist.contributions import summarize_contributions_async
+from podcaist.limitations import limitations_async
+from podcaist.method import method_async
+from podcaist.paper_analysis import analyze_paper_async
+from podcaist.pdf_utils import compress_pdf_bytes_cached
+from podcaist.results import results_async
+from podcaist.usage import reset_usage, token_usage
+from podcaist.utils import read_pdf_file_bytes
+
+MODES = ("fan_out", "single_pass", "single_pass_ablations")
+
+
+async def _run_mode(mode: str, pdf, contributions: dict, model: str) -> list[str]:
+    if mode == "fan_out":
+        return list(
+            await asyncio.gather(
+                method_async(pdf, contributions, model),
+                results_async(pdf, contributions, model),
+                limitations_async(pdf, contributions, model),
+            )
+        )
+    analysis = await analyze_paper_async(
+        pdf, contributions, model, include_ablations=mode == "single_pass_ablations"
+    )
+    return list(analysis.values())
+
+
+async def run_paper(path: str, model: str, modes: list[str], runs: int) -> list[dict]:
+    pdf = compress_pdf_bytes_cached(read_pdf_file_bytes(path))
+    contributions = await summarize_contributions_async(pdf, model)
+
+    records = []
+    os.environ["PODCAIST_NO_RESPONSE_CACHE"] = "1"
+    try:
+        for run in range(runs):
+            for mode in modes:
+                reset_usage()
+                start = time.perf_counter()
+                texts = await _run_mode(mode, pdf, contributions, model)
+                wall_seconds = time.perf_counter() - start
+                usage = token_usage().get(model, {})
+                record = {
+                    "document": os.path.basename(path),
+                    "model": model,
+                    "mode": mode,
+                    "run": run,
+                    "wall_seconds": round(wall_seconds, 3),
+                    "requests": usage.get("requests", 0),
+                    "input_tokens": usage.get("input_tokens", 0),
+                    "cached_tokens": usage.get("cached_tokens", 0),
+                    "output_tokens": usage.get("output_tokens", 0),
+                    "output_chars": sum(len(text) for text in texts),
+                }
+                records.append(record)
+                print(
+                    f"{record['document']:<30} {mode:<22} {wall_seconds:>7.1f}s "
+                    f"in {record['input_tokens']:>8} out {record['output_tokens']:>7}",
+                    file=sys.stderr,
+                )
+    finally:
+        del os.environ["PODCAIST_NO_RESPONSE_CACHE"]
+    return records
+
+
+def summarize(records: list[dict]) -> None:
+    """Median per mode over all papers and runs, relative to fan_out."""
+    by_mode: dict[str, list[dict]] = {}
+    for record in records:
+        by_mode.setdefault(record["mode"], []).append(record)
+    keys = ("wall_seconds", "input_tokens", "output_tokens")
+    medians = {
+        mode: {key: statistics.median(r[key] for r in rows) for key in keys}
+        for mode, rows in by_mode.items()
+    }
+    baseline = medians.get("fan_out")
+
+    print(f"{'mode':<22} {'wall s':>8} {'input tok':>10} {'output tok':>11}  vs fan_out")
+    for mode, values in medians.items():
+        line = (
+            f"{mode:<22} {values['wall_seconds']:>8.1f} "
+            f"{values['input_tokens']:>10.0f} {values['output_tokens']:>11.0f}"
+        )
+        if baseline and mode != "fan_out":
+            line += "  " + " ".join(
+                f"{key.split('_')[0]} {100 * (values[key] - baseline[key]) / baseline[key]:+.0f}%"
+                for key in keys
+                if baseline[key]
+            )
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("pdfs", nargs="+", help="Papers to analyse")
+    parser.add_argument("--model", type=str, default="gemini-2.5-flash")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument(
+        "--ablations",
+        action="store_true",
+        help="Also run the single pass with the optional ablations field",
+    )
+    parser.add_argument("--output", type=str, default=None, help="JSON lines file")
+    args = parser.parse_args()
+
+    modes = list(MODES if args.ablations else MODES[:2])
+    records = []
+    for path in args.pdfs:
+        records += run_closing_clients(run_paper(path, args.model, modes, args.runs))
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for record in records:
+            output.write(json.dumps(record, sort_keys=True) + "\n")
+    finally:
+        if args.output:
+            output.close()
+
+    summarize(records)
+
+
+if __name__ == "__main__":
+    main()
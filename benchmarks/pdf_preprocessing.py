@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the PDF preprocessing path.
+
+Builds a synthetic corpus of papers locally with PyMuPDF and runs every
+preprocessing mode over it, each case in a fresh process so peak RSS is not
+polluted by earlier runs. Results are written as JSON lines (one record per
+document × mode, keys sorted) so runs from two commits can be diffed or
+compared with --compare.
+
+    python -m benchmarks.pdf_preprocessing --output bench.jsonl
+    python -m benchmarks.pdf_preprocessing --output new.jsonl --compare bench.jsonl
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from podcaist.pdf_text import extract_paper
+from podcaist.pdf_utils import compress_pdf, compress_pdf_bytes, compress_pdf_to_budget
+
+LOREM = (
+    "We study the problem of learning representations from large unlabeled corpora "
+    "and show that a simple objective scales favourably with model size and data. "
+)
+
+
+def _png(width: int, height: int, mode: str = "RGB", seed: int = 0) -> bytes:
+    """Noisy gradient image: compresses like a photo/plot, not like flat colour."""
+    rng = random.Random(seed)
+    noise = Image.effect_noise((width, height), 30 + rng.randint(0, 40)).convert("L")
+    gradient = Image.linear_gradient("L").resize((width, height))
+    channels = [Image.blend(noise, gradient, rng.random()) for _ in range(3)]
+    if mode == "RGBA":
+        channels.append(gradient.rotate(90).resize((width, height)))
+    buf = io.BytesIO()
+    Image.merge(mode, channels).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _text_page(doc: fitz.Document, title: str) -> fitz.Page:
+    page = doc.new_page()
+    page.insert_text((72, 60), title, fontsize=14, fontname="hebo")
+    page.insert_textbox(fitz.Rect(72, 80, 540, 760), LOREM * 12, fontsize=9)
+    return page
+
+
+def build_text_only(doc: fitz.Document, pages: int) -> None:
+    for i in range(pages):
+        _text_page(doc, f"{i + 1} Section")
+
+
+def build_many_small_images(doc: fitz.Document, pages: int) -> None:
+    for i in range(pages):
+        page = _text_page(doc, f"{i + 1} Qualitative Results")
+        for j in range(12):
+            x, y = 72 + (j % 4) * 120, 420 + (j // 4) * 110
+            page.insert_image(
+                fitz.Rect(x, y, x + 110, y + 100),
+                stream=_png(240, 220, seed=i * 100 + j),
+            )
+
+
+def build_few_huge_images(doc: fitz.Document, pages: int) -> None:
+    for i in range(pages):
+        page = _text_page(doc, f"{i + 1} Overview")
+        if i % 3 == 0:
+            page.insert_image(
+                fitz.Rect(72, 300, 540, 740), stream=_png(3000, 2400, seed=i)
+            )
+
+
+def build_shared_images(doc: fitz.Document, pages: int) -> None:
+    logo = _png(400, 120, seed=1)
+    legend = _png(900, 200, seed=2)
+    for i in range(pages):
+        page = _text_page(doc, f"{i + 1} Results")
+        page.insert_image(fitz.Rect(440, 20, 540, 50), stream=logo)
+        page.insert_image(fitz.Rect(72, 600, 540, 700), stream=legend)
+
+
+def build_rgba_figures(doc: fitz.Document, pages: int) -> None:
+    for i in range(pages):
+        page = _text_page(doc, f"{i + 1} Figures")
+        page.insert_image(
+            fitz.Rect(72, 400, 400, 700), stream=_png(1200, 1000, "RGBA", seed=i)
+        )
+
+
+def build_vector_plots(doc: fitz.Document, pages: int) -> None:
+    rng = random.Random(0)
+    for i in range(pages):
+        page = _text_page(doc, f"{i + 1} Scaling Curves")
+        shape = page.new_shape()
+        for series in range(6):
+            points = [
+                fitz.Point(80 + x * 2, 720 - series * 40 - rng.random() * 60)
+                for x in range(220)
+            ]
+            shape.draw_polyline(points)
+            shape.finish(color=(series / 6, 0.2, 1 - series / 6), width=0.6)
+            for point in points[::5]:
+                shape.draw_circle(point, 1.2)
+            shape.finish(fill=(0, 0, 0))
+        shape.commit()
+
+
+CORPUS = {
+    "text_only": build_text_only,
+    "many_small_images": build_many_small_images,
+    "few_huge_images": build_few_huge_images,
+    "shared_images": build_shared_images,
+    "rgba_figures": build_rgba_figures,
+    "vector_plots": build_vector_plots,
+}
+
+
+def build_corpus(directory: str, pages: int) -> dict[str, str]:
+    paths = {}
+    for name, build in CORPUS.items():
+        path = os.path.join(directory, f"{name}.pdf")
+        doc = fitz.open()
+        build(doc, pages)
+        doc.save(path, garbage=4, deflate=True)
+        doc.close()
+        paths[name] = path
+    return paths
+
+
+def _run_mode(mode: str, input_path: str, workers: int) -> dict:
+    """Run one preprocessing mode and return output size plus mode details."""
+    if mode == "compress_pdf":
+        output_path = input_path + ".out.pdf"
+        stats = compress_pdf(input_path, output_path)
+        size = os.path.getsize(output_path)
+        os.remove(output_path)
+        return {"output_bytes": size, **stats}
+    if mode == "compress_pdf_parallel":
+        output_path = input_path + ".out.pdf"
+        stats = compress_pdf(input_path, output_path, workers=workers)
+        size = os.path.getsize(output_path)
+        os.remove(output_path)
+        return {"output_bytes": size, "workers": workers, **stats}
+    with open(input_path, "rb") as f:
+        data = f.read()
+    if mode == "compress_pdf_bytes":
+        return {"output_bytes": len(compress_pdf_bytes(data))}
+    if mode == "compress_pdf_to_budget":
+        output, report = compress_pdf_to_budget(data, target_bytes_per_page=60_000)
+        return {
+            "output_bytes": len(output),
+            "max_dim_px": report["max_dim_px"],
+            "jpeg_quality": report["jpeg_quality"],
+            "fits": report["fits"],
+        }
+    if mode == "extract_text":
+        paper = extract_paper(data, max_figures=4)
+        return {
+            "output_bytes": len(paper.text.encode("utf-8"))
+            + sum(len(figure) for figure in paper.figures),
+            "figures": len(paper.figures),
+        }
+    raise ValueError(f"Unknown mode {mode}")
+
+
+MODES = (
+    "compress_pdf",
+    "compress_pdf_parallel",
+    "compress_pdf_bytes",
+    "compress_pdf_to_budget",
+    "extract_text",
+)
+
+
+def _peak_rss_bytes(who: int) -> int:
+    rss = resource.getrusage(who).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024  # Linux reports KiB
+
+
+def _case(queue, mode: str, input_path: str, workers: int) -> None:
+    start = time.perf_counter()
+    try:
+        result = _run_mode(mode, input_path, workers)
+    except Exception as e:
+        queue.put({"error": repr(e)})
+        return
+    result["wall_seconds"] = round(time.perf_counter() - start, 4)
+    result["peak_rss_bytes"] = max(
+        _peak_rss_bytes(resource.RUSAGE_SELF),
+        _peak_rss_bytes(resource.RUSAGE_CHILDREN),
+    )
+    queue.put(result)
+
+
+def run_case(mode: str, input_path: str, workers: int) -> dict:
+    """Run a case in a fresh process so its peak RSS is measured on its own."""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_case, args=(queue, mode, input_path, workers))
+    process.start()
+    result = queue.get()
+    process.join()
+    if "error" in result:
+        raise RuntimeError(f"{mode} failed on {input_path}: {result['error']}")
+    return result
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(records: list[dict], baseline_path: str) -> None:
+    """Print wall time and output size deltas against an earlier run."""
+    baseline = {}
+    with open(baseline_path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                baseline[(record["document"], record["mode"])] = record
+
+    print(f"{'document':<20} {'mode':<24} {'wall Δ%':>9} {'size Δ%':>9} {'rss Δ%':>9}")
+    for record in records:
+        old = baseline.get((record["document"], record["mode"]))
+        if old is None:
+            continue
+        deltas = [
+            100 * (record[key] - old[key]) / old[key] if old[key] else 0.0
+            for key in ("wall_seconds", "output_bytes", "peak_rss_bytes")
+        ]
+        print(
+            f"{record['document']:<20} {record['mode']:<24} "
+            + " ".join(f"{delta:>+9.1f}" for delta in deltas)
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, default=12, help="Pages per document")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument(
+        "--documents", nargs="+", default=list(CORPUS), choices=list(CORPUS)
+    )
+    parser.add_argument("--output", type=str, default=None, help="JSON lines file")
+    parser.add_argument("--compare", type=str, default=None, help="Earlier run")
+    args = parser.parse_args()
+
+    commit = _git_commit()
+    records = []
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = build_corpus(directory, args.pages)
+        for document in args.documents:
+            input_bytes = os.path.getsize(corpus[document])
+            for mode in args.modes:
+                result = run_case(mode, corpus[document], args.workers)
+                record = {
+                    "commit": commit,
+                    "python": platform.python_version(),
+                    "pymupdf": fitz.VersionBind,
+                    "document": document,
+                    "pages": args.pages,
+                    "mode": mode,
+                    "input_bytes": input_bytes,
+                    "ratio": round(result["output_bytes"] / input_bytes, 4),
+                    **result,
+                }
+                records.append(record)
+                print(
+                    f"{document:<20} {mode:<24} {record['wall_seconds']:>8.2f}s "
+                    f"{record['peak_rss_bytes'] / 2**20:>8.1f} MiB "
+                    f"{record['output_bytes']:>10} B  ratio {record['ratio']:.3f}",
+                    file=sys.stderr,
+                )
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for record in records:
+            output.write(json.dumps(record, sort_keys=True) + "\n")
+    finally:
+        if args.output:
+            output.close()
+
+    if args.compare:
+        compare(records, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,20 +7,26 @@ for blind evaluation. It creates non-descriptive filenames and tracks metadata i
 """
 
 import csv
+import json
 import os
 import random
-import tempfile
 import uuid
 from pathlib import Path
 from typing import List, Tuple
 
 from podcaist.contributions import summarize_contributions
 from podcaist.generate_sections import generate_podcast
+from podcaist.hedging import HEDGER
 from podcaist.limitations import limitations
 from podcaist.method import method
-from podcaist.model_garden import generate_text_response
-from podcaist.pdf_utils import compress_pdf
+from podcaist.model_garden import IN_FLIGHT, RATE_LIMITER, generate_text_response
+from podcaist.model_policy import STAGES, Budget
+from podcaist.pdf_utils import COMPRESSED_PDF_CACHE, compress_pdf_cached
+from podcaist.preflight import screen_papers
+from podcaist.response_cache import RESPONSE_CACHE
 from podcaist.results import results
+from podcaist.retry import retry_stats
+from podcaist.usage import token_usage
 from podcaist.utils import format_contributions, write_text_file
 
 # Available models for testing
@@ -31,8 +37,19 @@ AVAILABLE_MODELS = [
 
 
 class BlindTester:
-    def __init__(self, output_dir: str = "blind_test_results"):
+    def __init__(
+        self,
+        output_dir: str = "blind_test_results",
+        budget: Budget | None = None,
+        over_budget: str = "downgrade",
+    ):
+        """With a budget every paper is planned before generation and, per
+        model, rejected or moved to cheaper stage models if it would exceed
+        it (see preflight.screen_papers). The stage_models column records
+        which model wrote each stage, since that can differ from model."""
         self.output_dir = Path(output_dir)
+        self.budget = budget
+        self.over_budget = over_budget
         self.output_dir.mkdir(exist_ok=True)
         self.csv_file = self.output_dir / "test_metadata.csv"
         self.test_counter = 1
@@ -46,6 +63,7 @@ class BlindTester:
                     "original_pdf_name",
                     "model",
                     "context_flag",
+                    "stage_models",
                     "script_filename",
                     "generation_timestamp",
                 ]
@@ -64,85 +82,101 @@ class BlindTester:
         else:
             return tuple(random.sample(AVAILABLE_MODELS, 2))
 
-    def generate_with_context(self, pdf_path: str, model: str) -> str:
+    def plan_models(self, pdf_path: str, model: str) -> dict[str, str] | None:
+        """Model per stage for this paper, None if it is rejected as over budget"""
+        if self.budget is None:
+            return {stage: model for stage in STAGES}
+        plan = screen_papers([pdf_path], model, self.budget, self.over_budget)[pdf_path]
+        if plan is None:
+            return None
+        print(f"Estimated ${plan.cost:.4f} and {plan.latency_seconds:.0f}s on {model}")
+        return plan.models
+
+    def generate_with_context(self, pdf_path: str, models: dict[str, str]) -> str:
         """Generate podcast using full context pipeline"""
         # Generate all analysis components
-        contributions = summarize_contributions(pdf_file_path=pdf_path, model=model)
-        method_text = method(pdf_path, contributions, model)
-        results_text = results(pdf_path, contributions, model)
-        limitation_text = limitations(pdf_path, contributions, model)
+        contributions = summarize_contributions(
+            pdf_file_path=pdf_path, model=models["contributions"]
+        )
+        method_text = method(pdf_path, contributions, models["method"])
+        results_text = results(pdf_path, contributions, models["results"])
+        limitation_text = limitations(pdf_path, contributions, models["limitations"])
 
         # Generate final podcast
         return generate_podcast(
-            pdf_path, contributions, method_text, results_text, limitation_text, model
+            pdf_path,
+            contributions,
+            method_text,
+            results_text,
+            limitation_text,
+            models["script"],
         )
 
-    def generate_without_context(self, pdf_path: str, model: str) -> str:
+    def generate_without_context(self, pdf_path: str, models: dict[str, str]) -> str:
         """Generate podcast using full context pipeline"""
         # Generate all analysis components
-        return generate_podcast(pdf_path, None, None, None, None, model)
+        return generate_podcast(pdf_path, None, None, None, None, models["script"])
 
     def process_paper(self, pdf_path: str, pdf_name: str) -> List[dict]:
         """Process a single paper with random model selection and both context settings"""
         # Select 2 random models
         model1, model2 = self.select_models_for_paper()
 
-        # Compress PDF
-        compressed_pdf = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
-        compress_pdf(pdf_path, compressed_pdf.name)
+        # Compress PDF (reused from the on-disk cache on re-runs)
+        compressed_pdf_path = compress_pdf_cached(pdf_path)
 
         results = []
 
-        try:
-            # Generate 4 variants: 2 models × 2 context settings
-            for model in [model1, model2]:
-                for context_flag in [True, False]:
-                    test_id = self.generate_test_id()
-                    script_filename = f"{test_id}.txt"
-
-                    # Generate podcast script
-                    if context_flag:
-                        script = self.generate_with_context(compressed_pdf.name, model)
-                    else:
-                        script = self.generate_without_context(
-                            compressed_pdf.name, model
-                        )
-
-                    # Save script with non-descriptive filename
-                    script_path = self.output_dir / script_filename
-                    write_text_file(str(script_path), script)
-
-                    # Record metadata
-                    metadata = {
-                        "test_id": test_id,
-                        "original_pdf_name": pdf_name,
-                        "model": model,
-                        "context_flag": context_flag,
-                        "script_filename": script_filename,
-                        "generation_timestamp": __import__("datetime")
-                        .datetime.now()
-                        .isoformat(),
-                    }
-                    results.append(metadata)
-
-                    # Write to CSV immediately
-                    with open(self.csv_file, "a", newline="") as f:
-                        writer = csv.writer(f)
-                        writer.writerow(
-                            [
-                                metadata["test_id"],
-                                metadata["original_pdf_name"],
-                                metadata["model"],
-                                metadata["context_flag"],
-                                metadata["script_filename"],
-                                metadata["generation_timestamp"],
-                            ]
-                        )
-
-        finally:
-            # Clean up compressed PDF
-            os.unlink(compressed_pdf.name)
-
+        # Generate 4 variants: 2 models × 2 context settings
+        for model in [model1, model2]:
+            models = self.plan_models(compressed_pdf_path, model)
+            if models is None:
+                continue
+            for context_flag in [True, False]:
+                test_id = self.generate_test_id()
+                script_filename = f"{test_id}.txt"
+
+                # Generate podcast script
+                if context_flag:
+                    script = self.generate_with_context(compressed_pdf_path, models)
+                else:
+                    script = self.generate_without_context(
+                        compressed_pdf_path, models
+                    )
+
+                # Save script with non-descriptive filename
+                script_path = self.output_dir / script_filename
+                write_text_file(str(script_path), script)
+
+                # Record metadata
+                metadata = {
+                    "test_id": test_id,
+                    "original_pdf_name": pdf_name,
+                    "model": model,
+                    "context_flag": context_flag,
+                    # stages the run used, as downgrading may change them
+                    "stage_models": models if context_flag else {"script": models["script"]},
+                    "script_filename": script_filename,
+                    "generation_timestamp": __import__("datetime")
+                    .datetime.now()
+                    .isoformat(),
+                }
+                results.append(metadata)
+
+                # Write to CSV immediately
+                with open(self.csv_file, "a", newline="") as f:
+                    writer = csv.writer(f)
+                    writer.writerow(
+                        [
+                            metadata["test_id"],
+                            metadata["original_pdf_name"],
+                            metadata["model"],
+                            metadata["context_flag"],
+                            json.dumps(metadata["stage_models"]),
+                            metadata["script_filename"],
+                            metadata["generation_timestamp"],
+                        ]
+                    )
         return results
 
     def run_blind_test(self, pdf_directory: str, pdf_names: List[str]) -> None:
@@ -175,6 +209,13 @@ class BlindTester:
         print(f"Total test cases generated: {len(all_results)}")
         print(f"Results saved to: {self.output_dir}")
         print(f"Metadata CSV: {self.csv_file}")
+        print(f"Compressed PDF cache: {COMPRESSED_PDF_CACHE.stats()}")
+        print(f"Response cache: {RESPONSE_CACHE.stats()}")
+        print(f"Coalesced requests: {IN_FLIGHT.stats()}")
+        print(f"Rate limiter: {RATE_LIMITER.stats()}")
+        print(f"Retries: {retry_stats()}")
+        print(f"Hedged requests: {HEDGER.stats()}")
+        print(f"Token usage: {token_usage()}")
 
 
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
 from podcaist.model_garden import (generate_text_response,
                                    generate_text_response_async)
+from podcaist.utils import PdfSource
 
 prompt = """
 Attached is a pdf of a research paper. I want you to identify the ablation studies 
@@ -19,7 +20,7 @@ Ablation Study 1:
 """
 
 
-def ablation_studies(pdf_file_path: str, model: str = "gpt-4o-mini-2024-07-18") -> str:
+def ablation_studies(pdf_file_path: PdfSource, model: str = "gpt-4o-mini-2024-07-18") -> str:
     input = [("pdf", pdf_file_path), ("text", prompt)]
     response = generate_text_response(
         input_contents=input,
@@ -29,8 +30,8 @@ def ablation_studies(pdf_file_path: str, model: str = "gpt-4o-mini-2024-07-18")
 
 
 async def ablation_studies_async(
-    pdf_file_path: str, model: str = "gpt-4o-mini-2024-07-18"
+    pdf_file_path: PdfSource, model: str = "gpt-4o-mini-2024-07-18"
 ) -> str:
     input = [("pdf", pdf_file_path), ("text", prompt)]
-    response = await generate_text_response_async(input, model)
+    response = await generate_text_response_async(input, model, stage="ablations")
     return response
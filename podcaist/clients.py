@@ -0,0 +1,151 @@
+import asyncio
+import atexit
+import os
+import threading
+import weakref
+from typing import Any, Coroutine
+
+import httpx
+from google import genai
+from google.genai.types import HttpOptions
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+# Connection pool limits applied to clients created after configure_client_pools.
+POOL_LIMITS = {
+    "max_connections": int(os.getenv("PODCAIST_MAX_CONNECTIONS", 20)),
+    "max_keepalive_connections": int(os.getenv("PODCAIST_MAX_KEEPALIVE", 10)),
+    "keepalive_expiry": float(os.getenv("PODCAIST_KEEPALIVE_EXPIRY", 60)),
+}
+
+PROVIDER_API_KEY_ENV = {
+    "openai": "OPENAI_API_KEY",
+    "google": "GEMINI_API_KEY",
+}
+
+_lock = threading.Lock()
+# (provider, api_key) → sync client, shared by every thread and paper
+_sync_clients: dict[tuple[str, str | None], Any] = {}
+# event loop → {(provider, api_key): async client}; async connection pools are
+# bound to the loop that opened them, so they are only reused within one loop
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def configure_client_pools(
+    max_connections: int | None = None,
+    max_keepalive_connections: int | None = None,
+    keepalive_expiry: float | None = None,
+) -> None:
+    """Set the HTTP pool limits used by clients created from now on."""
+    for name, value in (
+        ("max_connections", max_connections),
+        ("max_keepalive_connections", max_keepalive_connections),
+        ("keepalive_expiry", keepalive_expiry),
+    ):
+        if value is not None:
+            POOL_LIMITS[name] = value
+
+
+def resolve_api_key(provider: str, api_key: str | None) -> str | None:
+    if api_key is not None:
+        return api_key
+    return os.getenv(PROVIDER_API_KEY_ENV[provider])
+
+
+def _new_client(provider: str, api_key: str | None, async_mode: bool) -> Any:
+    limits = httpx.Limits(**POOL_LIMITS)
+    if provider == "openai":
+        # retries are handled by podcaist.retry, not stacked on the SDK's own
+        if async_mode:
+            return AsyncOpenAI(
+                api_key=api_key,
+                http_client=DefaultAsyncHttpxClient(limits=limits),
+                max_retries=0,
+            )
+        return OpenAI(
+            api_key=api_key,
+            http_client=DefaultHttpxClient(limits=limits),
+            max_retries=0,
+        )
+    elif provider == "google":
+        # client_args / async_client_args only exist in newer google-genai
+        if "client_args" in HttpOptions.model_fields:
+            http_options = HttpOptions(
+                client_args={"limits": limits}, async_client_args={"limits": limits}
+            )
+            return genai.Client(api_key=api_key, http_options=http_options)
+        return genai.Client(api_key=api_key)
+    else:
+        raise ValueError(f"Invalid provider {provider}")
+
+
+def get_client(
+    provider: str, api_key: str | None = None, async_mode: bool = False
+) -> Any:
+    """
+    Shared client for (provider, api_key), created on first use.
+
+    Sync clients live for the whole process. Async clients are kept per event
+    loop, so every stage of every paper running on one loop shares a single
+    connection pool. For "google" the same genai.Client serves both modes;
+    async callers use its .aio attribute.
+    """
+    key = (provider, resolve_api_key(provider, api_key))
+    with _lock:
+        if async_mode:
+            clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+        else:
+            clients = _sync_clients
+        if key not in clients:
+            clients[key] = _new_client(provider, key[1], async_mode)
+        return clients[key]
+
+
+def get_openai_client(
+    api_key: str | None = None, async_mode: bool = False
+) -> OpenAI | AsyncOpenAI:
+    return get_client("openai", api_key, async_mode)
+
+
+def get_gemini_client(
+    api_key: str | None = None, async_mode: bool = False
+) -> genai.Client:
+    return get_client("google", api_key, async_mode)
+
+
+def close_clients() -> None:
+    """Close every sync client; registered to run at interpreter exit."""
+    with _lock:
+        clients = list(_sync_clients.values())
+        _sync_clients.clear()
+    for client in clients:
+        close = getattr(client, "close", None)  # genai.Client.close is recent
+        if close is not None:
+            close()
+
+
+async def aclose_clients() -> None:
+    """Close the async clients belonging to the running event loop."""
+    with _lock:
+        clients = list(_async_clients.pop(asyncio.get_running_loop(), {}).values())
+    for client in clients:
+        if isinstance(client, AsyncOpenAI):
+            await client.close()
+        elif hasattr(client.aio, "aclose"):
+            await client.aio.aclose()
+
+
+def run_closing_clients(coroutine: Coroutine) -> Any:
+    """asyncio.run that closes the loop's async clients before the loop ends."""
+
+    async def run():
+        try:
+            return await coroutine
+        finally:
+            await aclose_clients()
+
+    return asyncio.run(run())
+
+
+atexit.register(close_clients)
@@ -2,7 +2,7 @@ from pydantic import BaseModel, Field
 
 from podcaist.model_garden import generate_text_response, generate_text_response_async
 from podcaist.pdf_utils import compress_pdf
-from podcaist.utils import write_json_file
+from podcaist.utils import PdfSource, write_json_file
 
 prompt = """
 Based on the attached pdf I want you to summarize the key contributions of the paper. \
@@ -26,7 +26,7 @@ class Contributions(BaseModel):
 
 
 def summarize_contributions(
-    pdf_file_path: str, model: str = "gpt-4o-mini-2024-07-18"
+    pdf_file_path: PdfSource, model: str = "gpt-4o-mini-2024-07-18"
 ) -> str:
     input_to_model = [("pdf", pdf_file_path), ("text", prompt)]
     response = generate_text_response(
@@ -43,8 +43,10 @@ def format_contributions(response: str) -> str:
 
 
 async def summarize_contributions_async(
-    pdf_file_path: str, model: str = "gpt-4o-mini-2024-07-18", api_key: str | None = None
+    pdf_file_path: PdfSource, model: str = "gpt-4o-mini-2024-07-18", api_key: str | None = None
 ) -> str:
     input_to_model = [("pdf", pdf_file_path), ("text", prompt)]
-    response = await generate_text_response_async(input_to_model, model, Contributions, api_key=api_key)
+    response = await generate_text_response_async(
+        input_to_model, model, Contributions, api_key=api_key, stage="contributions"
+    )
     return response
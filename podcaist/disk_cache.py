@@ -0,0 +1,180 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from podcaist.utils import sha256_bytes
+
+# An over-full cache is evicted down to this fraction of max_bytes, so the
+# puts after it have room before the next size-triggered scan.
+EVICT_TO_FRACTION = 0.9
+
+
+def default_cache_dir() -> str:
+    """Root directory for podcaist's on-disk caches (override with PODCAIST_CACHE_DIR)."""
+    return os.getenv(
+        "PODCAIST_CACHE_DIR",
+        os.path.join(os.path.expanduser("~"), ".cache", "podcaist"),
+    )
+
+
+def make_cache_key(*parts) -> str:
+    """Hash any JSON-serialisable parts into a stable hex key."""
+    payload = json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+    return sha256_bytes(payload)
+
+
+class DiskCache:
+    """
+    A directory of files addressed by key with size-bounded LRU eviction.
+
+    Recency is tracked through each entry's mtime, which is bumped on every
+    hit, so the LRU order survives across processes and runs. Writes go to a
+    temp file first and are moved into place atomically. With max_age_seconds
+    entries unused for longer than that are treated as misses and evicted.
+
+    Entries used in the last min_idle_seconds are never evicted to make room,
+    so a path handed out by get() or put_file() stays readable for at least
+    that long even if other processes fill the cache; until they age out the
+    cache may exceed max_bytes.
+
+    Eviction scans the whole directory, so puts run it only every evict_every
+    puts (to catch other processes' writes and expired entries) or once this
+    process's own writes push its running size estimate past max_bytes.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        suffix: str = "",
+        max_age_seconds: float | None = None,
+        min_idle_seconds: float = 0.0,
+        evict_every: int = 100,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.max_age_seconds = max_age_seconds
+        self.min_idle_seconds = min_idle_seconds
+        self.evict_every = evict_every
+        # size as of the last eviction plus what this process wrote since;
+        # None until the first eviction has measured the directory
+        self._approx_bytes: int | None = None
+        self._fits_after_evict = True
+        self._puts_since_evict = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key: str) -> str | None:
+        """Return the path of the cached entry, or None on a miss."""
+        path = self.path_for(key)
+        try:
+            if self._expired(os.stat(path).st_mtime):
+                raise FileNotFoundError(path)
+            os.utime(path)  # mark as most recently used
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def get_bytes(self, key: str) -> bytes | None:
+        path = self.get(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:  # evicted by another process in between
+            return None
+
+    def put_file(self, key: str, source_path: str) -> str:
+        """Move source_path into the cache under key and return the new path."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(key)
+        size = os.path.getsize(source_path)
+        os.replace(source_path, path)
+        with self._lock:
+            self._puts_since_evict += 1
+            if self._approx_bytes is not None:
+                self._approx_bytes += size
+            due = (
+                self._approx_bytes is None
+                or self._puts_since_evict >= self.evict_every
+                # once an eviction could not get under max_bytes (entries in
+                # use), only the periodic scan retries
+                or (self._fits_after_evict and self._approx_bytes > self.max_bytes)
+            )
+        if due:
+            self.evict(keep=path)
+        return path
+
+    def put_bytes(self, key: str, data: bytes) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return self.put_file(key, tmp_path)
+
+    def new_temp_path(self) -> str:
+        """A path inside the cache directory that can later be passed to put_file."""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        return tmp_path
+
+    def _expired(self, mtime: float) -> bool:
+        return (
+            self.max_age_seconds is not None
+            and time.time() - mtime > self.max_age_seconds
+        )
+
+    def evict(self, keep: str | None = None) -> None:
+        """Delete expired entries, then least recently used ones until the
+        cache fits max_bytes (with EVICT_TO_FRACTION headroom if it did not)."""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.is_file() or entry.name.endswith(".tmp"):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        now = time.time()
+        target = (
+            self.max_bytes
+            if total <= self.max_bytes
+            else int(self.max_bytes * EVICT_TO_FRACTION)
+        )
+        for mtime, size, path in sorted(entries):
+            if total <= target and not self._expired(mtime):
+                break
+            if now - mtime < self.min_idle_seconds:
+                break  # this and every later entry were used too recently
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            with self._lock:
+                self.evictions += 1
+        with self._lock:
+            self._approx_bytes = total
+            self._fits_after_evict = total <= self.max_bytes
+            self._puts_since_evict = 0
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
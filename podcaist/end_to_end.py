@@ -1,13 +1,18 @@
 import asyncio
 import os
 import shutil
-import tempfile
 
-from podcaist.generate_audio import generate_audio
+from podcaist.clients import run_closing_clients
+from podcaist.generate_audio import AsyncAudioStream, generate_audio_async
 from podcaist.generate_podcast_script import generate_podcast_script_async
-from podcaist.pdf_utils import compress_pdf
+from podcaist.hedging import HEDGER
+from podcaist.model_garden import IN_FLIGHT, RATE_LIMITER
+from podcaist.model_policy import Budget
+from podcaist.pdf_utils import COMPRESSED_PDF_CACHE, compress_pdf_bytes_cached
 from podcaist.progress import Progress
-from podcaist.utils import write_text_file
+from podcaist.response_cache import RESPONSE_CACHE
+from podcaist.retry import retry_stats
+from podcaist.utils import read_pdf_file_bytes, write_text_file
 
 
 def generate_entire_podcast(
@@ -22,35 +27,127 @@ def generate_entire_podcast(
     test_audio: bool = False,
     custom_instructions: str | None = None,
     api_key: str | None = None,
+    pdf_input_mode: str = "pdf",
+    route_sections: bool = False,
+    shard_pages: int | None = None,
+    gemini_context_cache: bool = False,
+    stream_audio: bool = False,
+    parallel_sections: bool = False,
+    single_pass_analysis: bool = False,
+    stage_models: dict[str, str] | None = None,
+    budget: Budget | None = None,
 ) -> None:
+    """stream_audio sends the script to the TTS backend paragraph by
+    paragraph while it is being generated instead of after it is done.
+
+    parallel_sections writes the script's four sections concurrently and
+    single_pass_analysis merges the method, results and limitations stages
+    into one request.
+
+    stage_models / budget pick a model per stage (see model_policy); model
+    covers the stages they leave out."""
+    return run_closing_clients(
+        generate_entire_podcast_async(
+            pdf_path,
+            model=model,
+            audio_model=audio_model,
+            remote=remote,
+            save_script_locally=save_script_locally,
+            save_audio_locally=save_audio_locally,
+            local_output_path=local_output_path,
+            progress=progress,
+            test_audio=test_audio,
+            custom_instructions=custom_instructions,
+            api_key=api_key,
+            pdf_input_mode=pdf_input_mode,
+            route_sections=route_sections,
+            shard_pages=shard_pages,
+            gemini_context_cache=gemini_context_cache,
+            stream_audio=stream_audio,
+            parallel_sections=parallel_sections,
+            single_pass_analysis=single_pass_analysis,
+            stage_models=stage_models,
+            budget=budget,
+        )
+    )
+
+
+async def generate_entire_podcast_async(
+    pdf_path: str,
+    model: str = "gemini-2.5-pro",
+    audio_model: str = "eleven_labs",
+    remote: bool = False,
+    save_script_locally: bool = False,
+    save_audio_locally: bool = False,
+    local_output_path: str = "./podcast_outputs",
+    progress: Progress | None = None,
+    test_audio: bool = False,
+    custom_instructions: str | None = None,
+    api_key: str | None = None,
+    pdf_input_mode: str = "pdf",
+    route_sections: bool = False,
+    shard_pages: int | None = None,
+    gemini_context_cache: bool = False,
+    stream_audio: bool = False,
+    parallel_sections: bool = False,
+    single_pass_analysis: bool = False,
+    stage_models: dict[str, str] | None = None,
+    budget: Budget | None = None,
+) -> None:
+    """
+    generate_entire_podcast for callers that own an event loop.
+
+    Nothing here blocks the loop: compression, file I/O and the synchronous
+    TTS SDKs run in worker threads, so one process can produce many podcasts
+    concurrently, e.g. with asyncio.gather over several papers.
+    """
     podcast_title = os.path.basename(pdf_path).split(".")[0] + "_" + model
+    audio_stream = None
     if not test_audio:
-        compressed_pdf_path = tempfile.NamedTemporaryFile(
-            suffix=".pdf", delete=True
-        ).name
-        compress_pdf(pdf_path, compressed_pdf_path)
+        # the compressed paper stays in memory all the way to the request payload
+        pdf_bytes = await asyncio.to_thread(read_pdf_file_bytes, pdf_path)
+        compressed_pdf = await asyncio.to_thread(compress_pdf_bytes_cached, pdf_bytes)
+        if stream_audio:
+            audio_stream = AsyncAudioStream(audio_model, remote=remote)
 
         progress and progress.step("Generating podcast script")
-        podcast_script = asyncio.run(
-            generate_podcast_script_async(
-                compressed_pdf_path,
+        try:
+            podcast_script = await generate_podcast_script_async(
+                compressed_pdf,
                 model=model,
                 progress=progress,
                 custom_instructions=custom_instructions,
                 api_key=api_key,
+                pdf_input_mode=pdf_input_mode,
+                route_sections=route_sections,
+                shard_pages=shard_pages,
+                gemini_context_cache=gemini_context_cache,
+                on_script_line=audio_stream.add_line if audio_stream else None,
+                parallel_sections=parallel_sections,
+                single_pass_analysis=single_pass_analysis,
+                stage_models=stage_models,
+                budget=budget,
             )
-        )
+        except BaseException:
+            if audio_stream is not None:
+                audio_stream.close()
+            raise
 
         progress and progress.step("Generating audio")
     else:
         podcast_script = "This is a test of the audio system. It should be able to generate audio from a script."
 
     if save_script_locally:
-        write_text_file(f"saved_outputs/{podcast_title}_{model}.txt", podcast_script)
+        await asyncio.to_thread(
+            write_text_file, f"saved_outputs/{podcast_title}_{model}.txt", podcast_script
+        )
 
-    temp_file_name = generate_audio(
-        podcast_title, podcast_script, audio_model, remote=remote
-    )
+    if audio_stream is not None:
+        temp_file_name = await audio_stream.finish()
+    else:
+        temp_file_name = await generate_audio_async(
+            podcast_title, podcast_script, audio_model, remote=remote
+        )
 
     if save_audio_locally and temp_file_name:
         progress and progress.step("Saving audio locally")
@@ -60,7 +157,7 @@ def generate_entire_podcast(
         local_file_path = os.path.join(
             local_output_path, f"{podcast_title}{file_extension}"
         )
-        shutil.copy2(temp_file_name, local_file_path)
+        await asyncio.to_thread(shutil.copy2, temp_file_name, local_file_path)
 
         progress and progress.step(f"Audio saved to {local_file_path}")
 
@@ -83,3 +180,9 @@ if __name__ == "__main__":
         custom_instructions=custom_instructions,
         api_key=os.getenv("GEMINI_API_KEY"),
     )
+    print(f"Compressed PDF cache: {COMPRESSED_PDF_CACHE.stats()}")
+    print(f"Response cache: {RESPONSE_CACHE.stats()}")
+    print(f"Coalesced requests: {IN_FLIGHT.stats()}")
+    print(f"Rate limiter: {RATE_LIMITER.stats()}")
+    print(f"Retries: {retry_stats()}")
+    print(f"Hedged requests: {HEDGER.stats()}")
@@ -1,40 +1,146 @@
 import asyncio
+import io
+import itertools
 import json
 import os
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
 
 from google import genai
-from google.genai.types import CreateCachedContentConfig, GenerateContentConfig, Part
+from google.genai import errors
+from google.genai.types import (
+    CreateCachedContentConfig,
+    FileState,
+    GenerateContentConfig,
+    Part,
+    UploadFileConfig,
+)
 from pydantic import BaseModel
 
-from podcaist.utils import read_pdf_file_bytes
+from podcaist import clients
+from podcaist.clients import resolve_api_key
+from podcaist.disk_cache import default_cache_dir
+from podcaist.retry import with_retries
+from podcaist.upload_index import UploadIndex, account_fingerprint
+from podcaist.usage import record_usage
+from podcaist.utils import PdfDocument, PdfSource, read_pdf_file_bytes
 
 MODEL_TO_CACHED_TOKEN_PRICE = {
     "gemini-2.5-pro": 0.31,
     "gemini-2.5-flash": 0.075,
+    "gemini-2.0-flash-001": 0.025,
+    "gemini-2.0-flash-lite-001": 0.01875,
 }
 
 MODEL_TO_INPUT_PRICE_PER_MILLION = {
     "gemini-2.5-pro": 1.25,
     "gemini-2.5-flash": 0.3,
+    "gemini-2.0-flash-001": 0.1,
+    "gemini-2.0-flash-lite-001": 0.075,
 }
 
 MODEL_TO_OUTPUT_PRICE_PER_MILLION = {
     "gemini-2.5-pro": 10,
     "gemini-2.5-flash": 2.5,
+    "gemini-2.0-flash-001": 0.4,
+    "gemini-2.0-flash-lite-001": 0.3,
 }
 
 
-def get_gemini_client(api_key: str | None = None) -> genai.Client:
-    if api_key is None:
-        api_key = os.getenv("GEMINI_API_KEY")
-    client = genai.Client(api_key=api_key)
-    return client
+# The Files API deletes uploads 48 hours after they are created. Entries are
+# retired an hour early so a handle never expires in the middle of a run.
+GEMINI_FILE_TTL_SECONDS = 48 * 3600
+FILE_INDEX = UploadIndex(
+    os.path.join(default_cache_dir(), "gemini_files.json"),
+    max_age_seconds=GEMINI_FILE_TTL_SECONDS - 3600,
+    validate_after_seconds=int(os.getenv("PODCAIST_GEMINI_FILE_CHECK_SECONDS", 3600)),
+)
+FILE_PROCESSING_POLL_SECONDS = 1.0
+FILE_PROCESSING_TIMEOUT_SECONDS = 120.0
 
 
-def get_pdf_for_prompt(pdf_path: str) -> bytes:
-    pdf_bytes = read_pdf_file_bytes(pdf_path)
-    return Part.from_bytes(data=pdf_bytes, mime_type="application/pdf")
+def gemini_file_uploads_enabled() -> bool:
+    """True when PODCAIST_GEMINI_FILE_UPLOADS=1 sends PDFs as Files API
+    references instead of inline bytes."""
+    return os.getenv("PODCAIST_GEMINI_FILE_UPLOADS", "") not in ("", "0")
+
+
+def get_gemini_client(
+    api_key: str | None = None, async_mode: bool = False
+) -> genai.Client:
+    """Pooled client from the shared registry (see podcaist.clients)."""
+    return clients.get_gemini_client(api_key, async_mode)
+
+
+def get_pdf_for_prompt(pdf: PdfSource, api_key: str | None = None) -> Part:
+    """PDF part from a file path or an in-memory buffer: inline bytes, or a
+    reference to the uploaded file when Files API uploads are enabled.
+
+    The part is kept on the PdfDocument, so stages sharing one document
+    share one part.
+    """
+    document = PdfDocument.load(pdf)
+    if gemini_file_uploads_enabled():
+        account = account_fingerprint(resolve_api_key("google", api_key))
+        return document.payload(
+            f"gemini_file:{account}",
+            lambda: Part.from_uri(
+                file_uri=get_file_uri(document, api_key), mime_type="application/pdf"
+            ),
+        )
+    return document.payload(
+        "gemini_inline",
+        lambda: Part.from_bytes(data=document.tobytes(), mime_type="application/pdf"),
+    )
+
+
+def _file_name(uri: str) -> str:
+    """files/<id> from a file URI, as the files endpoints expect it."""
+    return "files/" + uri.rstrip("/").rsplit("/", 1)[-1]
+
+
+def _wait_until_active(client: genai.Client, file) -> None:
+    deadline = time.monotonic() + FILE_PROCESSING_TIMEOUT_SECONDS
+    while file.state == FileState.PROCESSING:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Gemini file {file.name} is still processing")
+        time.sleep(FILE_PROCESSING_POLL_SECONDS)
+        file = client.files.get(name=file.name)
+    if file.state == FileState.FAILED:
+        raise RuntimeError(f"Gemini could not process file {file.name}: {file.error}")
+
+
+@with_retries("google")
+def upload_file(data: bytes, display_name: str, api_key: str | None = None) -> str:
+    """Upload a PDF through the Files API; returns its URI once it is usable."""
+    client = get_gemini_client(api_key)
+    file = client.files.upload(
+        file=io.BytesIO(data),
+        config=UploadFileConfig(mime_type="application/pdf", display_name=display_name),
+    )
+    _wait_until_active(client, file)
+    return file.uri
+
+
+def file_exists(uri: str, api_key: str | None = None) -> bool:
+    try:
+        file = get_gemini_client(api_key).files.get(name=_file_name(uri))
+    except errors.ClientError:  # 403 / 404 once the file is gone
+        return False
+    return file.state == FileState.ACTIVE
+
+
+def get_file_uri(pdf: PdfSource, api_key: str | None = None) -> str:
+    """Files API URI for a PDF, uploading it only if this account has no
+    live upload of the same content (see FILE_INDEX)."""
+    document = PdfDocument.load(pdf)
+    digest = document.sha256
+    key = f"{account_fingerprint(resolve_api_key('google', api_key))}:{digest}"
+    return FILE_INDEX.get_or_upload(
+        key,
+        lambda: upload_file(document.tobytes(), f"{digest}.pdf", api_key=api_key),
+        validate=lambda uri: file_exists(uri, api_key),
+    )
 
 
 def upload_pdf_and_cache(
@@ -56,14 +162,60 @@ def upload_pdf_and_cache(
     return cache
 
 
+@with_retries("google")
+def create_cached_content(
+    contents: list, model: str, ttl_seconds: int, api_key: str | None = None
+) -> str:
+    """Store contents as cached content for model; returns the cache name.
+
+    The entry expires by itself after ttl_seconds, so a crashed run does not
+    keep paying for storage.
+    """
+    client = get_gemini_client(api_key)
+    cache = client.caches.create(
+        model=model,
+        config=CreateCachedContentConfig(contents=contents, ttl=f"{ttl_seconds}s"),
+    )
+    return cache.name
+
+
+@with_retries("google")
+async def create_cached_content_async(
+    contents: list, model: str, ttl_seconds: int, api_key: str | None = None
+) -> str:
+    client = get_gemini_client(api_key, async_mode=True)
+    cache = await client.aio.caches.create(
+        model=model,
+        config=CreateCachedContentConfig(contents=contents, ttl=f"{ttl_seconds}s"),
+    )
+    return cache.name
+
+
 def list_cached_content() -> List[Dict[str, Any]]:
     client = get_gemini_client()
     return client.caches.list()
 
 
-def delete_cached_content(cache_name: str) -> None:
-    client = get_gemini_client()
-    client.caches.delete(cache_name)
+def delete_cached_content(cache_name: str, api_key: str | None = None) -> None:
+    client = get_gemini_client(api_key)
+    client.caches.delete(name=cache_name)
+
+
+async def delete_cached_content_async(
+    cache_name: str, api_key: str | None = None
+) -> None:
+    client = get_gemini_client(api_key, async_mode=True)
+    await client.aio.caches.delete(name=cache_name)
+
+
+@with_retries("google")
+def count_gemini_tokens(
+    contents: list, model: str, api_key: str | None = None
+) -> int:
+    """Input tokens of contents for model from the count_tokens endpoint,
+    which is free and generates nothing."""
+    client = get_gemini_client(api_key)
+    return client.models.count_tokens(model=model, contents=contents).total_tokens
 
 
 def generate_price_estimate(
@@ -90,67 +242,149 @@ def generate_price_estimate(
     )
     print(
         f" Total price: {input_price + cached_price + output_price}. Input price: {input_price}, cached price: {cached_price}, output price: {output_price}"
+        f" (input tokens: {input_tokens}, cached tokens: {cached_tokens})"
     )
     return input_price + cached_price + output_price
 
 
+def get_generate_config(
+    response_format: Optional[BaseModel] = None, cached_content: str | None = None
+) -> GenerateContentConfig | None:
+    if not response_format and not cached_content:
+        return None
+    return GenerateContentConfig(
+        cached_content=cached_content,
+        response_mime_type="application/json" if response_format else None,
+        response_schema=response_format,
+    )
+
+
+@with_retries("google")
 def generate_gemini_response(
     input_contents: list,
     model: str = "gemini-2.0-flash-lite-001",
     response_format: Optional[BaseModel] = None,
     api_key: str | None = None,
+    cached_content: str | None = None,
 ) -> str:
+    """cached_content is the name of a cache from create_cached_content that
+    holds the rest of the prompt (the paper); it must belong to model."""
     client = get_gemini_client(api_key)
 
-    config = None
-    if response_format:
-        config = GenerateContentConfig(
-            response_mime_type="application/json",
-            response_schema=response_format,
-        )
+    config = get_generate_config(response_format, cached_content)
     resp = client.models.generate_content(
         model=model, contents=input_contents, config=config
     )
-    # generate_price_estimate(
-    #     model,
-    #     resp.usage_metadata.prompt_token_count,
-    #     resp.usage_metadata.cached_content_token_count,
-    #     resp.usage_metadata.candidates_token_count,
-    #     resp.usage_metadata.thoughts_token_count,
-    # )
+    _report_usage(model, resp.usage_metadata)
 
     return json.loads(resp.text) if response_format else resp.text
 
 
+def _report_usage(model: str, usage) -> None:
+    if usage is not None:
+        record_usage(
+            model,
+            usage.prompt_token_count,
+            usage.cached_content_token_count,
+            (usage.candidates_token_count or 0) + (usage.thoughts_token_count or 0),
+        )
+        generate_price_estimate(
+            model,
+            usage.prompt_token_count,
+            usage.cached_content_token_count,
+            usage.candidates_token_count,
+            usage.thoughts_token_count,
+        )
+
+
+def _stream_text(chunks: Iterator, model: str) -> Iterator[str]:
+    usage = None
+    for chunk in chunks:
+        usage = chunk.usage_metadata or usage
+        if chunk.text:
+            yield chunk.text
+    _report_usage(model, usage)
+
+
+async def _stream_text_async(
+    first: list, chunks: AsyncIterator, model: str
+) -> AsyncIterator[str]:
+    usage = None
+    for chunk in first:
+        usage = chunk.usage_metadata or usage
+        if chunk.text:
+            yield chunk.text
+    async for chunk in chunks:
+        usage = chunk.usage_metadata or usage
+        if chunk.text:
+            yield chunk.text
+    _report_usage(model, usage)
+
+
+@with_retries("google")
+def stream_gemini_response(
+    input_contents: list,
+    model: str = "gemini-2.0-flash-lite-001",
+    api_key: str | None = None,
+    cached_content: str | None = None,
+) -> Iterator[str]:
+    """Text chunks of a response as they are generated.
+
+    The request is only sent on the first next(), so that chunk is fetched
+    here to let opening the stream be retried; a stream that breaks midway
+    raises.
+    """
+    client = get_gemini_client(api_key)
+    chunks = client.models.generate_content_stream(
+        model=model,
+        contents=input_contents,
+        config=get_generate_config(cached_content=cached_content),
+    )
+    first = next(chunks, None)
+    if first is None:
+        return iter(())
+    return _stream_text(itertools.chain([first], chunks), model)
+
+
+@with_retries("google")
+async def stream_gemini_response_async(
+    input_contents: list,
+    model: str = "gemini-2.0-flash-lite-001",
+    api_key: str | None = None,
+    cached_content: str | None = None,
+) -> AsyncIterator[str]:
+    client = get_gemini_client(api_key, async_mode=True)
+    chunks = await client.aio.models.generate_content_stream(
+        model=model,
+        contents=input_contents,
+        config=get_generate_config(cached_content=cached_content),
+    )
+    # like the sync version, fetch the first chunk so opening is retried
+    try:
+        first = [await chunks.__anext__()]
+    except StopAsyncIteration:
+        first = []
+    return _stream_text_async(first, chunks, model)
+
+
+@with_retries("google")
 async def generate_gemini_response_async(
     input_contents: list,
     model: str = "gemini-2.0-flash-lite-001",
     response_format: Optional[BaseModel] = None,
     api_key: str | None = None,
+    cached_content: str | None = None,
 ) -> str | Dict[str, Any]:
     """Generate a response (optionally JSON‑parsed) asynchronously."""
-    client = get_gemini_client(api_key)
-    cfg = (
-        GenerateContentConfig(
-            response_mime_type="application/json",
-            response_schema=response_format,
-        )
-        if response_format
-        else None
-    )
+    client = get_gemini_client(api_key, async_mode=True)
+    cfg = get_generate_config(response_format, cached_content)
 
     resp = await client.aio.models.generate_content(
         model=model,
         contents=input_contents,
         config=cfg,
     )
-    generate_price_estimate(
-        model,
-        resp.usage_metadata.prompt_token_count,
-        resp.usage_metadata.cached_content_token_count,
-        resp.usage_metadata.candidates_token_count,
-        resp.usage_metadata.thoughts_token_count,
-    )
+    _report_usage(model, resp.usage_metadata)
     return json.loads(resp.text) if response_format else resp.text
 
 
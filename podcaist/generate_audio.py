@@ -1,6 +1,19 @@
-from podcaist.generate_with_eleven_labs import generate_eleven_labs_audio
+import asyncio
+from typing import Callable
+
+from podcaist.generate_with_eleven_labs import (
+    ELEVEN_LABS_MAX_CHUNK_CHARS,
+    eleven_labs_synthesizer,
+    generate_eleven_labs_audio,
+)
+from podcaist.generate_with_inworld import (
+    INWORLD_MAX_CHUNK_CHARS,
+    generate_inworld_audio,
+    inworld_synthesizer,
+)
 from podcaist.generate_with_kokoro import generate_kokoro_audio
-from podcaist.generate_with_inworld import generate_inworld_audio
+from podcaist.retry import call_with_retry
+from podcaist.utils import combine_mp3_files, split_text_at_line_breaks
 
 podcast_mapping = {
     "eleven_labs": generate_eleven_labs_audio,
@@ -8,9 +21,138 @@ podcast_mapping = {
     "inworld": generate_inworld_audio,
 }
 
+# Backends that synthesize chunk by chunk:
+# (synthesizer factory, max chunk chars, provider name for podcaist.retry)
+streaming_mapping = {
+    "eleven_labs": (eleven_labs_synthesizer, ELEVEN_LABS_MAX_CHUNK_CHARS, "elevenlabs"),
+    "inworld": (inworld_synthesizer, INWORLD_MAX_CHUNK_CHARS, "inworld"),
+}
+
 
 def generate_audio(
     podcast_title: str, text: str, audio_model: str = "kokoro", remote: bool = False
 ) -> None:
     """The remote flag is for kokoro on whether to generate the audio locally or on the cloud"""
     return podcast_mapping[audio_model](text=text, remote=remote)
+
+
+async def _synthesize_chunks_async(
+    synthesize: Callable[[str], str],
+    provider: str,
+    chunks: list[str],
+    semaphore: asyncio.Semaphore,
+) -> list[str]:
+    async def run(chunk: str) -> str:
+        async with semaphore:
+            return await asyncio.to_thread(call_with_retry, provider, synthesize, chunk)
+
+    return list(await asyncio.gather(*(run(chunk) for chunk in chunks)))
+
+
+async def generate_audio_async(
+    podcast_title: str,
+    text: str,
+    audio_model: str = "kokoro",
+    remote: bool = False,
+    max_workers: int = 3,
+) -> str | None:
+    """generate_audio without blocking the event loop.
+
+    The TTS SDKs are synchronous, so each chunk runs in a worker thread; at
+    most max_workers chunks of this podcast are in flight at once.
+    """
+    if audio_model not in streaming_mapping:
+        return await asyncio.to_thread(
+            generate_audio, podcast_title, text, audio_model, remote
+        )
+    make_synthesizer, max_chunk_chars, provider = streaming_mapping[audio_model]
+    temp_files = await _synthesize_chunks_async(
+        make_synthesizer(),
+        provider,
+        split_text_at_line_breaks(text, max_chunk_chars),
+        asyncio.Semaphore(max_workers),
+    )
+    return await asyncio.to_thread(combine_mp3_files, temp_files)
+
+
+class AsyncAudioStream:
+    """
+    Synthesizes a script while it is still being written.
+
+    Feed it cleaned script lines with add_line (e.g. as the on_line callback
+    of generate_podcast), from the event loop. Once a paragraph ends and at
+    least min_chunk_chars are pending, they are sent to the TTS backend as a
+    task, so audio generation overlaps script generation. Awaiting finish()
+    waits for the remaining chunks and returns the combined mp3, like
+    generate_audio. Backends without chunked synthesis (kokoro) collect the
+    text and run generate_audio in finish().
+    """
+
+    def __init__(
+        self,
+        audio_model: str,
+        remote: bool = False,
+        max_workers: int = 3,
+        min_chunk_chars: int = 800,
+    ):
+        self.audio_model = audio_model
+        self.remote = remote
+        self.max_workers = max_workers
+        self.min_chunk_chars = min_chunk_chars
+        self.lines: list[str] = []
+        self._pending: list[str] = []
+        self._pending_chars = 0
+        self._tasks: list[asyncio.Task] = []
+        self.streaming = audio_model in streaming_mapping
+        if self.streaming:
+            make_synthesizer, self.max_chunk_chars, self._provider = streaming_mapping[
+                audio_model
+            ]
+            self._synthesize = make_synthesizer()
+
+    def add_line(self, line: str) -> None:
+        self.lines.append(line)
+        if not self.streaming:
+            return
+        if self._pending and self._pending_chars + len(line) + 1 > self.max_chunk_chars:
+            self._submit()
+        self._pending.append(line)
+        self._pending_chars += len(line) + 1
+        if not line.strip() and self._pending_chars >= self.min_chunk_chars:
+            self._submit()  # a paragraph just ended
+
+    def _submit(self) -> None:
+        chunk = "\n".join(self._pending).strip()
+        self._pending = []
+        self._pending_chars = 0
+        if not chunk:
+            return
+        if not hasattr(self, "_semaphore"):
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        self._tasks.append(
+            asyncio.ensure_future(
+                _synthesize_chunks_async(
+                    self._synthesize, self._provider, [chunk], self._semaphore
+                )
+            )
+        )
+
+    async def finish(self) -> str | None:
+        if not self.streaming:
+            return await generate_audio_async(
+                "", "\n".join(self.lines), self.audio_model, self.remote
+            )
+        self._submit()
+        try:
+            results = await asyncio.gather(*self._tasks)
+        finally:
+            self.close()
+        temp_files = [temp_file for result in results for temp_file in result]
+        if not temp_files:
+            return None
+        return await asyncio.to_thread(combine_mp3_files, temp_files)
+
+    def close(self) -> None:
+        """Stop synthesizing; chunks still running are cancelled."""
+        for task in self._tasks:
+            task.cancel()
@@ -1,18 +1,41 @@
 import asyncio
 import os
-import tempfile
+from typing import Callable
 
 from podcaist.contributions import (
     summarize_contributions,
     summarize_contributions_async,
 )
-from podcaist.generate_sections import generate_podcast
+from podcaist.generate_sections import (
+    generate_podcast,
+    generate_podcast_async,
+    generate_podcast_by_section,
+    generate_podcast_by_section_async,
+)
+from podcaist import limitations as limitations_stage
+from podcaist import method as method_stage
+from podcaist import results as results_stage
+from podcaist.hedging import HEDGER
 from podcaist.limitations import limitations, limitations_async
+from podcaist.long_document import analyze_long_document_async, get_page_count
 from podcaist.method import method, method_async
-from podcaist.pdf_utils import compress_pdf
+from podcaist.model_garden import (
+    GeminiCachedPaper,
+    create_gemini_paper_cache,
+    create_gemini_paper_cache_async,
+    delete_gemini_paper_cache,
+    delete_gemini_paper_cache_async,
+    prepare_pdf_input,
+)
+from podcaist.model_policy import Budget, most_used_model, resolve_stage_models
+from podcaist.paper_analysis import analyze_paper, analyze_paper_async
+from podcaist.pdf_sections import build_section_index, slice_pdf_for_stage
+from podcaist.pdf_utils import compress_pdf_cached
 from podcaist.progress import Progress
 from podcaist.results import results, results_async
 from podcaist.utils import (
+    PdfDocument,
+    PdfSource,
     format_podcast,
     read_json_file,
     read_text_file,
@@ -20,74 +43,289 @@ from podcaist.utils import (
     write_text_file,
 )
 
-SEM_LIMIT = 10
+ROUTED_STAGES = {
+    "method": method_stage.SECTION_KEYWORDS,
+    "results": results_stage.SECTION_KEYWORDS,
+    "limitations": limitations_stage.SECTION_KEYWORDS,
+}
+
+
+def prepare_stage_inputs(
+    pdf_file_path: PdfSource,
+    pdf_input_mode: str = "pdf",
+    route_sections: bool = False,
+) -> dict:
+    """
+    The paper input each stage is sent, keyed by stage name.
+
+    pdf_input_mode "text" / "text_with_figures" extracts the paper locally
+    once instead of sending the PDF (see model_garden.PDF_INPUT_MODES). With
+    route_sections the method, results and limitations stages only get the
+    pages of the sections they declare in SECTION_KEYWORDS; contributions and
+    the final script always see the whole paper.
+    """
+    paper = prepare_pdf_input(pdf_file_path, pdf_input_mode)
+    inputs = {
+        stage: paper
+        for stage in ("contributions", "method", "results", "limitations", "script")
+    }
+    if route_sections:
+        sections = build_section_index(pdf_file_path)
+        for stage, keywords in ROUTED_STAGES.items():
+            sliced = slice_pdf_for_stage(pdf_file_path, keywords, sections)
+            if sliced is not pdf_file_path:
+                inputs[stage] = prepare_pdf_input(PdfDocument(sliced), pdf_input_mode)
+    return inputs
+
+
+def use_cached_paper(stage_inputs: dict, cache: GeminiCachedPaper | None) -> dict:
+    """Point every stage that gets the whole paper at its Gemini cache.
+
+    Stages given a routed slice keep their own, smaller input.
+    """
+    if cache is None:
+        return stage_inputs
+    return {
+        stage: cache if stage_input is cache.paper else stage_input
+        for stage, stage_input in stage_inputs.items()
+    }
 
 
 def generate_podcast_script(
-    pdf_file_path: str,
+    pdf_file_path: PdfSource,
     model="gpt-4o-mini-2024-07-18",
     write_output: bool = False,
     progress: Progress | None = None,
     custom_instructions: str | None = None,
     api_key: str | None = None,
+    pdf_input_mode: str = "pdf",
+    route_sections: bool = False,
+    gemini_context_cache: bool = False,
+    on_script_line: Callable[[str], None] | None = None,
+    parallel_sections: bool = False,
+    single_pass_analysis: bool = False,
+    stage_models: dict[str, str] | None = None,
+    budget: Budget | None = None,
 ) -> str:
+    """gemini_context_cache stores the paper once as Gemini cached content
+    and runs every stage against it instead of re-sending it each time.
 
-    progress and progress.step("Summarizing the main contributions")
-    contributions = summarize_contributions(
-        pdf_file_path=pdf_file_path, model=model, api_key=api_key
-    )
+    on_script_line streams the final script (see generate_podcast).
 
-    limitation_text = limitations(pdf_file_path, contributions, model, api_key=api_key)
-    results_text = results(pdf_file_path, contributions, model, api_key=api_key)
-    method_text = method(pdf_file_path, contributions, model, api_key=api_key)
-
-    podcast = generate_podcast(
-        pdf_file_path,
-        contributions,
-        method_text,
-        results_text,
-        limitation_text,
-        model,
-        custom_instructions,
-        api_key=api_key,
-    )
+    parallel_sections writes the script's sections as concurrent requests
+    from a shared outline (see generate_podcast_by_section).
+
+    single_pass_analysis replaces the method, results and limitations
+    stages with one structured request on the whole paper (see
+    paper_analysis.analyze_paper).
+
+    stage_models runs the named stages (model_policy.STAGES) on other models
+    than model, e.g. {"contributions": "gemini-2.5-flash"}; with a budget
+    the other stages are picked to fit it (see model_policy)."""
+    # read and hashed once, then shared by every stage of this run
+    pdf_file_path = PdfDocument.load(pdf_file_path)
+    stage_inputs = prepare_stage_inputs(pdf_file_path, pdf_input_mode, route_sections)
+    models = resolve_stage_models(model, stage_models, budget, stage_inputs["script"])
+    cache = None
+    if gemini_context_cache:
+        cache = create_gemini_paper_cache(
+            stage_inputs["script"], most_used_model(models), api_key=api_key
+        )
+        stage_inputs = use_cached_paper(stage_inputs, cache)
+
+    try:
+        progress and progress.step("Summarizing the main contributions")
+        contributions = summarize_contributions(
+            pdf_file_path=stage_inputs["contributions"],
+            model=models["contributions"],
+            api_key=api_key,
+        )
+
+        if single_pass_analysis:
+            analysis = analyze_paper(
+                stage_inputs["script"], contributions, models["method"], api_key=api_key
+            )
+            method_text = analysis["method"]
+            results_text = analysis["results"]
+            limitation_text = analysis["limitations"]
+        else:
+            limitation_text = limitations(
+                stage_inputs["limitations"],
+                contributions,
+                models["limitations"],
+                api_key=api_key,
+            )
+            results_text = results(
+                stage_inputs["results"], contributions, models["results"], api_key=api_key
+            )
+            method_text = method(
+                stage_inputs["method"], contributions, models["method"], api_key=api_key
+            )
+
+        generate = generate_podcast_by_section if parallel_sections else generate_podcast
+        podcast = generate(
+            stage_inputs["script"],
+            contributions,
+            method_text,
+            results_text,
+            limitation_text,
+            models["script"],
+            custom_instructions,
+            api_key=api_key,
+            on_line=on_script_line,
+        )
+    finally:
+        if cache is not None:
+            delete_gemini_paper_cache(cache, api_key=api_key)
     if write_output:
         write_text_file(f"saved_outputs/podcast_{model}.txt", podcast)
     return podcast
 
 
 async def generate_podcast_script_async(
-    pdf_file_path: str,
+    pdf_file_path: PdfSource,
     model="gpt-4o-mini-2024-07-18",
     write_output: bool = False,
     progress: Progress | None = None,
     custom_instructions: str | None = None,
     api_key: str | None = None,
+    pdf_input_mode: str = "pdf",
+    route_sections: bool = False,
+    shard_pages: int | None = None,
+    gemini_context_cache: bool = False,
+    on_script_line: Callable[[str], None] | None = None,
+    parallel_sections: bool = False,
+    single_pass_analysis: bool = False,
+    stage_models: dict[str, str] | None = None,
+    budget: Budget | None = None,
 ) -> str:
+    """shard_pages switches papers longer than that many pages to the
+    map-reduce analysis in long_document, one shard of shard_pages at a time.
+    route_sections, gemini_context_cache and single_pass_analysis do not
+    apply to a sharded paper and are ignored for it, with a warning.
 
-    progress and progress.step("Summarizing the main contributions")
-    contributions = await summarize_contributions_async(
-        pdf_file_path=pdf_file_path, model=model, api_key=api_key
-    )
+    gemini_context_cache stores the paper once as Gemini cached content and
+    runs every stage against it; the entry is deleted when the script is done.
 
-    # Run these three operations concurrently
-    limitation_text, results_text, method_text = await asyncio.gather(
-        limitations_async(pdf_file_path, contributions, model, api_key=api_key),
-        results_async(pdf_file_path, contributions, model, api_key=api_key),
-        method_async(pdf_file_path, contributions, model, api_key=api_key),
-    )
-    progress and progress.step("Generating podcast script")
-
-    podcast = generate_podcast(
-        pdf_file_path,
-        contributions,
-        method_text,
-        results_text,
-        limitation_text,
-        model,
-        custom_instructions,
-        api_key=api_key,
-    )
+    on_script_line is called with each line of the final script while it is
+    being generated, e.g. to start text-to-speech early
+    (generate_audio.AsyncAudioStream).
+
+    parallel_sections generates the four script sections concurrently.
+
+    single_pass_analysis gets method, results and limitations from one
+    structured request instead of three.
+
+    stage_models and budget assign models per stage, as in
+    generate_podcast_script.
+    """
+    pdf_file_path = await asyncio.to_thread(PdfDocument.load, pdf_file_path)
+    cache = None
+    try:
+        # PDF parsing and extraction are CPU-bound, so they run off the loop
+        if shard_pages and await asyncio.to_thread(get_page_count, pdf_file_path) > shard_pages:
+            ignored = [
+                name
+                for name, enabled in (
+                    ("route_sections", route_sections),
+                    ("gemini_context_cache", gemini_context_cache),
+                    ("single_pass_analysis", single_pass_analysis),
+                )
+                if enabled
+            ]
+            if ignored:
+                print(
+                    f"Warning: {', '.join(ignored)} not supported for papers sharded "
+                    f"by shard_pages={shard_pages}, ignoring"
+                )
+            # sizing the paper for a budget parses it
+            models = await asyncio.to_thread(
+                resolve_stage_models, model, stage_models, budget, pdf_file_path
+            )
+            progress and progress.step("Summarizing the main contributions")
+            (
+                contributions,
+                method_text,
+                results_text,
+                limitation_text,
+                script_input,
+            ) = await analyze_long_document_async(
+                pdf_file_path,
+                model,
+                shard_pages,
+                pdf_input_mode,
+                api_key=api_key,
+                stage_models=models,
+            )
+        else:
+            stage_inputs = await asyncio.to_thread(
+                prepare_stage_inputs, pdf_file_path, pdf_input_mode, route_sections
+            )
+            models = await asyncio.to_thread(
+                resolve_stage_models, model, stage_models, budget, stage_inputs["script"]
+            )
+            if gemini_context_cache:
+                cache = await create_gemini_paper_cache_async(
+                    stage_inputs["script"], most_used_model(models), api_key=api_key
+                )
+                stage_inputs = use_cached_paper(stage_inputs, cache)
+
+            progress and progress.step("Summarizing the main contributions")
+            contributions = await summarize_contributions_async(
+                pdf_file_path=stage_inputs["contributions"],
+                model=models["contributions"],
+                api_key=api_key,
+            )
+
+            if single_pass_analysis:
+                analysis = await analyze_paper_async(
+                    stage_inputs["script"], contributions, models["method"], api_key=api_key
+                )
+                method_text = analysis["method"]
+                results_text = analysis["results"]
+                limitation_text = analysis["limitations"]
+            else:
+                # Run these three operations concurrently
+                limitation_text, results_text, method_text = await asyncio.gather(
+                    limitations_async(
+                        stage_inputs["limitations"],
+                        contributions,
+                        models["limitations"],
+                        api_key=api_key,
+                    ),
+                    results_async(
+                        stage_inputs["results"],
+                        contributions,
+                        models["results"],
+                        api_key=api_key,
+                    ),
+                    method_async(
+                        stage_inputs["method"],
+                        contributions,
+                        models["method"],
+                        api_key=api_key,
+                    ),
+                )
+            script_input = stage_inputs["script"]
+        progress and progress.step("Generating podcast script")
+
+        generate = (
+            generate_podcast_by_section_async if parallel_sections else generate_podcast_async
+        )
+        podcast = await generate(
+            script_input,
+            contributions,
+            method_text,
+            results_text,
+            limitation_text,
+            models["script"],
+            custom_instructions,
+            api_key=api_key,
+            on_line=on_script_line,
+        )
+    finally:
+        if cache is not None:
+            await delete_gemini_paper_cache_async(cache, api_key=api_key)
     if write_output:
         write_text_file(f"saved_outputs/podcast_{model}.txt", podcast)
     return podcast
@@ -103,10 +341,10 @@ if __name__ == "__main__":
         "/Users/derek/Library/Mobile Documents/com~apple~CloudDocs/Desktop/ML Papers 2/papers_to_read/"
         + pdf_name
     )
-    compressed_pdf_path = tempfile.NamedTemporaryFile(suffix=".pdf", delete=True).name
-    compress_pdf(pdf_path, compressed_pdf_path)
+    compressed_pdf_path = compress_pdf_cached(pdf_path)
     asyncio.run(
         generate_podcast_script_async(
             compressed_pdf_path, model=model, write_output=True, api_key=api_key
         )
     )
+    print(f"Hedged requests: {HEDGER.stats()}")
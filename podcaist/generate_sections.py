@@ -1,11 +1,17 @@
+import asyncio
 import re
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import (AsyncIterable, AsyncIterator, Callable, Iterable, Iterator,
+                    Optional)
 from pydantic import BaseModel, Field
 
-from podcaist.model_garden import generate_text_response
-from podcaist.utils import format_contributions
+from podcaist.model_garden import (generate_text_response,
+                                   generate_text_response_async,
+                                   stream_text_response,
+                                   stream_text_response_async)
+from podcaist.utils import PdfSource, format_contributions
 
-general_generate_prompt = """\
+podcast_context_prompt = """\
 Here are the contributions that you have extracted from the attached paper:
 {contributions}
 
@@ -32,13 +38,16 @@ to 'sixty four' and any acronyms should be spelled in all caps but avoid using i
 I have also attached the research paper so reference it as you craft your responses. The contributions, method, results and limitations \
 are also listed for reference, make sure everything said is grounded in your understanding of the attached pdf.
 
-Here is a description of the sections that I want you to generate:
+"""
 
+# The four sections of the script, in order.
+PODCAST_SECTIONS = [
+    """\
 1. Introduction. 
 The introduction should cover the "why" of the research paper. What makes this research paper important, what does it contribute to the community. \
 Additionally, feel free to give a preview of the results or why it is important, but this is meant to entice the listener on why they should spend \
-the next 15-25 minutes trying to understand the research paper.
-
+the next 15-25 minutes trying to understand the research paper.""",
+    """\
 2. Methods.
 This part should cover exactly how the authors obtained their results. Your goal in this section is to give the listener a deep understanding \
 of exactly what the authors did. The listener wants to understand exactly what they did, assuming the audience is a person with a Master's in AI. \
@@ -46,21 +55,22 @@ At the end of your explanation the listnee should have the necessary knowledge t
 explain the method to others. Feel free to explore whether the method relies on a theoretical understanding or \
 empirical studies. Your task is to focus on this contribution in particular. The listener should be able to have a conversation \
 with another person at the end on how the authors obtained their results and what were some key steps they took in order to do so. \
-A key aspect to focus on is what makes this method different from other approaches and why is it advantageous. This should be the main focus of the podcast.
-
+A key aspect to focus on is what makes this method different from other approaches and why is it advantageous. This should be the main focus of the podcast.""",
+    """\
 3. Results and limitations.
 The goal of this section is give the listener an understanding of how the authors chose to quantitively or qualitatively evaluate their method. \
 Bring up whatever is necessary to give the reader an understanding of the datasets and metrics used. Weaving into the conversation should be \
 your judgement on whether these were standard evaluation procedures or if they left something out that could have been used. Additonally, \
 discuss if the results back up the authors claims throughout the paper. Also discuss any limitations to the approach the authors used in the results \
-or even the method that you see as important to understanding the impact this paper will have.
-
+or even the method that you see as important to understanding the impact this paper will have.""",
+    """\
 4. Conclusion.
 This section should serve as a wrap up for the podcast as a whole. Fill in any final holes or questions that the listener may have. \
 Additionally discuss the impact and implications the paper has on the research and or business community and what future work may look like to further improve the method. \
-Do not tease any future episodes just keep this podcast about the current paper at hand.
-
+Do not tease any future episodes just keep this podcast about the current paper at hand.""",
+]
 
+script_instructions_prompt = """\
 Generate the section after thinking through your approach and what would be best to listen to as a podcast listener. After detailing your thoughts in the response start the \
 actual word for word generation that will be read by the text to speech engine with the string 'STARTING THE GENERATION NOW'. I will use that to split the response \
 automatically so it is extremely important you do that. Do not include any other text like 'Introduction' or anything else that resemble section titles. The response will be fed DIRECTLY \
@@ -71,11 +81,61 @@ Remember this will only be listened to so feel free to include examples, some hu
 Especially on hard to grasp topics create easy to follow examples and analogies that the listener can understand.
 """
 
+general_generate_prompt = (
+    podcast_context_prompt
+    + "Here is a description of the sections that I want you to generate:\n\n"
+    + "\n\n".join(PODCAST_SECTIONS)
+    + "\n\n\n"
+    + script_instructions_prompt
+)
+
+outline_prompt = """\
+The script will be written one section at a time by separate writers working in parallel. \
+Before they start, write a short outline that keeps them consistent: which points each section covers \
+(so nothing is skipped or explained twice) and one running example or analogy they can all refer back to. \
+Keep it brief, the writers have the paper and the summaries above.
+"""
+
+section_prompt = """\
+The script is being written one section at a time by separate writers working in parallel. \
+Here is the outline they all share:
+{outline}
+
+You are writing only the following section:
+
+{section}
+
+Cover the points the outline assigns to this section and leave the other sections' points to them. {position}
+
+
+"""
+
+FIRST_SECTION_NOTE = "This is the start of the podcast, so welcome the listener but do not wrap up."
+MIDDLE_SECTION_NOTE = "The listener has just heard the previous section, so carry on from it without greeting them again or wrapping up."
+LAST_SECTION_NOTE = "This is the end of the podcast, so carry on from the previous section without greeting the listener again and close the episode."
+
+
+class PodcastOutline(BaseModel):
+    running_example: str = Field(
+        description="One example or analogy, in plain english, that every section can refer back to."
+    )
+    introduction: list[str] = Field(description="Points the introduction covers.")
+    methods: list[str] = Field(description="Points the methods section covers.")
+    results_and_limitations: list[str] = Field(
+        description="Points the results and limitations section covers."
+    )
+    conclusion: list[str] = Field(description="Points the conclusion covers.")
+
+
 custom_instructions_prompt = """\
 Here are some additional instructions from the user in regards to this paper that you should especially focus on:
 {custom_instructions}
 """
 
+SCRIPT_START_MARKER = "STARTING THE GENERATION NOW"
+MUSIC_PATTERN = re.compile(r'\([^)]*music[^)]*\)', re.IGNORECASE)
+
+
 def remove_music_lines(text: str) -> str:
     """Remove any lines that contain the word 'music' inside parentheses."""
     lines = text.split('\n')
@@ -83,24 +143,64 @@ def remove_music_lines(text: str) -> str:
     
     for line in lines:
         # Check if the line contains 'music' inside parentheses
-        if not re.search(r'\([^)]*music[^)]*\)', line, re.IGNORECASE):
+        if not MUSIC_PATTERN.search(line):
             filtered_lines.append(line)
     
     return '\n'.join(filtered_lines)
 
 
-def generate_podcast(
-    pdf_file_path: str,
+def clean_script_line(line: str) -> str | None:
+    """The post-processing of generate_podcast for one line; None drops it."""
+    line = line.replace(SCRIPT_START_MARKER, "").replace("*", "")
+    return None if MUSIC_PATTERN.search(line) else line
+
+
+class ScriptLineSplitter:
+    """Turns streamed text pieces into cleaned script lines as each newline
+    arrives. Joined with newlines the lines equal the post-processed full
+    response."""
+
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, piece: str) -> list[str]:
+        self.buffer += piece
+        *lines, self.buffer = self.buffer.split("\n")
+        return [line for line in map(clean_script_line, lines) if line is not None]
+
+    def close(self) -> list[str]:
+        line = clean_script_line(self.buffer)
+        self.buffer = ""
+        return [] if line is None else [line]
+
+
+def iter_script_lines(pieces: Iterable[str]) -> Iterator[str]:
+    splitter = ScriptLineSplitter()
+    for piece in pieces:
+        yield from splitter.feed(piece)
+    yield from splitter.close()
+
+
+async def aiter_script_lines(pieces: AsyncIterable[str]) -> AsyncIterator[str]:
+    splitter = ScriptLineSplitter()
+    async for piece in pieces:
+        for line in splitter.feed(piece):
+            yield line
+    for line in splitter.close():
+        yield line
+
+
+def build_podcast_input(
+    pdf_file_path: PdfSource,
     contributions: list[str],
     method: str,
     results: str,
     limitations: str,
-    model: str = "gemini-2.5-pro",
     custom_instructions: str | None = None,
-    api_key: str | None = None,
-) -> str:
+    prompt: str = general_generate_prompt,
+) -> list:
     formatted_contributions = format_contributions(contributions)
-    input_to_the_model = general_generate_prompt.format(
+    input_to_the_model = prompt.format(
         contributions=formatted_contributions,
         method=method,
         results=results,
@@ -108,12 +208,252 @@ def generate_podcast(
     )
     if custom_instructions:
         input_to_the_model = custom_instructions_prompt.format(custom_instructions=custom_instructions) + "\n\n" + input_to_the_model
-    input = [
+    return [
         ("pdf", pdf_file_path),
         ("text", input_to_the_model),
     ]
-    response = generate_text_response(input, model, api_key=api_key)
-    response = response.replace("STARTING THE GENERATION NOW", "")
+
+
+def clean_script(response: str) -> str:
+    response = response.replace(SCRIPT_START_MARKER, "")
     response = response.replace("*", "")
     response = remove_music_lines(response)
-    return response
\ No newline at end of file
+    return response
+
+
+def generate_podcast(
+    pdf_file_path: PdfSource,
+    contributions: list[str],
+    method: str,
+    results: str,
+    limitations: str,
+    model: str = "gemini-2.5-pro",
+    custom_instructions: str | None = None,
+    api_key: str | None = None,
+    on_line: Callable[[str], None] | None = None,
+) -> str:
+    """on_line streams the script instead: it is called with each cleaned
+    line while the model is still writing the rest (see ScriptLineSplitter)."""
+    input = build_podcast_input(
+        pdf_file_path, contributions, method, results, limitations, custom_instructions
+    )
+    if on_line is not None:
+        lines = []
+        for line in iter_script_lines(stream_text_response(input, model, api_key=api_key)):
+            on_line(line)
+            lines.append(line)
+        return "\n".join(lines)
+
+    response = generate_text_response(input, model, api_key=api_key)
+    return clean_script(response)
+
+
+async def generate_podcast_async(
+    pdf_file_path: PdfSource,
+    contributions: list[str],
+    method: str,
+    results: str,
+    limitations: str,
+    model: str = "gemini-2.5-pro",
+    custom_instructions: str | None = None,
+    api_key: str | None = None,
+    on_line: Callable[[str], None] | None = None,
+) -> str:
+    input = build_podcast_input(
+        pdf_file_path, contributions, method, results, limitations, custom_instructions
+    )
+    if on_line is not None:
+        lines = []
+        stream = stream_text_response_async(input, model, api_key=api_key)
+        async for line in aiter_script_lines(stream):
+            on_line(line)
+            lines.append(line)
+        return "\n".join(lines)
+
+    response = await generate_text_response_async(
+        input, model, api_key=api_key, stage="script"
+    )
+    return clean_script(response)
+
+
+def format_outline(outline: dict) -> str:
+    points = [f"Running example: {outline['running_example']}"]
+    for name in PodcastOutline.model_fields:
+        if name != "running_example":
+            points.append(name.replace("_", " ").capitalize() + ":")
+            points.extend(f"- {point}" for point in outline[name])
+    return "\n".join(points)
+
+
+def build_section_input(
+    analysis: tuple,
+    custom_instructions: str | None,
+    outline: dict,
+    index: int,
+) -> list:
+    """Input for section index of the script; analysis is (pdf_file_path,
+    contributions, method, results, limitations)."""
+    if index == 0:
+        position = FIRST_SECTION_NOTE
+    elif index == len(PODCAST_SECTIONS) - 1:
+        position = LAST_SECTION_NOTE
+    else:
+        position = MIDDLE_SECTION_NOTE
+    prompt = (
+        podcast_context_prompt
+        + section_prompt.format(
+            outline=format_outline(outline).replace("{", "{{").replace("}", "}}"),
+            section=PODCAST_SECTIONS[index],
+            position=position,
+        )
+        + script_instructions_prompt
+    )
+    return build_podcast_input(*analysis, custom_instructions, prompt=prompt)
+
+
+def join_sections(sections: list[str]) -> str:
+    return "\n\n".join(clean_script(section).strip() for section in sections)
+
+
+def generate_podcast_outline(
+    pdf_file_path: PdfSource,
+    contributions: list[str],
+    method: str,
+    results: str,
+    limitations: str,
+    model: str = "gemini-2.5-pro",
+    custom_instructions: str | None = None,
+    api_key: str | None = None,
+) -> dict:
+    input = build_podcast_input(
+        pdf_file_path,
+        contributions,
+        method,
+        results,
+        limitations,
+        custom_instructions,
+        prompt=podcast_context_prompt + outline_prompt,
+    )
+    return generate_text_response(input, model, PodcastOutline, api_key=api_key)
+
+
+async def generate_podcast_outline_async(
+    pdf_file_path: PdfSource,
+    contributions: list[str],
+    method: str,
+    results: str,
+    limitations: str,
+    model: str = "gemini-2.5-pro",
+    custom_instructions: str | None = None,
+    api_key: str | None = None,
+) -> dict:
+    input = build_podcast_input(
+        pdf_file_path,
+        contributions,
+        method,
+        results,
+        limitations,
+        custom_instructions,
+        prompt=podcast_context_prompt + outline_prompt,
+    )
+    return await generate_text_response_async(
+        input, model, PodcastOutline, api_key=api_key, stage="outline"
+    )
+
+
+def generate_podcast_by_section(
+    pdf_file_path: PdfSource,
+    contributions: list[str],
+    method: str,
+    results: str,
+    limitations: str,
+    model: str = "gemini-2.5-pro",
+    custom_instructions: str | None = None,
+    api_key: str | None = None,
+    on_line: Callable[[str], None] | None = None,
+) -> str:
+    """
+    generate_podcast with the four sections written by concurrent requests.
+
+    A short shared outline is generated first so the sections agree on what
+    each covers, then every section is requested at once against the same
+    paper and analysis. Latency is the outline plus the longest section
+    rather than the whole script. With on_line the first section streams
+    and the later ones are emitted, in order, as soon as they are ready.
+    """
+    analysis = (pdf_file_path, contributions, method, results, limitations)
+    outline = generate_podcast_outline(
+        *analysis, model, custom_instructions, api_key=api_key
+    )
+    inputs = [
+        build_section_input(analysis, custom_instructions, outline, index)
+        for index in range(len(PODCAST_SECTIONS))
+    ]
+    with ThreadPoolExecutor(max_workers=len(inputs)) as executor:
+        first = 1 if on_line is not None else 0
+        futures = [
+            executor.submit(generate_text_response, input, model, api_key=api_key)
+            for input in inputs[first:]
+        ]
+        if on_line is None:
+            return join_sections([future.result() for future in futures])
+
+        lines = []
+        for line in iter_script_lines(stream_text_response(inputs[0], model, api_key=api_key)):
+            on_line(line)
+            lines.append(line)
+        for future in futures:
+            for line in ["", *clean_script(future.result()).strip().split("\n")]:
+                on_line(line)
+                lines.append(line)
+        return "\n".join(lines)
+
+
+async def generate_podcast_by_section_async(
+    pdf_file_path: PdfSource,
+    contributions: list[str],
+    method: str,
+    results: str,
+    limitations: str,
+    model: str = "gemini-2.5-pro",
+    custom_instructions: str | None = None,
+    api_key: str | None = None,
+    on_line: Callable[[str], None] | None = None,
+) -> str:
+    analysis = (pdf_file_path, contributions, method, results, limitations)
+    outline = await generate_podcast_outline_async(
+        *analysis, model, custom_instructions, api_key=api_key
+    )
+    inputs = [
+        build_section_input(analysis, custom_instructions, outline, index)
+        for index in range(len(PODCAST_SECTIONS))
+    ]
+    if on_line is None:
+        sections = await asyncio.gather(
+            *(
+                generate_text_response_async(input, model, api_key=api_key, stage="section")
+                for input in inputs
+            )
+        )
+        return join_sections(sections)
+
+    tasks = [
+        asyncio.ensure_future(
+            generate_text_response_async(input, model, api_key=api_key, stage="section")
+        )
+        for input in inputs[1:]
+    ]
+    try:
+        lines = []
+        stream = stream_text_response_async(inputs[0], model, api_key=api_key)
+        async for line in aiter_script_lines(stream):
+            on_line(line)
+            lines.append(line)
+        for task in tasks:
+            for line in ["", *clean_script(await task).strip().split("\n")]:
+                on_line(line)
+                lines.append(line)
+        return "\n".join(lines)
+    finally:
+        for task in tasks:
+            task.cancel()
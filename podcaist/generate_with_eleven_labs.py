@@ -1,13 +1,57 @@
 import os
 import shutil
 import tempfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable
 
 from elevenlabs import save
 from elevenlabs.client import ElevenLabs
 
-from podcaist.utils import read_text_file, split_text_at_line_breaks
+from podcaist.retry import call_with_retry
+from podcaist.utils import (
+    combine_mp3_files,
+    read_text_file,
+    split_text_at_line_breaks,
+)
+
+ELEVEN_LABS_MAX_CHUNK_CHARS = 3000
+
+
+def generate_eleven_labs_chunk(
+    chunk: str,
+    client: ElevenLabs,
+    voice: str = "nPczCjzI2devNBz1zQrb",
+    model_id: str = "eleven_multilingual_v2",
+    output_format: str = "mp3_44100_128",
+) -> str:
+    """Synthesize one chunk of text into a temp mp3 file and return its path."""
+    audio = client.text_to_speech.convert(
+        text=chunk,
+        voice_id=voice,
+        model_id=model_id,
+        output_format=output_format,
+    )
+
+    mp3_temp_file = tempfile.NamedTemporaryFile(suffix=".mp3", delete=False)
+    save(audio, mp3_temp_file.name)
+    return mp3_temp_file.name
+
+
+def eleven_labs_synthesizer(
+    voice: str = "nPczCjzI2devNBz1zQrb",
+    model_id: str = "eleven_multilingual_v2",
+    output_format: str = "mp3_44100_128",
+) -> Callable[[str], str]:
+    """chunk → mp3 path function sharing one client across chunks."""
+    client = ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"))
+    return partial(
+        generate_eleven_labs_chunk,
+        client=client,
+        voice=voice,
+        model_id=model_id,
+        output_format=output_format,
+    )
 
 
 def generate_eleven_labs_audio(
@@ -20,55 +64,20 @@ def generate_eleven_labs_audio(
 ) -> str:
 
     assert remote, "Eleven Labs is not supported locally"
-    api_key = os.getenv("ELEVENLABS_API_KEY")
-    client = ElevenLabs(api_key=api_key)
+    synthesize = eleven_labs_synthesizer(voice, model_id, output_format)
 
     # Split text into chunks if needed
-    text_chunks = split_text_at_line_breaks(text)
-
-    # Process each chunk in parallel and combine the audio files
-    def generate_chunk_audio(chunk: str, chunk_index: int) -> tuple[int, str]:
-        audio = client.text_to_speech.convert(
-            text=chunk,
-            voice_id=voice,
-            model_id=model_id,
-            output_format=output_format,
-        )
-
-        mp3_temp_file = tempfile.NamedTemporaryFile(suffix=".mp3", delete=False)
-        save(audio, mp3_temp_file.name)
-        return chunk_index, mp3_temp_file.name
-
-    temp_files = [None] * len(text_chunks)  # Pre-allocate list to maintain order
+    text_chunks = split_text_at_line_breaks(text, ELEVEN_LABS_MAX_CHUNK_CHARS)
+
+    # Process each chunk in parallel and combine the audio files in order
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_chunk = {
-            executor.submit(generate_chunk_audio, chunk, i): chunk
-            for i, chunk in enumerate(text_chunks)
-        }
-        for future in as_completed(future_to_chunk):
-            chunk_index, temp_file = future.result()
-            temp_files[chunk_index] = temp_file
-
-    # If we only have one chunk, return it directly
-    if len(temp_files) == 1:
-        return temp_files[0]
-
-    # Combine multiple audio files
-    from pydub import AudioSegment
-
-    combined = AudioSegment.from_mp3(temp_files[0])
-    for temp_file in temp_files[1:]:
-        combined += AudioSegment.from_mp3(temp_file)
-
-    # Save the combined audio
-    final_temp_file = tempfile.NamedTemporaryFile(suffix=".mp3", delete=False)
-    combined.export(final_temp_file.name, format="mp3")
-
-    # Clean up intermediate files
-    for temp_file in temp_files:
-        os.unlink(temp_file)
-
-    return final_temp_file.name
+        futures = [
+            executor.submit(call_with_retry, "elevenlabs", synthesize, chunk)
+            for chunk in text_chunks
+        ]
+        temp_files = [future.result() for future in futures]
+
+    return combine_mp3_files(temp_files)
 
 
 if __name__ == "__main__":
@@ -3,12 +3,63 @@ import json
 import os
 import shutil
 import tempfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable
 
 import requests
 
-from podcaist.utils import read_text_file, split_text_at_line_breaks
+from podcaist.retry import call_with_retry
+from podcaist.utils import (
+    combine_mp3_files,
+    read_text_file,
+    split_text_at_line_breaks,
+)
+
+INWORLD_MAX_CHUNK_CHARS = 2000
+
+
+def generate_inworld_chunk(
+    chunk: str,
+    api_key: str | None,
+    voice: str = "Edward",
+    model_id: str = "inworld-tts-1",
+) -> str:
+    """Synthesize one chunk of text into a temp mp3 file and return its path."""
+    url = "https://api.inworld.ai/tts/v1/voice"
+    headers = {
+        "Authorization": f"Basic {api_key}",
+        "Content-Type": "application/json",
+    }
+    data = {
+        "text": chunk,
+        "voiceId": voice,
+        "modelId": model_id,
+    }
+    response = requests.request("POST", url, json=data, headers=headers)
+    response.raise_for_status()
+    response_data = response.json()
+
+    mp3_temp_file = tempfile.NamedTemporaryFile(suffix=".mp3", delete=False)
+    # Extract audio content from the audioContent field
+    if "audioContent" not in response_data:
+        print("No audio content in response", response_data)
+        raise ValueError(f"No audio content in response: {response_data}")
+    audio_bytes = base64.b64decode(response_data["audioContent"])
+    mp3_temp_file.write(audio_bytes)
+    mp3_temp_file.flush()
+    return mp3_temp_file.name
+
+
+def inworld_synthesizer(
+    voice: str = "Edward", model_id: str = "inworld-tts-1"
+) -> Callable[[str], str]:
+    return partial(
+        generate_inworld_chunk,
+        api_key=os.getenv("INWORLD_API_KEY"),
+        voice=voice,
+        model_id=model_id,
+    )
 
 
 def generate_inworld_audio(
@@ -20,66 +71,20 @@ def generate_inworld_audio(
 ) -> str:
 
     assert remote, "Inworld is not supported locally"
-    api_key = os.getenv("INWORLD_API_KEY")
+    synthesize = inworld_synthesizer(voice, model_id)
 
     # Split text into chunks if needed
-    text_chunks = split_text_at_line_breaks(text, 2000)
-
-    # Process each chunk in parallel and combine the audio files
-    def generate_chunk_audio(chunk: str, chunk_index: int) -> tuple[int, str]:
-        url = "https://api.inworld.ai/tts/v1/voice"
-        headers = {
-            "Authorization": f"Basic {api_key}",
-            "Content-Type": "application/json",
-        }
-        data = {
-            "text": chunk,
-            "voiceId": voice,
-            "modelId": model_id,
-        }
-        response = requests.request("POST", url, json=data, headers=headers)
-        response_data = response.json()
-
-        mp3_temp_file = tempfile.NamedTemporaryFile(suffix=".mp3", delete=False)
-        # Extract audio content from the audioContent field
-        if "audioContent" not in response_data:
-            print("No audio content in response", response_data)
-            raise ValueError(f"No audio content in response: {response_data}")
-        audio_bytes = base64.b64decode(response_data["audioContent"])
-        mp3_temp_file.write(audio_bytes)
-        mp3_temp_file.flush()
-        return chunk_index, mp3_temp_file.name
-
-    temp_files = [None] * len(text_chunks)  # Pre-allocate list to maintain order
+    text_chunks = split_text_at_line_breaks(text, INWORLD_MAX_CHUNK_CHARS)
+
+    # Process each chunk in parallel and combine the audio files in order
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_chunk = {
-            executor.submit(generate_chunk_audio, chunk, i): chunk
-            for i, chunk in enumerate(text_chunks)
-        }
-        for future in as_completed(future_to_chunk):
-            chunk_index, temp_file = future.result()
-            temp_files[chunk_index] = temp_file
-
-    # If we only have one chunk, return it directly
-    if len(temp_files) == 1:
-        return temp_files[0]
-
-    # Combine multiple audio files
-    from pydub import AudioSegment
-
-    combined = AudioSegment.from_mp3(temp_files[0])
-    for temp_file in temp_files[1:]:
-        combined += AudioSegment.from_mp3(temp_file)
-
-    # Save the combined audio
-    final_temp_file = tempfile.NamedTemporaryFile(suffix=".mp3", delete=False)
-    combined.export(final_temp_file.name, format="mp3")
-
-    # Clean up intermediate files
-    for temp_file in temp_files:
-        os.unlink(temp_file)
-
-    return final_temp_file.name
+        futures = [
+            executor.submit(call_with_retry, "inworld", synthesize, chunk)
+            for chunk in text_chunks
+        ]
+        temp_files = [future.result() for future in futures]
+
+    return combine_mp3_files(temp_files)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,155 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Awaitable, Callable
+
+
+def _parse_backups(value: str) -> dict[str, str]:
+    """{model: backup} from "model=backup,model=backup"."""
+    backups = {}
+    for pair in value.split(","):
+        if "=" in pair:
+            model, backup = pair.split("=", 1)
+            backups[model.strip()] = backup.strip()
+    return backups
+
+
+class Hedger:
+    """
+    Hedged requests for tail latency.
+
+    Latencies are kept per key (stage and model). Once a key has min_samples
+    of them, a request still running after the percentile of that history
+    gets a backup request started next to it; whichever succeeds first is
+    used and the other is cancelled. Keys without enough history, and models
+    without a backup, are never hedged.
+
+    Requests are timed from when they reach the provider, not from when they
+    were queued: primary and backup are called with a function to call once
+    the provider call starts, i.e. once the rate limiter has admitted it.
+    Otherwise throttling would look like a slow provider and set off hedges
+    that only add to the load.
+    """
+
+    def __init__(
+        self,
+        backups: dict[str, str] | None = None,
+        percentile: float = 95.0,
+        min_samples: int = 5,
+        history_size: int = 200,
+        min_delay_seconds: float = 5.0,
+    ):
+        self.backups = dict(backups or {})
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.history_size = history_size
+        self.min_delay_seconds = min_delay_seconds
+        self._lock = threading.Lock()
+        self._latencies: dict[str, deque[float]] = {}
+        self.hedged: Counter = Counter()
+        self.wins: Counter = Counter()
+
+    def set_backup(self, model: str, backup_model: str | None) -> None:
+        """Hedge requests to model with backup_model; None stops hedging it."""
+        if backup_model is None:
+            self.backups.pop(model, None)
+        else:
+            self.backups[model] = backup_model
+
+    def record(self, key: str, seconds: float) -> None:
+        with self._lock:
+            latencies = self._latencies.setdefault(key, deque(maxlen=self.history_size))
+            latencies.append(seconds)
+
+    def hedge_delay(self, key: str) -> float | None:
+        """Seconds after which a request for key is hedged, None if never."""
+        with self._lock:
+            latencies = sorted(self._latencies.get(key, ()))
+        if len(latencies) < self.min_samples:
+            return None
+        index = max(0, math.ceil(self.percentile / 100 * len(latencies)) - 1)
+        return max(self.min_delay_seconds, latencies[index])
+
+    async def run(
+        self,
+        key: str,
+        primary: Callable[[Callable[[], None]], Awaitable[Any]],
+        backup: Callable[[Callable[[], None]], Awaitable[Any]] | None = None,
+    ) -> tuple[bool, Any]:
+        """(whether the backup's result was used, result)"""
+        delay = self.hedge_delay(key) if backup is not None else None
+        admitted = asyncio.Event()
+        started_at = []  # of each attempt, retries included
+
+        def on_admitted() -> None:
+            started_at.append(time.monotonic())
+            admitted.set()
+
+        def record_primary() -> None:
+            if started_at:  # a primary that never reached the provider says nothing
+                self.record(key, time.monotonic() - started_at[-1])
+
+        primary_task = asyncio.ensure_future(primary(on_admitted))
+        tasks = [primary_task]
+        try:
+            if delay is not None:
+                admission = asyncio.ensure_future(admitted.wait())
+                await asyncio.wait(
+                    [primary_task, admission], return_when=asyncio.FIRST_COMPLETED
+                )
+                admission.cancel()
+                done = {primary_task} if primary_task.done() else set()
+                if not done:
+                    remaining = delay - (time.monotonic() - started_at[0])
+                    done, _ = await asyncio.wait(tasks, timeout=max(0.0, remaining))
+                if not done:
+                    with self._lock:
+                        self.hedged[key] += 1
+                    print(
+                        f"Warning: {key} request still running after {delay:.1f}s, "
+                        "sending a hedged request"
+                    )
+                    tasks.append(asyncio.ensure_future(backup(lambda: None)))
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        continue  # the other request may still succeed
+                    if task is primary_task:
+                        record_primary()
+                        return False, task.result()
+                    # the primary was at least this slow, keep that in the history
+                    record_primary()
+                    with self._lock:
+                        self.wins[key] += 1
+                    return True, task.result()
+            return False, primary_task.result()  # every request failed
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hedged": sum(self.hedged.values()),
+                "hedge_wins": sum(self.wins.values()),
+                "by_key": {
+                    key: {"hedged": count, "hedge_wins": self.wins[key]}
+                    for key, count in self.hedged.items()
+                },
+            }
+
+
+# PODCAIST_HEDGE_MODELS="gemini-2.5-pro=gpt-4.1-2025-04-14,..." names a backup
+# per model; without one a model's requests are never hedged.
+HEDGER = Hedger(
+    backups=_parse_backups(os.getenv("PODCAIST_HEDGE_MODELS", "")),
+    percentile=float(os.getenv("PODCAIST_HEDGE_PERCENTILE", 95)),
+)
@@ -1,5 +1,17 @@
 from podcaist.model_garden import generate_text_response, generate_text_response_async
-from podcaist.utils import format_contributions
+from podcaist.utils import PdfSource, format_contributions
+
+# Limitations come from the evaluation and the authors' own discussion.
+SECTION_KEYWORDS = (
+    "experiment",
+    "result",
+    "evaluation",
+    "ablation",
+    "discussion",
+    "limitation",
+    "conclusion",
+    "future work",
+)
 
 prompt = """Attached is a research paper that I am seeking a deeper understanding of. \
 I want you to examine the authors stated contributions as well as the contributions listed below \
@@ -14,7 +26,7 @@ Here are the contributions:
 
 
 def limitations(
-    pdf_file_path: str, contributions: list[str], model: str = "gpt-4o-mini-2024-07-18", api_key: str | None = None
+    pdf_file_path: PdfSource, contributions: list[str], model: str = "gpt-4o-mini-2024-07-18", api_key: str | None = None
 ) -> str:
     formatted_contributions = format_contributions(contributions)
     input = [
@@ -30,12 +42,14 @@ def limitations(
 
 
 async def limitations_async(
-    pdf_file_path: str, contributions: list[str], model: str = "gpt-4o-mini-2024-07-18", api_key: str | None = None
+    pdf_file_path: PdfSource, contributions: list[str], model: str = "gpt-4o-mini-2024-07-18", api_key: str | None = None
 ) -> str:
     formatted_contributions = format_contributions(contributions)
     input = [
         ("pdf", pdf_file_path),
         ("text", prompt.format(contributions=formatted_contributions)),
     ]
-    response = await generate_text_response_async(input, model, api_key=api_key)
+    response = await generate_text_response_async(
+        input, model, api_key=api_key, stage="limitations"
+    )
     return response
@@ -0,0 +1,184 @@
+import asyncio
+
+import fitz  # PyMuPDF
+
+from podcaist.contributions import Contributions, summarize_contributions_async
+from podcaist.limitations import limitations_async
+from podcaist.method import method_async
+from podcaist.model_garden import generate_text_response_async, prepare_pdf_input
+from podcaist.results import results_async
+from podcaist.utils import PdfDocument, PdfSource
+
+# Shards analysed at once per paper; the rest queue behind them.
+MAX_CONCURRENT_SHARDS = 4
+
+reduce_contributions_prompt = """\
+A long document was split into consecutive page ranges and the key contributions were \
+extracted from each range separately. Merge them into a single view of the whole document: \
+remove duplicates, keep the contributions that matter for the document as a whole, and \
+explain why the research community should care about it.
+
+{shard_contributions}
+"""
+
+reduce_notes_prompt = """\
+A long document was split into consecutive page ranges and the notes below about its \
+{stage} were written separately for each range, in order. Merge them into a single \
+coherent explanation of the {stage} of the whole document. Keep every important detail, \
+drop repetition, and resolve references between ranges. Do not mention the page ranges.
+
+{shard_notes}
+"""
+
+
+def get_page_count(pdf: PdfSource) -> int:
+    doc = fitz.open(stream=PdfDocument.load(pdf).data, filetype="pdf")
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
+
+
+def split_pdf(pdf: PdfSource, pages_per_shard: int) -> list[bytes]:
+    """Split a PDF into consecutive shards of at most pages_per_shard pages."""
+    source = fitz.open(stream=PdfDocument.load(pdf).data, filetype="pdf")
+    shards = []
+    try:
+        for start in range(0, source.page_count, pages_per_shard):
+            shard = fitz.open()
+            shard.insert_pdf(
+                source,
+                from_page=start,
+                to_page=min(start + pages_per_shard, source.page_count) - 1,
+            )
+            shards.append(shard.tobytes(garbage=4, deflate=True))
+            shard.close()
+    finally:
+        source.close()
+    return shards
+
+
+def _format_shards(outputs: list[str], label: str) -> str:
+    return "\n\n".join(
+        f"{label} from part {i + 1} of {len(outputs)}:\n{output}"
+        for i, output in enumerate(outputs)
+    )
+
+
+async def _map(coroutines: list, limit: int) -> list:
+    """gather with at most limit coroutines running at once."""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(run(coroutine) for coroutine in coroutines))
+
+
+async def reduce_contributions_async(
+    shard_contributions: list[dict], model: str, api_key: str | None = None
+) -> dict:
+    formatted = [
+        "\n".join(f"- {c}" for c in contributions["key_contributions"])
+        for contributions in shard_contributions
+    ]
+    prompt = reduce_contributions_prompt.format(
+        shard_contributions=_format_shards(formatted, "Contributions")
+    )
+    return await generate_text_response_async(
+        [("text", prompt)],
+        model,
+        Contributions,
+        api_key=api_key,
+        stage="reduce_contributions",
+    )
+
+
+async def reduce_notes_async(
+    stage: str, shard_notes: list[str], model: str, api_key: str | None = None
+) -> str:
+    if len(shard_notes) == 1:
+        return shard_notes[0]
+    prompt = reduce_notes_prompt.format(
+        stage=stage, shard_notes=_format_shards(shard_notes, "Notes")
+    )
+    return await generate_text_response_async(
+        [("text", prompt)], model, api_key=api_key, stage=f"reduce_{stage}"
+    )
+
+
+async def analyze_long_document_async(
+    pdf_file_path: PdfSource,
+    model: str,
+    pages_per_shard: int,
+    pdf_input_mode: str = "pdf",
+    api_key: str | None = None,
+    max_concurrent_shards: int = MAX_CONCURRENT_SHARDS,
+    stage_models: dict[str, str] | None = None,
+) -> tuple[dict, str, str, str, PdfSource]:
+    """
+    Map-reduce version of the contributions / method / results / limitations
+    analysis for documents too long for a single request.
+
+    The PDF is split into page-range shards and every stage runs on the shards
+    concurrently (map), then one text-only call per stage merges the shard
+    outputs (reduce). Each request only ever holds one shard, so cost and
+    latency grow with the page count instead of failing at the context limit.
+
+    Returns (contributions, method, results, limitations, script_input) where
+    script_input is the first shard (title, abstract, introduction), which
+    grounds the final script generation.
+
+    stage_models overrides model for the contributions, method, results and
+    limitations stages, each with its reduce step.
+    """
+    stage_models = stage_models or {}
+    def prepare_shards() -> list:
+        return [
+            prepare_pdf_input(PdfDocument(shard), pdf_input_mode)
+            for shard in split_pdf(pdf_file_path, pages_per_shard)
+        ]
+
+    shards = await asyncio.to_thread(prepare_shards)
+
+    shard_contributions = await _map(
+        [
+            summarize_contributions_async(
+                shard, stage_models.get("contributions", model), api_key=api_key
+            )
+            for shard in shards
+        ],
+        max_concurrent_shards,
+    )
+    contributions = await reduce_contributions_async(
+        shard_contributions, stage_models.get("contributions", model), api_key=api_key
+    )
+
+    stages = {
+        "method": method_async,
+        "results": results_async,
+        "limitations": limitations_async,
+    }
+    shard_outputs = await _map(
+        [
+            stage_function(
+                shard, contributions, stage_models.get(stage, model), api_key=api_key
+            )
+            for stage, stage_function in stages.items()
+            for shard in shards
+        ],
+        max_concurrent_shards,
+    )
+    method_text, results_text, limitation_text = await asyncio.gather(
+        *(
+            reduce_notes_async(
+                stage,
+                shard_outputs[i * len(shards) : (i + 1) * len(shards)],
+                stage_models.get(stage, model),
+                api_key=api_key,
+            )
+            for i, stage in enumerate(stages)
+        )
+    )
+    return contributions, method_text, results_text, limitation_text, shards[0]
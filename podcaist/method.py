@@ -1,5 +1,20 @@
 from podcaist.contributions import format_contributions
 from podcaist.model_garden import generate_text_response, generate_text_response_async
+from podcaist.utils import PdfSource
+
+# Section titles this stage needs when the paper is routed by section
+# (see pdf_sections.slice_pdf_for_stage); the first page is always kept.
+SECTION_KEYWORDS = (
+    "method",
+    "approach",
+    "model",
+    "architecture",
+    "algorithm",
+    "framework",
+    "preliminar",
+    "background",
+    "formulation",
+)
 
 prompt = """Attached is a pdf of a research paper as well as what I determined are the main contributions. \
 I want you to dive deep into the method used to attain these contributions and results as well. \
@@ -21,7 +36,7 @@ Here are the contributions:
 
 
 def method(
-    pdf_file_path: str, contributions: dict, model: str = "gpt-4o-mini-2024-07-18", api_key: str | None = None
+    pdf_file_path: PdfSource, contributions: dict, model: str = "gpt-4o-mini-2024-07-18", api_key: str | None = None
 ) -> str:
     formatted_contributions = format_contributions(contributions)
     input = [
@@ -37,12 +52,14 @@ def method(
 
 
 async def method_async(
-    pdf_file_path: str, contributions: dict, model: str = "gpt-4o-mini-2024-07-18", api_key: str | None = None
+    pdf_file_path: PdfSource, contributions: dict, model: str = "gpt-4o-mini-2024-07-18", api_key: str | None = None
 ) -> str:
     formatted_contributions = format_contributions(contributions)
     input = [
         ("pdf", pdf_file_path),
         ("text", prompt.format(contributions=formatted_contributions)),
     ]
-    response = await generate_text_response_async(input, model, api_key=api_key)
+    response = await generate_text_response_async(
+        input, model, api_key=api_key, stage="method"
+    )
     return response
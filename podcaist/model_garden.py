@@ -1,13 +1,36 @@
-from typing import Callable, Optional
+import asyncio
+import base64
+import os
+from contextlib import AsyncExitStack, ExitStack
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Iterator, Optional
 
+from google.genai.types import Part
 from pydantic import BaseModel
 
-from podcaist.gemini_request import (generate_gemini_response,
+from podcaist.gemini_request import (create_cached_content,
+                                     create_cached_content_async,
+                                     delete_cached_content,
+                                     delete_cached_content_async,
+                                     generate_gemini_response,
                                      generate_gemini_response_async,
-                                     get_pdf_for_prompt)
+                                     get_pdf_for_prompt,
+                                     stream_gemini_response,
+                                     stream_gemini_response_async)
 from podcaist.openai_request import (generate_openai_response,
                                      generate_openai_response_async,
-                                     get_file_id)
+                                     get_file_id, stream_openai_response,
+                                     stream_openai_response_async)
+from podcaist.disk_cache import make_cache_key
+from podcaist.hedging import HEDGER
+from podcaist.pdf_text import ExtractedPaper, extract_paper
+from podcaist.pdf_utils import pdf_profile
+from podcaist.rate_limit import MODEL_LIMITS, PROVIDER_LIMITS, RateLimiter
+from podcaist.response_cache import (get_cached_response, put_cached_response,
+                                     response_cache_enabled)
+from podcaist.retry import call_with_retry, call_with_retry_async, single_attempt
+from podcaist.single_flight import SingleFlight
+from podcaist.utils import PdfDocument, PdfSource, sha256_bytes, sha256_file
 
 MODEL_TO_PROVIDER_MAP = {
     "gpt-4o-mini-2024-07-18": "openai",
@@ -30,6 +53,79 @@ PROVIDER_TO_FUNCTION_MAP_ASYNC = {
     "google": generate_gemini_response_async,
 }
 
+PROVIDER_TO_STREAM_FUNCTION_MAP = {
+    "openai": stream_openai_response,
+    "google": stream_gemini_response,
+}
+
+PROVIDER_TO_STREAM_FUNCTION_MAP_ASYNC = {
+    "openai": stream_openai_response_async,
+    "google": stream_gemini_response_async,
+}
+
+
+# How a paper is handed to the model: the PDF itself, or text (plus a few
+# figure crops) extracted locally with PyMuPDF, which costs far fewer input
+# tokens than the PDF attachment.
+PDF_INPUT_MODES = ("pdf", "text", "text_with_figures")
+
+EXTRACTED_PAPER_PREAMBLE = """\
+The attached paper has been converted to text below. Page markers look like <page N>, \
+headings and tables use markdown and figure/table captions are in square brackets.
+
+"""
+
+
+def prepare_pdf_input(
+    pdf: PdfSource, input_mode: str = "pdf", max_figures: int = 4
+) -> PdfSource | ExtractedPaper:
+    """Convert a paper once for the chosen input mode, before the stage fan-out."""
+    if input_mode == "pdf":
+        return pdf
+    elif input_mode == "text":
+        return extract_paper(pdf)
+    elif input_mode == "text_with_figures":
+        return extract_paper(pdf, max_figures=max_figures)
+    else:
+        raise ValueError(f"Invalid input mode {input_mode}, expected one of {PDF_INPUT_MODES}")
+
+
+# Lifetime of a paper's Gemini context cache. Runs delete the entry when they
+# finish; the TTL only matters if a run dies before it can.
+GEMINI_CACHE_TTL_SECONDS = int(os.getenv("PODCAIST_GEMINI_CACHE_TTL", 1800))
+
+
+@dataclass
+class GeminiCachedPaper:
+    """A paper stored once as Gemini cached content for the stage fan-out.
+
+    Requests to model reference the cache by name and only send their prompt;
+    requests to any other model get paper inline as usual.
+    """
+
+    name: str
+    model: str
+    paper: PdfSource | ExtractedPaper
+
+
+PaperInput = PdfSource | ExtractedPaper | GeminiCachedPaper
+
+# Identical requests in flight at once, keyed like the response cache
+IN_FLIGHT = SingleFlight()
+
+# Every provider request from every stage and paper is admitted through here
+RATE_LIMITER = RateLimiter(PROVIDER_LIMITS, MODEL_LIMITS)
+
+# Rough sizes for token estimates made before a request is sent
+CHARS_PER_TOKEN = 4
+PDF_BYTES_PER_TOKEN = 20  # compressed papers; text-heavy PDFs run denser
+TOKENS_PER_FIGURE = 500
+ESTIMATED_OUTPUT_TOKENS = 2000
+# Tokens each provider bills per PDF page besides the page's text: Gemini and
+# OpenAI both send the model an image of every page, which also covers the
+# figures embedded in it.
+PDF_PAGE_TOKENS = {"google": 258, "openai": 765}
+
 
 def get_provider(model: str) -> str:
     return MODEL_TO_PROVIDER_MAP[model]
@@ -47,15 +143,245 @@ def get_function_for_model(model: str, async_mode: bool = False) -> Callable:
     return get_function(get_provider(model), async_mode)
 
 
+def _gemini_cache_supported(model: str) -> bool:
+    if get_provider(model) != "google":
+        print(f"Warning: Context caching is Gemini only, sending the paper inline to {model}")
+        return False
+    return True
+
+
+def create_gemini_paper_cache(
+    paper: PdfSource | ExtractedPaper,
+    model: str,
+    ttl_seconds: int = GEMINI_CACHE_TTL_SECONDS,
+    api_key: str | None = None,
+) -> GeminiCachedPaper | None:
+    """
+    Cache a paper on Gemini so every stage for model reuses it.
+
+    Returns None when caching is not possible (non-Gemini model, paper below
+    the model's minimum cacheable size, API error); callers then keep sending
+    the paper inline. Delete the cache with delete_gemini_paper_cache.
+    """
+    if not _gemini_cache_supported(model):
+        return None
+    try:
+        name = create_cached_content(
+            get_gemini_paper_parts(paper, api_key=api_key), model, ttl_seconds, api_key=api_key
+        )
+    except Exception as e:
+        print(f"Warning: Could not cache the paper, sending it inline instead: {e}")
+        return None
+    return GeminiCachedPaper(name=name, model=model, paper=paper)
+
+
+async def create_gemini_paper_cache_async(
+    paper: PdfSource | ExtractedPaper,
+    model: str,
+    ttl_seconds: int = GEMINI_CACHE_TTL_SECONDS,
+    api_key: str | None = None,
+) -> GeminiCachedPaper | None:
+    if not _gemini_cache_supported(model):
+        return None
+    try:
+        # reading the paper (and uploading it, with Files API uploads) blocks
+        parts = await asyncio.to_thread(get_gemini_paper_parts, paper, api_key)
+        name = await create_cached_content_async(parts, model, ttl_seconds, api_key=api_key)
+    except Exception as e:
+        print(f"Warning: Could not cache the paper, sending it inline instead: {e}")
+        return None
+    return GeminiCachedPaper(name=name, model=model, paper=paper)
+
+
+def delete_gemini_paper_cache(
+    cache: GeminiCachedPaper, api_key: str | None = None
+) -> None:
+    try:
+        delete_cached_content(cache.name, api_key=api_key)
+    except Exception as e:
+        print(f"Warning: Could not delete cached content {cache.name}: {e}")
+
+
+async def delete_gemini_paper_cache_async(
+    cache: GeminiCachedPaper, api_key: str | None = None
+) -> None:
+    try:
+        await delete_cached_content_async(cache.name, api_key=api_key)
+    except Exception as e:
+        print(f"Warning: Could not delete cached content {cache.name}: {e}")
+
+
+def resolve_cached_paper(
+    input_contents: list[tuple[str, PaperInput]], model: str
+) -> tuple[list[tuple[str, PaperInput]], dict]:
+    """Drop a cached paper from the inputs and return the provider kwargs that
+    reference it instead, or inline the paper if the cache is for another model."""
+    paper = input_contents[0][1]
+    if not isinstance(paper, GeminiCachedPaper):
+        return input_contents, {}
+    if paper.model != model:
+        return [("pdf", paper.paper), *input_contents[1:]], {}
+    return list(input_contents[1:]), {"cached_content": paper.name}
+
+
+def paper_fingerprint(paper: PaperInput) -> str:
+    """Content hash of a paper input, the same however the paper is passed."""
+    if isinstance(paper, GeminiCachedPaper):
+        return paper_fingerprint(paper.paper)
+    if isinstance(paper, ExtractedPaper):
+        return make_cache_key(
+            sha256_bytes(paper.text.encode("utf-8")),
+            [sha256_bytes(figure) for figure in paper.figures],
+        )
+    if isinstance(paper, PdfDocument):
+        return paper.sha256
+    if isinstance(paper, str):
+        return sha256_file(paper)
+    return sha256_bytes(paper)
+
+
+def response_cache_key(
+    input_contents: list[tuple[str, PaperInput]],
+    model: str,
+    response_format: Optional[BaseModel] = None,
+) -> str:
+    contents = [
+        (kind, paper_fingerprint(content) if kind == "pdf" else content)
+        for kind, content in input_contents
+    ]
+    schema = response_format.model_json_schema() if response_format else None
+    return make_cache_key(get_provider(model), model, contents, schema)
+
+
+def estimate_paper_tokens(paper: PaperInput, provider: str | None = None) -> int:
+    """
+    Input tokens of a paper, without sending it anywhere.
+
+    With a provider a PDF is sized from its page and text counts the way that
+    provider bills them, which needs it parsed once per PdfDocument
+    (pdf_utils.pdf_profile); without one, roughly from its bytes.
+    """
+    if isinstance(paper, GeminiCachedPaper):
+        return estimate_paper_tokens(paper.paper, provider)
+    if isinstance(paper, ExtractedPaper):
+        return (
+            len(paper.text) // CHARS_PER_TOKEN
+            + len(paper.figures) * TOKENS_PER_FIGURE
+        )
+    if provider is not None:
+        profile = pdf_profile(paper)
+        return (
+            profile.pages * PDF_PAGE_TOKENS[provider]
+            + profile.text_chars // CHARS_PER_TOKEN
+        )
+    if isinstance(paper, str):
+        return os.path.getsize(paper) // PDF_BYTES_PER_TOKEN
+    return len(paper) // PDF_BYTES_PER_TOKEN
+
+
+def estimate_request_tokens(
+    input_contents: list[tuple[str, PaperInput]], model: str
+) -> int:
+    """Input plus expected output tokens of a request to model, from the
+    prompt and the paper's pages as model's provider bills them. Parses the
+    PDF the first time, so async callers run it off the loop."""
+    provider = get_provider(model)
+    return ESTIMATED_OUTPUT_TOKENS + sum(
+        estimate_paper_tokens(content, provider)
+        if kind == "pdf"
+        else len(content) // CHARS_PER_TOKEN
+        for kind, content in input_contents
+    )
+
+
+def _cached_response(key: str) -> str | dict | None:
+    return get_cached_response(key) if response_cache_enabled() else None
+
+
+def _store_response(key: str, output: str | dict) -> None:
+    if response_cache_enabled():
+        put_cached_response(key, output)
+
+
+def _call_provider(
+    input_contents: list[tuple[str, PaperInput]],
+    model: str,
+    response_format: Optional[BaseModel],
+    api_key: str | None,
+) -> str | dict:
+    tokens = estimate_request_tokens(input_contents, model)
+    input_contents, provider_kwargs = resolve_cached_paper(input_contents, model)
+    formatted_input_contents = generate_input_contents(
+        input_contents, model, api_key=api_key
+    )
+    provider = get_provider(model)
+    attempt = single_attempt(get_function_for_model(model))
+
+    # every attempt is admitted on its own, so retries count against the
+    # limits and no slot is held while backing off
+    def limited_attempt():
+        with RATE_LIMITER.limit(provider, model, tokens):
+            return attempt(
+                formatted_input_contents,
+                model,
+                response_format,
+                api_key=api_key,
+                **provider_kwargs,
+            )
+
+    return call_with_retry(provider, limited_attempt)
+
+
+async def _call_provider_async(
+    input_contents: list[tuple[str, PaperInput]],
+    model: str,
+    response_format: Optional[BaseModel],
+    api_key: str | None,
+    on_admitted: Callable[[], None] | None = None,
+) -> str | dict:
+    """on_admitted is called each time an attempt gets past the rate limiter
+    and is sent, e.g. to time only the provider's part (see hedging)."""
+    tokens = await asyncio.to_thread(estimate_request_tokens, input_contents, model)
+    input_contents, provider_kwargs = resolve_cached_paper(input_contents, model)
+    # reads the PDF and, for OpenAI, may upload it: keep that off the loop
+    formatted_input_contents = await asyncio.to_thread(
+        generate_input_contents, input_contents, model, api_key=api_key
+    )
+    provider = get_provider(model)
+    attempt = single_attempt(get_function_for_model(model, True))
+
+    async def limited_attempt():
+        async with RATE_LIMITER.limit_async(provider, model, tokens):
+            on_admitted and on_admitted()
+            return await attempt(
+                formatted_input_contents,
+                model,
+                response_format,
+                api_key=api_key,
+                **provider_kwargs,
+            )
+
+    return await call_with_retry_async(provider, limited_attempt)
+
+
 def generate_text_response(
-    input_contents: list[tuple[str, str]],
+    input_contents: list[tuple[str, PaperInput]],
     model: str = "gpt-4o-mini-2024-07-18",
     response_format: Optional[BaseModel] = None,
     api_key: str | None = None,
+    use_cache: bool = True,
 ) -> str:
     """Input contents should be a dict with the type (pdf or text) and then the actual content
 
-    If the type is pdf it should be the path to the pdf file.
+    If the type is pdf it should be the path to the pdf file or its bytes
+    (e.g. the output of compress_pdf_bytes), which are sent without touching disk,
+    an ExtractedPaper from prepare_pdf_input, which is sent as text, or a
+    GeminiCachedPaper, which is referenced by its cache name.
+
+    Responses are cached on disk (see podcaist.response_cache;
+    PODCAIST_NO_RESPONSE_CACHE=1 turns that off) and identical requests in
+    flight at the same time share one provider call. use_cache=False skips
+    both and always calls the model.
     """
     assert (
         len(input_contents) <= 2
@@ -63,27 +389,126 @@ def generate_text_response(
     assert (
         input_contents[0][0] == "pdf" or input_contents[0][0] == "text"
     ), "The first input should be the path to the pdf file or the text"
-    formatted_input_contents = generate_input_contents(input_contents, model)
-    return get_function_for_model(model)(
-        formatted_input_contents, model, response_format, api_key=api_key
+    if not use_cache:
+        return _call_provider(input_contents, model, response_format, api_key)
+
+    key = response_cache_key(input_contents, model, response_format)
+    cached = _cached_response(key)
+    if cached is not None:
+        return cached
+
+    def call():
+        output = _call_provider(input_contents, model, response_format, api_key)
+        _store_response(key, output)
+        return output
+
+    return IN_FLIGHT.run(key, call)
+
+
+def stream_text_response(
+    input_contents: list[tuple[str, PaperInput]],
+    model: str = "gpt-4o-mini-2024-07-18",
+    api_key: str | None = None,
+    use_cache: bool = True,
+) -> Iterator[str]:
+    """generate_text_response for plain-text output, yielded in pieces as the
+    provider streams it. A cached response is yielded whole, and the full
+    text is cached once the stream ends."""
+    key = response_cache_key(input_contents, model) if use_cache else None
+    cached = _cached_response(key) if key else None
+    if cached is not None:
+        yield cached
+        return
+
+    tokens = estimate_request_tokens(input_contents, model)
+    input_contents, provider_kwargs = resolve_cached_paper(input_contents, model)
+    formatted_input_contents = generate_input_contents(
+        input_contents, model, api_key=api_key
+    )
+    provider = get_provider(model)
+    attempt = single_attempt(PROVIDER_TO_STREAM_FUNCTION_MAP[provider])
+
+    # opening the stream is retried with each attempt admitted on its own;
+    # the slot of the attempt that opened it is held until the stream ends
+    def open_stream():
+        with ExitStack() as stack:
+            stack.enter_context(RATE_LIMITER.limit(provider, model, tokens))
+            stream = attempt(
+                formatted_input_contents, model, api_key=api_key, **provider_kwargs
+            )
+            return stack.pop_all(), stream
+
+    limit, stream = call_with_retry(provider, open_stream)
+    pieces = []
+    with limit:
+        for piece in stream:
+            pieces.append(piece)
+            yield piece
+    if key:
+        _store_response(key, "".join(pieces))
+
+
+async def stream_text_response_async(
+    input_contents: list[tuple[str, PaperInput]],
+    model: str = "gpt-4o-mini-2024-07-18",
+    api_key: str | None = None,
+    use_cache: bool = True,
+) -> AsyncIterator[str]:
+    key = (
+        await asyncio.to_thread(response_cache_key, input_contents, model)
+        if use_cache
+        else None
+    )
+    cached = await asyncio.to_thread(_cached_response, key) if key else None
+    if cached is not None:
+        yield cached
+        return
+
+    tokens = await asyncio.to_thread(estimate_request_tokens, input_contents, model)
+    input_contents, provider_kwargs = resolve_cached_paper(input_contents, model)
+    formatted_input_contents = await asyncio.to_thread(
+        generate_input_contents, input_contents, model, api_key=api_key
     )
+    provider = get_provider(model)
+    attempt = single_attempt(PROVIDER_TO_STREAM_FUNCTION_MAP_ASYNC[provider])
+
+    async def open_stream():
+        async with AsyncExitStack() as stack:
+            await stack.enter_async_context(
+                RATE_LIMITER.limit_async(provider, model, tokens)
+            )
+            stream = await attempt(
+                formatted_input_contents, model, api_key=api_key, **provider_kwargs
+            )
+            return stack.pop_all(), stream
+
+    limit, stream = await call_with_retry_async(provider, open_stream)
+    pieces = []
+    async with limit:
+        async for piece in stream:
+            pieces.append(piece)
+            yield piece
+    if key:
+        await asyncio.to_thread(_store_response, key, "".join(pieces))
 
 
 def generate_input_contents(
-    input_contents: list[tuple[str, str]],
+    input_contents: list[tuple[str, PdfSource | ExtractedPaper]],
     model: str = "gpt-4o-mini-2024-07-18",
+    api_key: str | None = None,
 ) -> list:
     provider = get_provider(model)
     if provider == "openai":
-        return generate_openai_input_contents(input_contents)
+        return generate_openai_input_contents(input_contents, api_key=api_key)
     elif provider == "google":
-        return generate_gemini_input_contents(input_contents)
+        return generate_gemini_input_contents(input_contents, api_key=api_key)
     else:
         raise ValueError("Invalid provider")
 
 
 def generate_openai_input_contents(
-    input_contents: list[tuple[str, str]],
+    input_contents: list[tuple[str, PdfSource | ExtractedPaper]],
+    api_key: str | None = None,
 ) -> list:
     if len(input_contents) == 1:
         input_contents = [
@@ -94,14 +519,26 @@ def generate_openai_input_contents(
         ]
         return input_contents
     elif len(input_contents) == 2:
-        file_id = get_file_id(input_contents[0][1])
+        pdf = input_contents[0][1]
+        if isinstance(pdf, ExtractedPaper):
+            pdf_parts = [
+                {"type": "text", "text": EXTRACTED_PAPER_PREAMBLE + pdf.text}
+            ] + [
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": "data:image/jpeg;base64,"
+                        + base64.b64encode(figure).decode("utf-8")
+                    },
+                }
+                for figure in pdf.figures
+            ]
+        else:
+            pdf_parts = [{"type": "file", "file": {"file_id": get_file_id(pdf, api_key)}}]
         input_contents = [
             {
                 "role": "user",
-                "content": [
-                    {"type": "file", "file": {"file_id": file_id}},
-                    {"type": "text", "text": input_contents[1][1]},
-                ],
+                "content": pdf_parts + [{"type": "text", "text": input_contents[1][1]}],
             }
         ]
         return input_contents
@@ -109,31 +546,106 @@ def generate_openai_input_contents(
         raise ValueError("Invalid number of input contents")
 
 
+def get_gemini_paper_parts(
+    pdf: PdfSource | ExtractedPaper, api_key: str | None = None
+) -> list:
+    if isinstance(pdf, ExtractedPaper):
+        figures = [
+            Part.from_bytes(data=figure, mime_type="image/jpeg")
+            for figure in pdf.figures
+        ]
+        return [EXTRACTED_PAPER_PREAMBLE + pdf.text, *figures]
+    return [get_pdf_for_prompt(pdf, api_key=api_key)]
+
+
 def generate_gemini_input_contents(
-    input_contents: list[tuple[str, str]],
+    input_contents: list[tuple[str, PdfSource | ExtractedPaper]],
+    api_key: str | None = None,
 ) -> list:
     if len(input_contents) == 1:
         return [input_contents[0][1]]
     elif len(input_contents) == 2:
-        pdf_file_bytes = get_pdf_for_prompt(input_contents[0][1])
-        return [pdf_file_bytes, input_contents[1][1]]
+        return [
+            *get_gemini_paper_parts(input_contents[0][1], api_key=api_key),
+            input_contents[1][1],
+        ]
     else:
         raise ValueError("Invalid number of input contents")
 
 
+async def _call_hedged_async(
+    input_contents: list[tuple[str, PaperInput]],
+    model: str,
+    response_format: Optional[BaseModel],
+    api_key: str | None,
+    stage: str,
+) -> tuple[str, str | dict]:
+    """(model that answered, output), hedging with the model's backup in
+    HEDGER if the request runs long for its stage."""
+    backup_model = HEDGER.backups.get(model)
+    backup = None
+    if backup_model is not None:
+        # api_key belongs to model's provider; a backup elsewhere uses its env key
+        same_provider = get_provider(backup_model) == get_provider(model)
+
+        def backup(on_admitted):
+            return _call_provider_async(
+                input_contents,
+                backup_model,
+                response_format,
+                api_key if same_provider else None,
+                on_admitted,
+            )
+
+    backup_won, output = await HEDGER.run(
+        f"{stage}:{model}",
+        lambda on_admitted: _call_provider_async(
+            input_contents, model, response_format, api_key, on_admitted
+        ),
+        backup,
+    )
+    return (backup_model if backup_won else model), output
+
+
 async def generate_text_response_async(
-    input_contents: list[tuple[str, str]],
+    input_contents: list[tuple[str, PaperInput]],
     model: str = "gpt-4o-mini-2024-07-18",
     response_format: Optional[BaseModel] = None,
     api_key: str | None = None,
+    use_cache: bool = True,
+    stage: str = "default",
 ) -> str:
+    """stage names the pipeline step making the request; hedging (see
+    podcaist.hedging) keeps latency history per stage and model."""
     assert (
         len(input_contents) <= 2
     ), "Only one pdf and one text input is supported currently"
     assert (
         input_contents[0][0] == "pdf" or input_contents[0][0] == "text"
     ), "The first input should be the path to the pdf file or the text"
-    formatted_input_contents = generate_input_contents(input_contents, model)
-    output_function = get_function_for_model(model, True)
-    output = await output_function(formatted_input_contents, model, response_format, api_key=api_key)
-    return output
+    if not use_cache:
+        _, output = await _call_hedged_async(
+            input_contents, model, response_format, api_key, stage
+        )
+        return output
+
+    # hashing the paper and the cache's disk I/O stay off the loop
+    key = await asyncio.to_thread(response_cache_key, input_contents, model, response_format)
+    cached = await asyncio.to_thread(_cached_response, key)
+    if cached is not None:
+        return cached
+
+    async def call():
+        answered_by, output = await _call_hedged_async(
+            input_contents, model, response_format, api_key, stage
+        )
+        # stored as the answering model's: serving a backup's answer for model
+        # later would misattribute it (concurrent callers share it in flight)
+        await asyncio.to_thread(
+            lambda: _store_response(
+                response_cache_key(input_contents, answered_by, response_format), output
+            )
+        )
+        return output
+
+    return await IN_FLIGHT.run_async(key, call)
@@ -0,0 +1,282 @@
+from collections import Counter
+from dataclasses import dataclass
+
+from podcaist import gemini_request, openai_request
+from podcaist.model_garden import (
+    MODEL_TO_PROVIDER_MAP,
+    PaperInput,
+    estimate_paper_tokens,
+    get_provider,
+)
+
+# Stages of generate_podcast_script in order; stage_models dicts use these keys.
+# The single-pass analysis runs on the "method" model and the outline and
+# sections of parallel_sections on the "script" model.
+STAGES = ("contributions", "method", "results", "limitations", "script")
+PARALLEL_STAGES = ("method", "results", "limitations")
+
+
+@dataclass
+class ModelProfile:
+    """What the policy assumes about a model besides its price."""
+
+    quality: int  # relative, higher is better
+    output_tokens_per_second: float
+    first_token_seconds: float
+    # thinking tokens generated (and billed as output) per output token
+    thinking_ratio: float = 0.0
+
+
+MODEL_PROFILES = {
+    "gemini-2.5-pro": ModelProfile(5, 90, 3.0, thinking_ratio=1.0),
+    "o3-2025-04-16": ModelProfile(5, 60, 5.0, thinking_ratio=1.5),
+    "gpt-4.1-2025-04-14": ModelProfile(4, 80, 1.0),
+    "gemini-2.5-flash": ModelProfile(3, 200, 1.5, thinking_ratio=0.5),
+    "o3-mini-2025-01-31": ModelProfile(3, 120, 3.0, thinking_ratio=1.0),
+    "gemini-2.0-flash-001": ModelProfile(2, 200, 0.6),
+    "gpt-4o-mini-2024-07-18": ModelProfile(1, 80, 0.6),
+    "gemini-2.0-flash-lite-001": ModelProfile(1, 220, 0.5),
+}
+
+
+@dataclass
+class StageProfile:
+    # prompt tokens on top of the paper (instructions, earlier stages' output)
+    prompt_tokens: int
+    output_tokens: int
+    # how much a weaker model costs the final podcast, relative to other stages
+    weight: float
+
+
+STAGE_PROFILES = {
+    "contributions": StageProfile(prompt_tokens=300, output_tokens=800, weight=1.0),
+    "method": StageProfile(prompt_tokens=800, output_tokens=2500, weight=2.0),
+    "results": StageProfile(prompt_tokens=800, output_tokens=1500, weight=1.0),
+    "limitations": StageProfile(prompt_tokens=800, output_tokens=1000, weight=1.0),
+    # the script prompt carries all four analyses
+    "script": StageProfile(prompt_tokens=6500, output_tokens=6000, weight=3.0),
+}
+
+
+@dataclass
+class Budget:
+    """Per-paper limits for the script stages; None means unlimited."""
+
+    max_cost: float | None = None  # USD
+    max_latency_seconds: float | None = None
+
+
+@dataclass
+class StageEstimate:
+    model: str
+    input_tokens: int
+    output_tokens: int
+    cost: float
+    latency_seconds: float
+
+
+def model_prices(model: str) -> tuple[float, float, float]:
+    """(input, cached input, output) USD per million tokens."""
+    for tables in (gemini_request, openai_request):
+        if model in tables.MODEL_TO_INPUT_PRICE_PER_MILLION:
+            return (
+                tables.MODEL_TO_INPUT_PRICE_PER_MILLION[model],
+                tables.MODEL_TO_CACHED_TOKEN_PRICE[model],
+                tables.MODEL_TO_OUTPUT_PRICE_PER_MILLION[model],
+            )
+    raise KeyError(f"No prices for model {model}")
+
+
+def candidate_models(provider: str) -> list[str]:
+    """Models of provider the policy can reason about, best first."""
+    models = [
+        model
+        for model, model_provider in MODEL_TO_PROVIDER_MAP.items()
+        if model_provider == provider and model in MODEL_PROFILES
+    ]
+    return sorted(models, key=lambda model: -MODEL_PROFILES[model].quality)
+
+
+def estimate_stage(stage: str, model: str, paper_tokens: int) -> StageEstimate:
+    stage_profile = STAGE_PROFILES[stage]
+    profile = MODEL_PROFILES[model]
+    input_price, _, output_price = model_prices(model)
+    input_tokens = paper_tokens + stage_profile.prompt_tokens
+    output_tokens = int(stage_profile.output_tokens * (1 + profile.thinking_ratio))
+    return StageEstimate(
+        model=model,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        cost=(input_tokens * input_price + output_tokens * output_price) / 1_000_000,
+        latency_seconds=profile.first_token_seconds
+        + output_tokens / profile.output_tokens_per_second,
+    )
+
+
+def estimate_plan(stage_models: dict[str, str], paper_tokens: int) -> dict[str, StageEstimate]:
+    return {
+        stage: estimate_stage(stage, stage_models[stage], paper_tokens) for stage in STAGES
+    }
+
+
+def plan_cost(estimates: dict[str, StageEstimate]) -> float:
+    return sum(estimate.cost for estimate in estimates.values())
+
+
+def plan_latency(estimates: dict[str, StageEstimate]) -> float:
+    """Contributions, then the analysis stages concurrently, then the script."""
+    return (
+        estimates["contributions"].latency_seconds
+        + max(estimates[stage].latency_seconds for stage in PARALLEL_STAGES)
+        + estimates["script"].latency_seconds
+    )
+
+
+def _overrun(estimates: dict[str, StageEstimate], budget: Budget) -> float:
+    """How far a plan is over budget, as a sum of fractions of each limit."""
+    overrun = 0.0
+    if budget.max_cost is not None:
+        overrun += max(0.0, plan_cost(estimates) - budget.max_cost) / budget.max_cost
+    if budget.max_latency_seconds is not None:
+        overrun += (
+            max(0.0, plan_latency(estimates) - budget.max_latency_seconds)
+            / budget.max_latency_seconds
+        )
+    return overrun
+
+
+def within_budget(estimates: dict[str, StageEstimate], budget: Budget) -> bool:
+    return _overrun(estimates, budget) == 0
+
+
+def choose_stage_models(
+    paper: PaperInput | None,
+    candidates: list[str],
+    budget: Budget,
+    fixed: dict[str, str] | None = None,
+    paper_tokens: int | None = None,
+    start: str | None = None,
+) -> dict[str, str]:
+    """
+    Best model per stage that keeps the paper within budget.
+
+    Every stage starts on start, by default the strongest candidate, and
+    only candidates are ever assigned. While the plan is over budget, the
+    single stage downgrade that removes the most overrun per unit of lost
+    quality (weighted by STAGE_PROFILES) is applied, so cheap extraction
+    stages are downgraded long before the final script; any budget left over
+    is then spent upgrading stages back. Stages in fixed keep their model.
+    If even the cheapest plan does not fit, it is returned with a warning.
+
+    The paper's size is estimated from its pages unless paper_tokens gives
+    it, e.g. counted by the provider (see preflight).
+    """
+    fixed = fixed or {}
+    if paper_tokens is None:
+        paper_tokens = estimate_paper_tokens(paper, get_provider(candidates[0]))
+    if start is None:
+        start = max(candidates, key=lambda model: MODEL_PROFILES[model].quality)
+    plan = {stage: fixed.get(stage, start) for stage in STAGES}
+    overrun = _overrun(estimate_plan(plan, paper_tokens), budget)
+
+    while overrun > 0:
+        choice = None
+        for stage in STAGES:
+            if stage in fixed:
+                continue
+            current = MODEL_PROFILES[plan[stage]]
+            for model in candidates:
+                if model == plan[stage] or MODEL_PROFILES[model].quality > current.quality:
+                    continue
+                trial = {**plan, stage: model}
+                saved = overrun - _overrun(estimate_plan(trial, paper_tokens), budget)
+                if saved <= 0:
+                    continue
+                lost = STAGE_PROFILES[stage].weight * (
+                    current.quality - MODEL_PROFILES[model].quality
+                )
+                score = saved / (lost + 1e-3)
+                if choice is None or score > choice[0]:
+                    choice = (score, trial, overrun - saved)
+        if choice is None:
+            print(
+                f"Warning: No model assignment fits the budget {budget}, "
+                f"using {plan} (over by {overrun:.0%})"
+            )
+            return plan
+        _, plan, overrun = choice
+    return _spend_leftover(plan, candidates, budget, paper_tokens, fixed)
+
+
+def _spend_leftover(
+    plan: dict[str, str],
+    candidates: list[str],
+    budget: Budget,
+    paper_tokens: int,
+    fixed: dict[str, str],
+) -> dict[str, str]:
+    """Upgrade stages again while the plan stays within budget, most
+    valuable upgrade first, since greedy downgrades can overshoot."""
+    while True:
+        choice = None
+        for stage in STAGES:
+            if stage in fixed:
+                continue
+            current = MODEL_PROFILES[plan[stage]].quality
+            for model in candidates:
+                gained = STAGE_PROFILES[stage].weight * (MODEL_PROFILES[model].quality - current)
+                if gained <= 0 or (choice is not None and gained <= choice[0]):
+                    continue
+                trial = {**plan, stage: model}
+                if _overrun(estimate_plan(trial, paper_tokens), budget) == 0:
+                    choice = (gained, trial)
+        if choice is None:
+            return plan
+        plan = choice[1]
+
+
+def resolve_stage_models(
+    model: str,
+    stage_models: dict[str, str] | None = None,
+    budget: Budget | None = None,
+    paper: PaperInput | None = None,
+    paper_tokens: int | None = None,
+) -> dict[str, str]:
+    """
+    The model each stage runs on.
+
+    Stages named in stage_models use that model. With a budget the rest are
+    chosen by choose_stage_models, starting from model, among the models of
+    model's provider (the provider whose api_key the run has) that are no
+    better than model, so a budget can only make a run cheaper than model
+    alone; otherwise they use model.
+    """
+    stage_models = stage_models or {}
+    unknown = set(stage_models) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stages {sorted(unknown)}, expected some of {STAGES}")
+    unbudgeted = {stage: stage_models.get(stage, model) for stage in STAGES}
+    if budget is None or (paper is None and paper_tokens is None):
+        return unbudgeted
+    if model not in MODEL_PROFILES:
+        print(f"Warning: No profile for {model}, ignoring the budget {budget}")
+        return unbudgeted
+    quality = MODEL_PROFILES[model].quality
+    candidates = [
+        candidate
+        for candidate in candidate_models(get_provider(model))
+        if MODEL_PROFILES[candidate].quality <= quality
+    ]
+    return choose_stage_models(
+        paper,
+        candidates,
+        budget,
+        fixed=stage_models,
+        paper_tokens=paper_tokens,
+        start=model,
+    )
+
+
+def most_used_model(stage_models: dict[str, str]) -> str:
+    """The model most stages run on, e.g. the one to cache the paper for."""
+    return Counter(stage_models[stage] for stage in STAGES).most_common(1)[0][0]
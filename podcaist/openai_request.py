@@ -1,64 +1,155 @@
-import asyncio
 import json
 import os
-import time
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
 
-from openai import AsyncOpenAI, OpenAI, RateLimitError
+from openai import NotFoundError
 from pydantic import BaseModel
 
-
-def create_file(file_path: str) -> str:
-    api_key = os.getenv("OPENAI_API_KEY")
-    client = OpenAI(api_key=api_key)
-    file = client.files.create(file=open(file_path, "rb"), purpose="user_data")
+from podcaist.clients import get_openai_client, resolve_api_key
+from podcaist.disk_cache import default_cache_dir
+from podcaist.retry import with_retries
+from podcaist.upload_index import UploadIndex, account_fingerprint
+from podcaist.usage import record_usage
+from podcaist.utils import PdfDocument, PdfSource
+
+# USD per million tokens, standard tier
+MODEL_TO_CACHED_TOKEN_PRICE = {
+    "gpt-4o-mini-2024-07-18": 0.075,
+    "o3-2025-04-16": 0.5,
+    "o3-mini-2025-01-31": 0.55,
+    "gpt-4.1-2025-04-14": 0.5,
+}
+
+MODEL_TO_INPUT_PRICE_PER_MILLION = {
+    "gpt-4o-mini-2024-07-18": 0.15,
+    "o3-2025-04-16": 2.0,
+    "o3-mini-2025-01-31": 1.1,
+    "gpt-4.1-2025-04-14": 2.0,
+}
+
+MODEL_TO_OUTPUT_PRICE_PER_MILLION = {
+    "gpt-4o-mini-2024-07-18": 0.6,
+    "o3-2025-04-16": 8.0,
+    "o3-mini-2025-01-31": 4.4,
+    "gpt-4.1-2025-04-14": 8.0,
+}
+
+# content hash → file_id of PDFs already uploaded, per account. Entries are
+# re-checked with files.retrieve once they are older than a day, in case the
+# file was deleted from the account in the meantime.
+FILE_INDEX = UploadIndex(
+    os.path.join(default_cache_dir(), "openai_files.json"),
+    validate_after_seconds=int(os.getenv("PODCAIST_OPENAI_FILE_CHECK_SECONDS", 86400)),
+)
+
+
+@with_retries("openai")
+def create_file(
+    file_path: str,
+    data: bytes | memoryview | None = None,
+    api_key: str | None = None,
+) -> str:
+    """Upload a file from disk, or upload data under the name file_path."""
+    client = get_openai_client(api_key)
+    if data is not None:
+        file = client.files.create(file=(file_path, bytes(data)), purpose="user_data")
+    else:
+        with open(file_path, "rb") as f:
+            file = client.files.create(file=f, purpose="user_data")
     return file.id
 
 
+def _record_openai_usage(model: str, usage) -> None:
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    record_usage(
+        model,
+        usage.prompt_tokens,
+        getattr(details, "cached_tokens", None),
+        usage.completion_tokens,
+    )
+
+
 def list_uploaded_files() -> List[Dict[str, Any]]:
-    api_key = os.getenv("OPENAI_API_KEY")
-    client = OpenAI(api_key=api_key)
+    client = get_openai_client()
     files = client.files.list()
     return {f"{file.filename}": file.id for file in files}
 
 
+@with_retries("openai")
 def generate_openai_response(
     input_contents: list,
     model: str = "gpt-4o-mini-2024-07-18",
     response_format: Optional[BaseModel] = None,
     api_key: str | None = None,
 ) -> Dict[str, Any]:
-    if api_key is None:
-        api_key = os.getenv("OPENAI_API_KEY")
-    client = OpenAI(api_key=api_key)
-
-    max_retries = 5
-    base_delay = 1  # Start with 1 second
-
-    for attempt in range(max_retries):
-        try:
-            if response_format:
-                completion = client.beta.chat.completions.parse(
-                    model=model,
-                    messages=input_contents,
-                    response_format=response_format,
-                )
-                return json.loads(
-                    completion.choices[0].message.parsed.model_dump_json()
-                )
-            else:
-                completion = client.chat.completions.create(
-                    model=model, messages=input_contents
-                )
-                return completion.choices[0].message.content
-
-        except RateLimitError:
-            if attempt == max_retries - 1:  # Last attempt
-                raise  # Re-raise the last error if we're out of retries
-
-            delay = base_delay * (2**attempt)  # 1, 2, 4, 8, 16 seconds
-            time.sleep(delay)
-            continue
+    client = get_openai_client(api_key)
+
+    if response_format:
+        completion = client.beta.chat.completions.parse(
+            model=model,
+            messages=input_contents,
+            response_format=response_format,
+        )
+        _record_openai_usage(model, completion.usage)
+        return json.loads(completion.choices[0].message.parsed.model_dump_json())
+    else:
+        completion = client.chat.completions.create(
+            model=model, messages=input_contents
+        )
+        _record_openai_usage(model, completion.usage)
+        return completion.choices[0].message.content
+
+
+@with_retries("openai")
+def stream_openai_response(
+    input_contents: list,
+    model: str = "gpt-4o-mini-2024-07-18",
+    api_key: str | None = None,
+) -> Iterator[str]:
+    """Text deltas of a chat completion as they are generated.
+
+    Opening the stream is retried; a stream that breaks midway raises.
+    """
+    client = get_openai_client(api_key)
+    stream = client.chat.completions.create(
+        model=model,
+        messages=input_contents,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    return _stream_text(stream, model)
+
+
+def _stream_text(stream, model: str) -> Iterator[str]:
+    for chunk in stream:
+        _record_openai_usage(model, chunk.usage)  # only set on the last chunk
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+async def _stream_text_async(stream, model: str) -> AsyncIterator[str]:
+    async for chunk in stream:
+        _record_openai_usage(model, chunk.usage)
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+@with_retries("openai")
+async def stream_openai_response_async(
+    input_contents: list,
+    model: str = "gpt-4o-mini-2024-07-18",
+    api_key: str | None = None,
+) -> AsyncIterator[str]:
+    client = get_openai_client(api_key, async_mode=True)
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=input_contents,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    return _stream_text_async(stream, model)
 
 
 def find_file_by_name(file_name: str) -> str:
@@ -69,19 +160,40 @@ def find_file_by_name(file_name: str) -> str:
     return None
 
 
-def get_file_id(file_path: str) -> str:
-    file_id = find_file_by_name(file_path.split("/")[-1])
-    if file_id is None:
-        file_id = create_file(file_path)
-    return file_id
+def file_exists(file_id: str, api_key: str | None = None) -> bool:
+    try:
+        get_openai_client(api_key).files.retrieve(file_id)
+    except NotFoundError:
+        return False
+    return True
 
 
-def delete_file(file_id: str) -> None:
-    api_key = os.getenv("OPENAI_API_KEY")
-    client = OpenAI(api_key=api_key)
+def get_file_id(pdf: PdfSource, api_key: str | None = None) -> str:
+    """File id for a PDF path or buffer, uploading it if it is not there yet.
+
+    Uploads are looked up by content hash in FILE_INDEX instead of listing the
+    account's files, so the same document is uploaded once per account no
+    matter what it is called, and concurrent stages wait for one upload.
+    """
+    document = PdfDocument.load(pdf)
+    digest = document.sha256
+    key = f"{account_fingerprint(resolve_api_key('openai', api_key))}:{digest}"
+    return document.payload(
+        f"openai_file:{key}",
+        lambda: FILE_INDEX.get_or_upload(
+            key,
+            upload=lambda: create_file(f"{digest}.pdf", document.data, api_key=api_key),
+            validate=lambda file_id: file_exists(file_id, api_key=api_key),
+        ),
+    )
+
+
+def delete_file(file_id: str, api_key: str | None = None) -> None:
+    client = get_openai_client(api_key)
     client.files.delete(file_id)
 
 
+@with_retries("openai")
 async def generate_openai_response_async(
     input_contents: list,
     model: str = "gpt-4o-mini-2024-07-18",
@@ -94,37 +206,23 @@ async def generate_openai_response_async(
     • If `response_format` is a Pydantic model, we call the *structured‑output* beta
       helper and return the parsed dict.
     • Otherwise we return the raw string content.
-    • Implements exponential backoff for rate limit errors (429)
+    • Transient errors (429, 5xx, network) are retried by podcaist.retry
     """
-    if api_key is None:
-        api_key = os.getenv("OPENAI_API_KEY")
-        
-    client = AsyncOpenAI(api_key=api_key)
-
-    max_retries = 5
-    base_delay = 1  # Start with 1 second
-
-    for attempt in range(max_retries):
-        try:
-            if response_format:
-                completion = await client.beta.chat.completions.parse(
-                    model=model,
-                    messages=input_contents,
-                    response_format=response_format,
-                )
-                parsed = completion.choices[0].message.parsed
-                return json.loads(parsed.model_dump_json())
-            else:
-                completion = await client.chat.completions.create(
-                    model=model,
-                    messages=input_contents,
-                )
-                return completion.choices[0].message.content
-
-        except RateLimitError:
-            if attempt == max_retries - 1:  # Last attempt
-                raise  # Re-raise the last error if we're out of retries
-
-            delay = base_delay * (2**attempt)  # 1, 2, 4, 8, 16 seconds
-            await asyncio.sleep(delay)
-            continue
+    client = get_openai_client(api_key, async_mode=True)
+
+    if response_format:
+        completion = await client.beta.chat.completions.parse(
+            model=model,
+            messages=input_contents,
+            response_format=response_format,
+        )
+        _record_openai_usage(model, completion.usage)
+        parsed = completion.choices[0].message.parsed
+        return json.loads(parsed.model_dump_json())
+    else:
+        completion = await client.chat.completions.create(
+            model=model,
+            messages=input_contents,
+        )
+        _record_openai_usage(model, completion.usage)
+        return completion.choices[0].message.content
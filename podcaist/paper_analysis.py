@@ -0,0 +1,89 @@
+from pydantic import BaseModel, Field
+
+from podcaist.contributions import format_contributions
+from podcaist.model_garden import generate_text_response, generate_text_response_async
+from podcaist.utils import PdfSource
+
+prompt = """Attached is a pdf of a research paper as well as what I determined are the main contributions. \
+I want a deep analysis of the paper in one pass: the method, the results and the limitations, each in \
+its own field. Everything should be understandable over audio, ie explained in plain english, and \
+grounded in the attached pdf. Think about how the three parts relate, the method explains how the \
+contributions were attained, the results whether they are backed up, and the limitations where they \
+are not.
+
+Here are the contributions:
+{contributions}
+"""
+
+ablations_prompt = """
+Also identify the ablation studies performed in the paper. For each one explain the results and the \
+impact of the ablation on the performance of the model, highlighting influential details and what \
+they imply for the rest of the paper. If none are found, just say so.
+"""
+
+
+class PaperAnalysis(BaseModel):
+    method: str = Field(
+        description="A deep dive into exactly what the authors did to attain the contributions, "
+        "assuming the audience has a Master's in AI: enough to sketch the pseudocode and explain "
+        "the method to others, whether it relies on theory or empirical studies, and answers to "
+        "the follow-up questions a listener would still have."
+    )
+    results: str = Field(
+        description="Whether the results back up the authors' claims: the metrics and datasets "
+        "used and whether they are solid for the case at hand or leave something to be desired."
+    )
+    limitations: str = Field(
+        description="Limitations in how the method was evaluated and any unsubstantiated claims. "
+        "Not harsh, and may say there are none if it is a great paper."
+    )
+
+
+class PaperAnalysisWithAblations(PaperAnalysis):
+    ablations: str = Field(
+        description="Each ablation study in the paper, its results and what they imply."
+    )
+
+
+def build_analysis_input(
+    pdf_file_path: PdfSource, contributions: dict, include_ablations: bool
+) -> tuple[list, type[PaperAnalysis]]:
+    text = prompt.format(contributions=format_contributions(contributions))
+    if include_ablations:
+        return [("pdf", pdf_file_path), ("text", text + ablations_prompt)], PaperAnalysisWithAblations
+    return [("pdf", pdf_file_path), ("text", text)], PaperAnalysis
+
+
+def analyze_paper(
+    pdf_file_path: PdfSource,
+    contributions: dict,
+    model: str = "gpt-4o-mini-2024-07-18",
+    api_key: str | None = None,
+    include_ablations: bool = False,
+) -> dict:
+    """
+    The method, results and limitations stages as one structured request.
+
+    The paper is sent once instead of three times; the returned dict has the
+    keys method, results and limitations (and ablations if requested), each
+    holding the text the separate stage would have produced.
+    """
+    input, response_format = build_analysis_input(
+        pdf_file_path, contributions, include_ablations
+    )
+    return generate_text_response(input, model, response_format, api_key=api_key)
+
+
+async def analyze_paper_async(
+    pdf_file_path: PdfSource,
+    contributions: dict,
+    model: str = "gpt-4o-mini-2024-07-18",
+    api_key: str | None = None,
+    include_ablations: bool = False,
+) -> dict:
+    input, response_format = build_analysis_input(
+        pdf_file_path, contributions, include_ablations
+    )
+    return await generate_text_response_async(
+        input, model, response_format, api_key=api_key, stage="analysis"
+    )
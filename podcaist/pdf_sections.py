@@ -0,0 +1,120 @@
+import re
+from dataclasses import dataclass
+
+import fitz  # PyMuPDF
+
+from podcaist.pdf_text import body_font_size, heading_level
+from podcaist.utils import PdfDocument, PdfSource
+
+SECTION_NUMBER_PATTERN = re.compile(r"^\s*((?:\d+|[A-Z])(?:\.\d+)*)\.?\s+\S")
+
+
+@dataclass
+class Section:
+    title: str
+    level: int
+    start_page: int  # 0-based, inclusive
+    end_page: int  # 0-based, inclusive; shared with the next section if it starts mid-page
+
+
+def _numbered_level(title: str) -> int | None:
+    """Nesting depth from a section number: "3" → 1, "3.2" → 2, None if unnumbered."""
+    match = SECTION_NUMBER_PATTERN.match(title)
+    return match.group(1).count(".") + 1 if match else None
+
+
+def _toc_headings(doc: fitz.Document) -> list[tuple[int, str, int]]:
+    return [
+        (level, title.strip(), page - 1)
+        for level, title, page in doc.get_toc(simple=True)
+        if page >= 1
+    ]
+
+
+def _font_headings(doc: fitz.Document) -> list[tuple[int, str, int]]:
+    """Headings detected from font size when the PDF has no outline."""
+    body_size = body_font_size(doc)
+    headings = []
+    for page in doc:
+        for block in page.get_text("dict", sort=True)["blocks"]:
+            if block["type"] != 0:
+                continue
+            level = heading_level(block, body_size)
+            if level is None:
+                continue
+            title = " ".join(
+                "".join(span["text"] for span in line["spans"]).strip()
+                for line in block["lines"]
+            ).strip()
+            headings.append((_numbered_level(title) or level, title, page.number))
+    return headings
+
+
+def build_section_index(pdf: PdfSource) -> list[Section]:
+    """
+    Index a paper's sections by page range.
+
+    Uses the PDF outline when there is one, otherwise headings detected from
+    font size (numbered headings take their depth from the number). A section
+    runs until the next heading at the same or a higher level.
+    """
+    doc = fitz.open(stream=PdfDocument.load(pdf).data, filetype="pdf")
+    try:
+        headings = _toc_headings(doc) or _font_headings(doc)
+        last_page = doc.page_count - 1
+    finally:
+        doc.close()
+
+    sections = []
+    for i, (level, title, start_page) in enumerate(headings):
+        end_page = last_page
+        for next_level, _, next_start in headings[i + 1 :]:
+            if next_level <= level:
+                end_page = max(start_page, next_start)
+                break
+        sections.append(Section(title, level, start_page, end_page))
+    return sections
+
+
+def select_section_pages(
+    sections: list[Section], keywords: tuple[str, ...], always_include: tuple[int, ...] = (0,)
+) -> list[int]:
+    """Pages covered by sections whose title contains one of keywords.
+
+    always_include keeps the first page (title, abstract) for context. Returns
+    an empty list when no section matches.
+    """
+    pages = set()
+    for section in sections:
+        title = section.title.lower()
+        if any(keyword in title for keyword in keywords):
+            pages.update(range(section.start_page, section.end_page + 1))
+    if not pages:
+        return []
+    return sorted(pages.union(always_include))
+
+
+def slice_pdf_for_stage(
+    pdf: PdfSource,
+    keywords: tuple[str, ...],
+    sections: list[Section] | None = None,
+) -> PdfSource:
+    """
+    Sub-PDF holding only the pages of the sections a stage asked for.
+
+    Falls back to the whole paper (returned unchanged) when no section matches
+    or the matching sections already cover every page.
+    """
+    data = PdfDocument.load(pdf).data
+    if sections is None:
+        sections = build_section_index(data)
+    pages = select_section_pages(sections, keywords)
+
+    doc = fitz.open(stream=data, filetype="pdf")
+    try:
+        if not pages or len(pages) >= doc.page_count:
+            return pdf
+        doc.select(pages)
+        return doc.tobytes(garbage=4, deflate=True)
+    finally:
+        doc.close()
@@ -0,0 +1,189 @@
+import io
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from podcaist.utils import PdfDocument, PdfSource
+
+CAPTION_PATTERN = re.compile(r"^\s*(fig\.?|figure|table)\s*[A-Z]?\d+", re.IGNORECASE)
+NUMBERED_HEADING_PATTERN = re.compile(r"^\s*([A-Z]|\d+)(\.\d+)*\.?\s+[A-Z]")
+
+BOLD_FLAG = 16  # PyMuPDF span flag
+
+
+@dataclass
+class ExtractedPaper:
+    """A paper reduced to text locally, sent to the model instead of the PDF.
+
+    text holds the body with markdown headings, tables and figure captions;
+    figures holds optional downsampled JPEG crops of the largest figures.
+    """
+
+    text: str
+    figures: list[bytes] = field(default_factory=list)
+
+
+def _block_text(block: dict) -> str:
+    return " ".join(
+        "".join(span["text"] for span in line["spans"]).strip()
+        for line in block["lines"]
+    ).strip()
+
+
+def _block_spans(block: dict) -> list[dict]:
+    return [
+        span
+        for line in block["lines"]
+        for span in line["spans"]
+        if span["text"].strip()
+    ]
+
+
+def body_font_size(doc: fitz.Document) -> float:
+    """Most common font size in the document, weighted by characters."""
+    sizes = Counter()
+    for page in doc:
+        for block in page.get_text("dict")["blocks"]:
+            if block["type"] != 0:
+                continue
+            for span in _block_spans(block):
+                sizes[round(span["size"], 1)] += len(span["text"])
+    return sizes.most_common(1)[0][0] if sizes else 10.0
+
+
+def heading_level(block: dict, body_size: float) -> int | None:
+    """1 or 2 if a text block looks like a section heading, else None.
+
+    Headings are short blocks set noticeably larger than the body text, or
+    bold numbered lines at body size ("3.2 Training Setup").
+    """
+    text = _block_text(block)
+    spans = _block_spans(block)
+    if not spans or len(block["lines"]) > 2 or not 2 < len(text) < 120:
+        return None
+    if CAPTION_PATTERN.match(text) or text[-1] in ".,;:":
+        return None
+    size = max(span["size"] for span in spans)
+    if size >= body_size * 1.35:
+        return 1
+    if size >= body_size * 1.12:
+        return 2
+    bold = all(span["flags"] & BOLD_FLAG for span in spans)
+    if bold and size >= body_size * 0.95 and NUMBERED_HEADING_PATTERN.match(text):
+        return 2
+    return None
+
+
+def _inside(rect: fitz.Rect, areas: list[fitz.Rect]) -> bool:
+    """True when most of rect lies inside one of areas."""
+    return any((rect & area).get_area() > 0.5 * rect.get_area() for area in areas)
+
+
+def _page_tables(page: fitz.Page) -> list:
+    if not hasattr(page, "find_tables"):  # PyMuPDF < 1.23
+        return []
+    try:
+        return list(page.find_tables().tables)
+    except Exception as e:
+        print(f"Warning: Table detection failed on page {page.number + 1}: {e}")
+        return []
+
+
+def _page_text(page: fitz.Page, body_size: float, captions: list[str]) -> str:
+    tables = _page_tables(page)
+    table_areas = [fitz.Rect(table.bbox) for table in tables]
+    pending_tables = sorted(tables, key=lambda table: table.bbox[1])
+
+    parts = []
+    for block in page.get_text("dict", sort=True)["blocks"]:
+        if block["type"] != 0:
+            continue
+        bbox = fitz.Rect(block["bbox"])
+        # tables are emitted as markdown where they start, not as loose text
+        while pending_tables and pending_tables[0].bbox[1] <= bbox.y0:
+            parts.append(pending_tables.pop(0).to_markdown().strip())
+        if _inside(bbox, table_areas):
+            continue
+
+        text = _block_text(block)
+        if not text or text.isdigit():  # skip empty blocks and page numbers
+            continue
+        if CAPTION_PATTERN.match(text):
+            captions.append(text)
+            parts.append(f"[{text}]")
+            continue
+        level = heading_level(block, body_size)
+        parts.append(f"{'#' * (level + 1)} {text}" if level else text)
+
+    parts.extend(table.to_markdown().strip() for table in pending_tables)
+    return "\n\n".join(parts)
+
+
+def _figure_crops(
+    doc: fitz.Document, max_figures: int, max_dim_px: int, jpeg_quality: int
+) -> list[bytes]:
+    """JPEG crops of the largest raster figures, rendered from the page."""
+    candidates = []
+    for page in doc:
+        page_area = page.rect.get_area()
+        for info in page.get_image_info():
+            bbox = fitz.Rect(info["bbox"]) & page.rect
+            # ignore logos, icons and full-page scans
+            if bbox.is_empty or not 0.04 < bbox.get_area() / page_area < 0.9:
+                continue
+            candidates.append((bbox.get_area(), page.number, bbox))
+
+    candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+    crops = []
+    for _, page_number, bbox in candidates[:max_figures]:
+        pix = doc[page_number].get_pixmap(clip=bbox, dpi=150)
+        pil = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        pil.thumbnail((max_dim_px, max_dim_px), Image.LANCZOS)
+        with io.BytesIO() as buf:
+            pil.save(buf, format="JPEG", quality=jpeg_quality, optimize=True)
+            crops.append(buf.getvalue())
+    return crops
+
+
+def extract_paper(
+    pdf: PdfSource,
+    *,
+    max_figures: int = 0,
+    figure_max_dim_px: int = 512,
+    figure_jpeg_quality: int = 40,
+) -> ExtractedPaper:
+    """
+    Extract a compact text version of a paper with PyMuPDF.
+
+    ▸ Body text in reading order, with section headings marked as markdown
+      (detected from font size / bold numbered lines).
+    ▸ Tables (PyMuPDF ≥ 1.23) rendered as markdown tables.
+    ▸ Figure and table captions kept inline and repeated in a closing list.
+    ▸ Optionally the max_figures largest raster figures as downsampled JPEGs.
+    """
+    document = PdfDocument.load(pdf)
+    doc = fitz.open(stream=document.data, filetype="pdf")
+    try:
+        body_size = body_font_size(doc)
+        captions = []
+        pages = [
+            f"<page {page.number + 1}>\n\n{_page_text(page, body_size, captions)}"
+            for page in doc
+        ]
+        figures = (
+            _figure_crops(doc, max_figures, figure_max_dim_px, figure_jpeg_quality)
+            if max_figures > 0
+            else []
+        )
+    finally:
+        doc.close()
+
+    text = "\n\n".join(pages)
+    if captions:
+        text += "\n\n## Figure and table captions\n\n" + "\n".join(
+            f"- {caption}" for caption in captions
+        )
+    return ExtractedPaper(text=text, figures=figures)
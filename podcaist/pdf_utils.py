@@ -1,8 +1,309 @@
+import hashlib
 import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
 
 import fitz  # PyMuPDF
 from PIL import Image
 
+from podcaist.disk_cache import DiskCache, default_cache_dir, make_cache_key
+from podcaist.utils import PdfDocument, PdfSource, sha256_bytes, sha256_file
+
+# Upper bound on raw pixmap bytes held in memory while waiting for a batch of
+# images to be recompressed.
+MAX_BATCH_SAMPLE_BYTES = 256 * 1024 * 1024
+
+# Bumped whenever compress_pdf's output changes for the same parameters, so
+# stale cache entries are never served.
+COMPRESSION_VERSION = 2
+
+SAVE_OPTIONS = dict(
+    garbage=4,  # remove unused & compress object streams
+    deflate=True,  # lossless deflate of font & content streams
+    no_new_id=True,  # keep the file ID so identical inputs give identical bytes
+)
+
+# (max_dim_px, jpeg_quality) settings searched by compress_pdf_to_budget, from
+# highest to lowest fidelity; compress_pdf's defaults sit in the middle.
+BUDGET_LADDER = (
+    (2000, 80),
+    (1600, 70),
+    (1400, 60),
+    (1200, 50),
+    (1000, 40),
+    (800, 30),
+    (640, 25),
+    (512, 20),
+    (384, 15),
+    (256, 10),
+)
+
+COMPRESSED_PDF_CACHE = DiskCache(
+    os.path.join(default_cache_dir(), "compressed_pdfs"),
+    max_bytes=int(os.getenv("PODCAIST_PDF_CACHE_MAX_BYTES", 2 * 1024**3)),
+    suffix=".pdf",
+    # compress_pdf_cached hands out paths that a run keeps reading from
+    min_idle_seconds=float(os.getenv("PODCAIST_PDF_CACHE_MIN_IDLE", 3600)),
+)
+
+
+def _recompress_image(
+    job: tuple,
+    target_dpi: int | None,
+    max_dim_px: int,
+    jpeg_quality: int,
+    force_grayscale: bool,
+) -> tuple[int, bytes | None, str | None]:
+    """Pillow half of the recompression: decode, flatten, resize, JPEG-encode.
+
+    Kept free of PyMuPDF objects so it can run inside a worker process. Returns
+    (xref, jpeg_bytes, warning); jpeg_bytes is None when the image is skipped.
+    """
+    xref, width, height, alpha, xres, samples = job
+
+    # ---------- pillow conversion ----------
+    mode = "RGBA" if alpha else "RGB"
+    try:
+        pil = Image.frombytes(mode, (width, height), samples)
+    except ValueError as e:
+        return xref, None, f"Failed to create PIL image from xref {xref}: {e}"
+
+    # flatten alpha → white background
+    if mode == "RGBA":
+        bg = Image.new("RGB", pil.size, "white")
+        bg.paste(pil, mask=pil.split()[-1])
+        pil = bg
+
+    # optional grayscale
+    if force_grayscale and pil.mode != "L":
+        pil = pil.convert("L")
+
+    # ---------- adaptive down-sampling ----------
+    scale = 1.0
+    if target_dpi and xres > target_dpi > 0:
+        scale = target_dpi / xres
+
+    if max(pil.size) * scale > max_dim_px:
+        scale = max_dim_px / max(pil.size)
+
+    if scale < 1.0:  # resize only if we're shrinking
+        new_size = (int(pil.width * scale), int(pil.height * scale))
+        # Ensure dimensions are at least 1 pixel
+        new_size = (max(1, new_size[0]), max(1, new_size[1]))
+        pil = pil.resize(new_size, Image.LANCZOS)
+
+    # ---------- JPEG re-encode ----------
+    with io.BytesIO() as buf:
+        pil.save(buf, format="JPEG", quality=jpeg_quality, optimize=True)
+        return xref, buf.getvalue(), None
+
+
+def _extract_image_job(doc: fitz.Document, xref: int) -> tuple | None:
+    """Decode the image at xref into a picklable job for _recompress_image."""
+    pix = fitz.Pixmap(doc, xref)
+    try:
+        # Skip if pixmap is invalid or has no samples
+        if not pix or not pix.samples or pix.width <= 0 or pix.height <= 0:
+            print(f"Warning: Skipping invalid image at xref {xref}")
+            return None
+
+        # Validate that we have enough samples for the image dimensions
+        expected_samples = pix.width * pix.height * pix.n
+        if len(pix.samples) < expected_samples:
+            print(
+                f"Warning: Insufficient image data at xref {xref}. Expected {expected_samples} samples, got {len(pix.samples)}"
+            )
+            return None
+
+        return (
+            xref,
+            pix.width,
+            pix.height,
+            bool(pix.alpha),
+            getattr(pix, "xres", 0),
+            pix.samples,
+        )
+    finally:
+        # Always free C resources
+        pix = None
+
+
+# Dictionary keys that change how an image stream decodes; two images only
+# count as identical when these match as well as the raw bytes.
+_IMAGE_DECODE_KEYS = (
+    "Width",
+    "Height",
+    "BitsPerComponent",
+    "ColorSpace",
+    "Filter",
+    "DecodeParms",
+    "Decode",
+    "ImageMask",
+)
+
+
+_INDIRECT_REF = re.compile(r"(\d+) 0 R")
+
+
+def _resolve_refs(doc: fitz.Document, source: str, depth: int = 4) -> str:
+    """Inline the indirect references in a PDF object's source, so copies of
+    the same object under different object numbers compare equal."""
+    if depth == 0:
+        return source
+
+    def resolve(match: re.Match) -> str:
+        ref = int(match.group(1))
+        inlined = doc.xref_object(ref, compressed=True)
+        if doc.xref_is_stream(ref):
+            inlined += hashlib.sha256(doc.xref_stream_raw(ref) or b"").hexdigest()
+        return f"<{_resolve_refs(doc, inlined, depth - 1)}>"
+
+    return _INDIRECT_REF.sub(resolve, source)
+
+
+def _image_digest(doc: fitz.Document, xref: int, smask: int) -> str:
+    """Digest of an image XObject's raw stream, decode keys and soft mask."""
+    digest = hashlib.sha256(doc.xref_stream_raw(xref) or b"")
+    for key in _IMAGE_DECODE_KEYS:
+        _, value = doc.xref_get_key(xref, key)
+        digest.update(f"/{key}={_resolve_refs(doc, value)}".encode())
+    if smask > 0:
+        digest.update(f"/SMask={_resolve_refs(doc, f'{smask} 0 R')}".encode())
+    return digest.hexdigest()
+
+
+def _flush_batch(
+    batch: list, recompress, executor, results: dict[int, bytes], stats: dict
+) -> None:
+    """Recompress a batch of (page, job) pairs and write the results back."""
+    jobs = [job for _, job in batch]
+    if executor is None:
+        outputs = map(recompress, jobs)
+    else:
+        outputs = executor.map(recompress, jobs)
+
+    for (page, _), (xref, jpeg_bytes, warning) in zip(batch, outputs):
+        if warning:
+            print(f"Warning: {warning}")
+            continue
+        try:
+            page.replace_image(xref, stream=jpeg_bytes)
+        except Exception as e:
+            print(f"Warning: Failed to process image at xref {xref}: {e}")
+            continue
+        results[xref] = jpeg_bytes
+        stats["images_recompressed"] += 1
+    batch.clear()
+
+
+def _apply_duplicates(duplicates: list, results: dict[int, bytes]) -> None:
+    """Reuse a recompressed stream for byte-identical images at other xrefs."""
+    pending = []
+    for page, xref, original_xref in duplicates:
+        if original_xref not in results:
+            pending.append((page, xref, original_xref))
+            continue
+        try:
+            page.replace_image(xref, stream=results[original_xref])
+        except Exception as e:
+            print(f"Warning: Failed to process image at xref {xref}: {e}")
+    duplicates[:] = pending
+
+
+def _prune_document(doc: fitz.Document) -> None:
+    """Remove metadata, attachments and annotations; images are left alone."""
+    doc.set_metadata({})  # clears Info dictionary
+    if hasattr(doc, "del_xml_metadata"):
+        doc.del_xml_metadata()  # XMP (PyMuPDF ≥ 1.23)
+
+    # attachments:
+    for fname in list(getattr(doc, "embeddedFileNames", [])):
+        doc.embeddedFileDel(fname)
+
+    # annotations (comments, Acrobat mark-ups, etc.)
+    for page in doc:
+        for annot in list(page.annots() or []):
+            page.delete_annot(annot)
+
+
+def _compress_document(
+    doc: fitz.Document,
+    *,
+    target_dpi: int | None,
+    max_dim_px: int,
+    jpeg_quality: int,
+    force_grayscale: bool,
+    workers: int | None,
+) -> dict:
+    """Apply compress_pdf's clean-up and image recompression to an open doc."""
+    _prune_document(doc)
+
+    recompress = partial(
+        _recompress_image,
+        target_dpi=target_dpi,
+        max_dim_px=max_dim_px,
+        jpeg_quality=jpeg_quality,
+        force_grayscale=force_grayscale,
+    )
+    if workers is None:
+        workers = os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    stats = {"images_seen": 0, "images_recompressed": 0, "duplicates_skipped": 0}
+    seen_xrefs = set()
+    xref_by_digest = {}
+    results = {}  # xref → recompressed JPEG bytes
+    duplicates = []  # (page, xref, original_xref) waiting on the original
+
+    # Pixmaps are extracted in document order and written back in the same
+    # order, batch by batch, so serial and parallel runs produce the same file.
+    batch = []
+    batch_bytes = 0
+    try:
+        for page in doc:
+            # -------- recompress every raster image on the page --------
+            for img in page.get_images(full=True):
+                xref, smask = img[0], img[1]
+                stats["images_seen"] += 1
+
+                # shared XObject: replacing it once covers every page
+                if xref in seen_xrefs:
+                    stats["duplicates_skipped"] += 1
+                    continue
+                seen_xrefs.add(xref)
+
+                try:
+                    digest = _image_digest(doc, xref, smask)
+                    if digest in xref_by_digest:
+                        stats["duplicates_skipped"] += 1
+                        duplicates.append((page, xref, xref_by_digest[digest]))
+                        continue
+                    xref_by_digest[digest] = xref
+
+                    job = _extract_image_job(doc, xref)
+                except Exception as e:
+                    print(f"Warning: Failed to process image at xref {xref}: {e}")
+                    continue
+                if job is None:
+                    continue
+
+                batch.append((page, job))
+                batch_bytes += len(job[-1])
+                if batch_bytes >= MAX_BATCH_SAMPLE_BYTES:
+                    _flush_batch(batch, recompress, executor, results, stats)
+                    _apply_duplicates(duplicates, results)
+                    batch_bytes = 0
+        _flush_batch(batch, recompress, executor, results, stats)
+        _apply_duplicates(duplicates, results)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return stats
+
 
 def compress_pdf(
     input_path: str,
@@ -12,7 +313,8 @@ def compress_pdf(
     max_dim_px: int = 800,  # absolute pixel cap for width/height
     jpeg_quality: int = 30,  # lower = smaller file / lower fidelity
     force_grayscale: bool = False,  # scan-like docs shrink dramatically
-):
+    workers: int | None = 1,  # >1 (or None = all cores) recompresses in parallel
+) -> dict:
     """
     Lossily recompresses every raster image and removes non-content bloat.
 
@@ -32,93 +334,329 @@ def compress_pdf(
     max_dim_px      : upper bound on width *or* height after scaling.
     jpeg_quality    : JPEG quality (20–60 is usual; lower → smaller).
     force_grayscale : convert colour images to 8-bit gray when True.
+    workers         : processes used for the Pillow decode/resize/encode work.
+                      1 runs everything in-process, None uses every core. The
+                      output is byte-identical whatever the worker count.
+
+    Every unique image is recompressed once: an xref shown on several pages is
+    handled on first sight, and images whose streams are byte-identical reuse
+    the first one's JPEG.
+
+    Returns
+    -------
+    dict with images_seen, images_recompressed and duplicates_skipped counts.
     """
     doc = fitz.open(input_path)
+    stats = _compress_document(
+        doc,
+        target_dpi=target_dpi,
+        max_dim_px=max_dim_px,
+        jpeg_quality=jpeg_quality,
+        force_grayscale=force_grayscale,
+        workers=workers,
+    )
 
-    # -------- prune non-essential objects --------
-    doc.set_metadata({})  # clears Info dictionary
-    if hasattr(doc, "del_xml_metadata"):
-        doc.del_xml_metadata()  # XMP (PyMuPDF ≥ 1.23)
+    # ---------- final save ----------
+    doc.save(output_path, incremental=False, **SAVE_OPTIONS)
+    doc.close()
+    return stats
 
-    # attachments:
-    for fname in list(getattr(doc, "embeddedFileNames", [])):
-        doc.embeddedFileDel(fname)
 
-    for page in doc:
-        # delete annotations (comments, Acrobat mark-ups, etc.)
-        for annot in list(page.annots() or []):
-            page.delete_annot(annot)
+def compress_pdf_bytes(
+    data: bytes | memoryview,
+    *,
+    target_dpi: int | None = 50,
+    max_dim_px: int = 800,
+    jpeg_quality: int = 30,
+    force_grayscale: bool = False,
+    workers: int | None = 1,
+) -> bytes:
+    """
+    In-memory compress_pdf: opens the PDF from a buffer and returns the
+    compressed document as bytes, without touching the filesystem.
 
-        # -------- recompress every raster image on the page --------
-        for img in page.get_images(full=True):
-            xref = img[0]
-            try:
-                pix = fitz.Pixmap(doc, xref)
+    The output is byte-identical to what compress_pdf writes to disk.
+    """
+    doc = fitz.open(stream=data, filetype="pdf")
+    try:
+        _compress_document(
+            doc,
+            target_dpi=target_dpi,
+            max_dim_px=max_dim_px,
+            jpeg_quality=jpeg_quality,
+            force_grayscale=force_grayscale,
+            workers=workers,
+        )
+        return doc.tobytes(**SAVE_OPTIONS)
+    finally:
+        doc.close()
 
-                # Skip if pixmap is invalid or has no samples
-                if not pix or not pix.samples or pix.width <= 0 or pix.height <= 0:
-                    print(f"Warning: Skipping invalid image at xref {xref}")
-                    continue
 
-                # Validate that we have enough samples for the image dimensions
-                expected_samples = pix.width * pix.height * pix.n
-                if len(pix.samples) < expected_samples:
-                    print(
-                        f"Warning: Insufficient image data at xref {xref}. Expected {expected_samples} samples, got {len(pix.samples)}"
-                    )
-                    continue
+def _compressed_pdf_cache_key(
+    input_digest: str,
+    target_dpi: int | None,
+    max_dim_px: int,
+    jpeg_quality: int,
+    force_grayscale: bool,
+) -> str:
+    return make_cache_key(
+        input_digest,
+        COMPRESSION_VERSION,
+        target_dpi,
+        max_dim_px,
+        jpeg_quality,
+        force_grayscale,
+    )
+
+
+def compress_pdf_cached(
+    input_path: str,
+    *,
+    target_dpi: int | None = 50,
+    max_dim_px: int = 800,
+    jpeg_quality: int = 30,
+    force_grayscale: bool = False,
+    workers: int | None = 1,
+    cache: DiskCache | None = None,
+) -> str:
+    """
+    compress_pdf backed by a content-addressed on-disk cache.
+
+    The key is the SHA-256 of the input bytes plus the compression parameters,
+    so re-running the same paper (under any file name) skips the recompression.
+    Returns the path of the compressed PDF inside the cache directory; callers
+    must not delete it. The entry is not evicted for at least the cache's
+    min_idle_seconds (an hour by default), which bounds how long a run may
+    keep reading the path.
+    """
+    cache = cache or COMPRESSED_PDF_CACHE
+    key = _compressed_pdf_cache_key(
+        sha256_file(input_path), target_dpi, max_dim_px, jpeg_quality, force_grayscale
+    )
+    cached_path = cache.get(key)
+    if cached_path is not None:
+        return cached_path
+
+    tmp_path = cache.new_temp_path()
+    try:
+        compress_pdf(
+            input_path,
+            tmp_path,
+            target_dpi=target_dpi,
+            max_dim_px=max_dim_px,
+            jpeg_quality=jpeg_quality,
+            force_grayscale=force_grayscale,
+            workers=workers,
+        )
+        return cache.put_file(key, tmp_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def compress_pdf_bytes_cached(
+    data: bytes | memoryview,
+    *,
+    target_dpi: int | None = 50,
+    max_dim_px: int = 800,
+    jpeg_quality: int = 30,
+    force_grayscale: bool = False,
+    workers: int | None = 1,
+    cache: DiskCache | None = None,
+) -> bytes:
+    """compress_pdf_bytes backed by the same cache as compress_pdf_cached."""
+    cache = cache or COMPRESSED_PDF_CACHE
+    key = _compressed_pdf_cache_key(
+        sha256_bytes(data), target_dpi, max_dim_px, jpeg_quality, force_grayscale
+    )
+    cached = cache.get_bytes(key)
+    if cached is not None:
+        return cached
+
+    compressed = compress_pdf_bytes(
+        data,
+        target_dpi=target_dpi,
+        max_dim_px=max_dim_px,
+        jpeg_quality=jpeg_quality,
+        force_grayscale=force_grayscale,
+        workers=workers,
+    )
+    cache.put_bytes(key, compressed)
+    return compressed
 
-                # ---------- pillow conversion ----------
-                mode = "RGBA" if pix.alpha else "RGB"
-                try:
-                    pil = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
-                except ValueError as e:
-                    print(f"Warning: Failed to create PIL image from xref {xref}: {e}")
-                    continue
 
-                # flatten alpha → white background
-                if mode == "RGBA":
-                    bg = Image.new("RGB", pil.size, "white")
-                    bg.paste(pil, mask=pil.split()[-1])
-                    pil = bg
-
-                # optional grayscale
-                if force_grayscale and pil.mode != "L":
-                    pil = pil.convert("L")
-
-                # ---------- adaptive down-sampling ----------
-                scale = 1.0
-                if target_dpi and getattr(pix, "xres", 0) > target_dpi > 0:
-                    scale = target_dpi / pix.xres
-
-                if max(pil.size) * scale > max_dim_px:
-                    scale = max_dim_px / max(pil.size)
-
-                if scale < 1.0:  # resize only if we're shrinking
-                    new_size = (int(pil.width * scale), int(pil.height * scale))
-                    # Ensure dimensions are at least 1 pixel
-                    new_size = (max(1, new_size[0]), max(1, new_size[1]))
-                    pil = pil.resize(new_size, Image.LANCZOS)
-
-                # ---------- JPEG re-encode ----------
-                buf = io.BytesIO()
-                pil.save(buf, format="JPEG", quality=jpeg_quality, optimize=True)
-                page.replace_image(xref, stream=buf.getvalue())
-                buf.close()
-
-            except Exception as e:
-                print(f"Warning: Failed to process image at xref {xref}: {e}")
+def _unique_images(doc: fitz.Document) -> list[tuple[int, int]]:
+    """(xref, raw stream size) of every distinct image, largest first."""
+    images = {}
+    for page in doc:
+        for img in page.get_images(full=True):
+            xref, smask = img[0], img[1]
+            if xref in images.values():
                 continue
+            images.setdefault(_image_digest(doc, xref, smask), xref)
+    return sorted(
+        ((xref, len(doc.xref_stream_raw(xref) or b"")) for xref in images.values()),
+        key=lambda image: image[1],
+        reverse=True,
+    )
+
+
+@dataclass
+class PdfProfile:
+    pages: int
+    images: int  # distinct embedded images
+    text_chars: int  # text PyMuPDF can extract, i.e. not scanned
+
+
+def _profile_document(data: bytes | memoryview) -> PdfProfile:
+    doc = fitz.open(stream=data, filetype="pdf")
+    try:
+        return PdfProfile(
+            pages=doc.page_count,
+            images=len(_unique_images(doc)),
+            text_chars=sum(len(page.get_text()) for page in doc),
+        )
+    finally:
+        doc.close()
+
+
+def pdf_profile(pdf: PdfSource) -> PdfProfile:
+    """Page, image and text counts of a PDF, worked out once per PdfDocument."""
+    document = PdfDocument.load(pdf)
+    return document.payload("profile", lambda: _profile_document(document.data))
+
+
+def _estimate_budget_ladder(
+    sample: list,
+    sample_raw: int,
+    total_raw: int,
+    non_image_bytes: int,
+    target_bytes: int,
+    target_dpi: int | None,
+    force_grayscale: bool,
+) -> int:
+    """Bisect BUDGET_LADDER for the first step whose estimated size fits.
+
+    The estimate re-encodes only the sampled images and scales their output
+    by the raw image bytes they stand for.
+    """
+    scale = total_raw / sample_raw if sample_raw else 1.0
+
+    def estimate(index: int) -> float:
+        max_dim_px, jpeg_quality = BUDGET_LADDER[index]
+        encoded = sum(
+            len(
+                _recompress_image(
+                    job, target_dpi, max_dim_px, jpeg_quality, force_grayscale
+                )[1]
+                or b""
+            )
+            for job in sample
+        )
+        return non_image_bytes + encoded * scale
+
+    lo, hi = 0, len(BUDGET_LADDER) - 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if estimate(mid) <= target_bytes:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+def compress_pdf_to_budget(
+    pdf: PdfSource,
+    *,
+    target_bytes: int | None = None,
+    target_bytes_per_page: int | None = None,
+    target_dpi: int | None = None,
+    force_grayscale: bool = False,
+    sample_size: int = 8,
+    workers: int | None = 1,
+) -> tuple[bytes, dict]:
+    """
+    Compress a PDF with the highest-fidelity settings that fit a size budget.
+
+    The budget is either an absolute target_bytes or target_bytes_per_page
+    (multiplied by the page count). Papers that already fit once metadata,
+    attachments and annotations are stripped keep their images untouched.
+    Otherwise BUDGET_LADDER is bisected using a size estimate built from
+    re-encoding a sample of the images (spread across the size range), and
+    the pick is confirmed with a full compression, stepping further down the
+    ladder if the estimate was optimistic.
+
+    Returns the compressed bytes and a report with the chosen max_dim_px /
+    jpeg_quality (None when no recompression was needed), the output size
+    and its ratio to the input, whether the budget was met, and the image
+    counts from compress_pdf.
+    """
+    if target_bytes is None and target_bytes_per_page is None:
+        raise ValueError("Either target_bytes or target_bytes_per_page is required")
+
+    data = PdfDocument.load(pdf).data
+    doc = fitz.open(stream=data, filetype="pdf")
+    try:
+        if target_bytes is None:
+            target_bytes = target_bytes_per_page * doc.page_count
+        _prune_document(doc)
+        baseline = doc.tobytes(**SAVE_OPTIONS)
+        images = _unique_images(doc)
+        lossless = not images or len(baseline) <= target_bytes
+
+        sample = []
+        if not lossless:
+            step = max(1, len(images) // max(1, sample_size))
+            for xref, _ in images[::step][:sample_size]:
+                job = _extract_image_job(doc, xref)
+                if job is not None:
+                    sample.append(job)
+    finally:
+        doc.close()
+
+    report = {
+        "target_bytes": target_bytes,
+        "input_bytes": len(data),
+        "target_dpi": target_dpi,
+        "max_dim_px": None,
+        "jpeg_quality": None,
+        "full_passes": 0,
+    }
+    output = baseline
+    if not lossless:
+        raw_sizes = dict(images)
+        start = _estimate_budget_ladder(
+            sample,
+            sample_raw=sum(raw_sizes[job[0]] for job in sample),
+            total_raw=sum(raw_sizes.values()),
+            non_image_bytes=max(0, len(baseline) - sum(raw_sizes.values())),
+            target_bytes=target_bytes,
+            target_dpi=target_dpi,
+            force_grayscale=force_grayscale,
+        )
+        for max_dim_px, jpeg_quality in BUDGET_LADDER[start:]:
+            doc = fitz.open(stream=data, filetype="pdf")
+            try:
+                stats = _compress_document(
+                    doc,
+                    target_dpi=target_dpi,
+                    max_dim_px=max_dim_px,
+                    jpeg_quality=jpeg_quality,
+                    force_grayscale=force_grayscale,
+                    workers=workers,
+                )
+                output = doc.tobytes(**SAVE_OPTIONS)
             finally:
-                # Always free C resources
-                if "pix" in locals():
-                    pix = None
+                doc.close()
+            report["full_passes"] += 1
+            if len(output) <= target_bytes:
+                break
+        report.update(stats, max_dim_px=max_dim_px, jpeg_quality=jpeg_quality)
 
-    # ---------- final save ----------
-    doc.save(
-        output_path,
-        garbage=4,  # remove unused & compress object streams
-        deflate=True,  # lossless deflate of font & content streams
-        incremental=False,
+    report.update(
+        output_bytes=len(output),
+        ratio=len(output) / len(data),
+        fits=len(output) <= target_bytes,
     )
-    doc.close()
+    return output, report
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Pre-flight estimates of what generating a paper's script will cost.
+
+Token counts come from the paper itself (pages, extracted text, figures) and
+the providers' billing rules, or optionally from Gemini's count_tokens
+endpoint; cost and latency per stage then follow from the price tables and
+model_policy's profiles. Nothing is generated, so batch jobs can screen
+papers before spending anything on them:
+
+    python -m podcaist.preflight --model gemini-2.5-pro --max-cost 0.25 a.pdf b.pdf
+"""
+
+import argparse
+from dataclasses import dataclass
+
+from podcaist.gemini_request import count_gemini_tokens
+from podcaist.model_garden import (
+    PaperInput,
+    estimate_paper_tokens,
+    get_gemini_paper_parts,
+    get_provider,
+    prepare_pdf_input,
+)
+from podcaist.model_policy import (
+    Budget,
+    StageEstimate,
+    estimate_plan,
+    plan_cost,
+    plan_latency,
+    resolve_stage_models,
+    within_budget,
+)
+from podcaist.utils import PdfDocument, PdfSource
+
+OVER_BUDGET_ACTIONS = ("reject", "downgrade")
+
+
+@dataclass
+class PaperPlan:
+    paper_tokens: int
+    stages: dict[str, StageEstimate]
+
+    @property
+    def models(self) -> dict[str, str]:
+        return {stage: estimate.model for stage, estimate in self.stages.items()}
+
+    @property
+    def cost(self) -> float:
+        return plan_cost(self.stages)
+
+    @property
+    def latency_seconds(self) -> float:
+        return plan_latency(self.stages)
+
+    def fits(self, budget: Budget) -> bool:
+        return within_budget(self.stages, budget)
+
+    def report(self) -> str:
+        lines = [
+            f"{'stage':<14} {'model':<26} {'in tok':>8} {'out tok':>8} {'cost $':>8} {'latency s':>10}"
+        ]
+        for stage, estimate in self.stages.items():
+            lines.append(
+                f"{stage:<14} {estimate.model:<26} {estimate.input_tokens:>8} "
+                f"{estimate.output_tokens:>8} {estimate.cost:>8.4f} "
+                f"{estimate.latency_seconds:>10.1f}"
+            )
+        # paper tokens, and the analysis stages overlap so latency is less than the sum
+        lines.append(
+            f"{'total':<14} {'':<26} {self.paper_tokens:>8} {'':>8} "
+            f"{self.cost:>8.4f} {self.latency_seconds:>10.1f}"
+        )
+        return "\n".join(lines)
+
+
+def count_paper_tokens(
+    paper: PaperInput,
+    model: str,
+    api_key: str | None = None,
+    use_token_api: bool = False,
+) -> int:
+    """
+    Input tokens of the paper for model.
+
+    Estimated locally from the paper unless use_token_api is set and model is
+    a Gemini model, in which case Gemini's count_tokens endpoint is asked
+    (it receives the paper but generates nothing). OpenAI has no counting
+    endpoint for PDFs, so its models are always estimated.
+    """
+    provider = get_provider(model)
+    if use_token_api and provider == "google":
+        try:
+            return count_gemini_tokens(
+                get_gemini_paper_parts(paper, api_key=api_key), model, api_key=api_key
+            )
+        except Exception as e:
+            print(f"Warning: Could not count tokens with Gemini, estimating instead: {e}")
+    return estimate_paper_tokens(paper, provider)
+
+
+def plan_paper(
+    pdf: PdfSource,
+    model: str,
+    stage_models: dict[str, str] | None = None,
+    budget: Budget | None = None,
+    pdf_input_mode: str = "pdf",
+    api_key: str | None = None,
+    use_token_api: bool = False,
+) -> PaperPlan:
+    """
+    Estimated tokens, cost and latency of every stage of
+    generate_podcast_script for pdf, with models assigned the way that run
+    would assign them (see model_policy.resolve_stage_models).
+    """
+    paper = prepare_pdf_input(PdfDocument.load(pdf), pdf_input_mode)
+    paper_tokens = count_paper_tokens(paper, model, api_key, use_token_api)
+    models = resolve_stage_models(model, stage_models, budget, paper_tokens=paper_tokens)
+    return PaperPlan(paper_tokens, estimate_plan(models, paper_tokens))
+
+
+def screen_papers(
+    pdfs: list[str],
+    model: str,
+    budget: Budget,
+    over_budget: str = "downgrade",
+    stage_models: dict[str, str] | None = None,
+    pdf_input_mode: str = "pdf",
+    api_key: str | None = None,
+    use_token_api: bool = False,
+) -> dict[str, PaperPlan | None]:
+    """
+    Plan every paper of a batch against a per-paper budget before any of
+    them is generated.
+
+    A paper that fits on model (and stage_models) keeps that plan. One that
+    does not is rejected (None) with over_budget="reject"; with "downgrade"
+    it gets the cheaper per-stage models model_policy picks for the budget,
+    and is rejected only if even those do not fit.
+    """
+    if over_budget not in OVER_BUDGET_ACTIONS:
+        raise ValueError(
+            f"Invalid over_budget {over_budget}, expected one of {OVER_BUDGET_ACTIONS}"
+        )
+    plans = {}
+    for pdf in pdfs:
+        plan = plan_paper(
+            pdf,
+            model,
+            stage_models,
+            pdf_input_mode=pdf_input_mode,
+            api_key=api_key,
+            use_token_api=use_token_api,
+        )
+        if not plan.fits(budget) and over_budget == "downgrade":
+            models = resolve_stage_models(
+                model, stage_models, budget, paper_tokens=plan.paper_tokens
+            )
+            downgraded = PaperPlan(plan.paper_tokens, estimate_plan(models, plan.paper_tokens))
+            if downgraded.fits(budget):
+                print(
+                    f"Warning: {pdf} is over budget on {model} "
+                    f"(${plan.cost:.4f}, {plan.latency_seconds:.0f}s), "
+                    f"downgraded to {downgraded.models}"
+                )
+                plan = downgraded
+        if not plan.fits(budget):
+            print(
+                f"Warning: Rejecting {pdf}, estimated at ${plan.cost:.4f} and "
+                f"{plan.latency_seconds:.0f}s against {budget}"
+            )
+            plan = None
+        plans[pdf] = plan
+    return plans
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("pdfs", nargs="+", help="Papers to plan")
+    parser.add_argument("--model", type=str, default="gemini-2.5-pro")
+    parser.add_argument("--max-cost", type=float, default=None, help="USD per paper")
+    parser.add_argument("--max-latency", type=float, default=None, help="Seconds per paper")
+    parser.add_argument(
+        "--over-budget", choices=OVER_BUDGET_ACTIONS, default="downgrade"
+    )
+    parser.add_argument("--pdf-input-mode", type=str, default="pdf")
+    parser.add_argument(
+        "--use-token-api",
+        action="store_true",
+        help="Count tokens with Gemini's count_tokens endpoint instead of estimating",
+    )
+    args = parser.parse_args()
+
+    budget = Budget(max_cost=args.max_cost, max_latency_seconds=args.max_latency)
+    plans = screen_papers(
+        args.pdfs,
+        args.model,
+        budget,
+        over_budget=args.over_budget,
+        pdf_input_mode=args.pdf_input_mode,
+        use_token_api=args.use_token_api,
+    )
+    for pdf, plan in plans.items():
+        print(f"\n{pdf}")
+        print(plan.report() if plan is not None else "rejected")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+
+# Requests in flight at once per provider, across every stage of every paper.
+SEM_LIMIT = int(os.getenv("PODCAIST_MAX_CONCURRENT_REQUESTS", 10))
+
+WINDOW_SECONDS = 60.0
+# How often a request blocked only on concurrency re-checks for a free slot.
+POLL_SECONDS = 0.05
+
+
+@dataclass
+class Limits:
+    """Throughput allowed for a provider or a model; None means unlimited."""
+
+    max_concurrent: int | None = None
+    requests_per_minute: int | None = None
+    tokens_per_minute: int | None = None
+
+
+# Defaults sized for OpenAI usage tier 2 and Gemini tier 1; change them with
+# RateLimiter.set_limits for accounts with less or more headroom.
+PROVIDER_LIMITS = {
+    "openai": Limits(max_concurrent=SEM_LIMIT),
+    "google": Limits(max_concurrent=SEM_LIMIT),
+}
+
+MODEL_LIMITS = {
+    "gpt-4o-mini-2024-07-18": Limits(requests_per_minute=5000, tokens_per_minute=2_000_000),
+    "gpt-4.1-2025-04-14": Limits(requests_per_minute=5000, tokens_per_minute=450_000),
+    "o3-2025-04-16": Limits(requests_per_minute=5000, tokens_per_minute=450_000),
+    "o3-mini-2025-01-31": Limits(requests_per_minute=2000, tokens_per_minute=2_000_000),
+    "gemini-2.5-pro": Limits(requests_per_minute=150, tokens_per_minute=2_000_000),
+    "gemini-2.5-flash": Limits(requests_per_minute=1000, tokens_per_minute=1_000_000),
+    "gemini-2.0-flash-001": Limits(requests_per_minute=2000, tokens_per_minute=4_000_000),
+    "gemini-2.0-flash-lite-001": Limits(
+        requests_per_minute=4000, tokens_per_minute=4_000_000
+    ),
+}
+
+
+class _Window:
+    """Requests admitted under one Limits over the last WINDOW_SECONDS."""
+
+    def __init__(self, limits: Limits):
+        self.limits = limits
+        self.in_flight = 0
+        self.admitted: deque[tuple[float, int]] = deque()  # (time, tokens)
+        self.tokens = 0
+
+    def _expire(self, now: float) -> None:
+        while self.admitted and now - self.admitted[0][0] >= WINDOW_SECONDS:
+            self.tokens -= self.admitted.popleft()[1]
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        """Seconds until a request of tokens fits, 0 if it fits now."""
+        self._expire(now)
+        limits = self.limits
+        wait = 0.0
+        if limits.max_concurrent is not None and self.in_flight >= limits.max_concurrent:
+            wait = POLL_SECONDS
+        if (
+            limits.requests_per_minute is not None
+            and len(self.admitted) >= limits.requests_per_minute
+        ):
+            wait = max(wait, self.admitted[0][0] + WINDOW_SECONDS - now)
+        if limits.tokens_per_minute is not None and self.admitted:
+            # a request larger than the whole budget goes through on an empty window
+            excess = self.tokens + tokens - limits.tokens_per_minute
+            for admitted_at, admitted_tokens in self.admitted:
+                if excess <= 0:
+                    break
+                excess -= admitted_tokens
+                wait = max(wait, admitted_at + WINDOW_SECONDS - now)
+        return wait
+
+    def admit(self, tokens: int, now: float) -> None:
+        self.in_flight += 1
+        self.admitted.append((now, tokens))
+        self.tokens += tokens
+
+
+class RateLimiter:
+    """
+    Admission control for provider requests, shared by sync and async callers.
+
+    A request waits until both its provider's and its model's windows have
+    room for it: a free concurrency slot, a request under the requests per
+    minute limit and its estimated tokens under the tokens per minute limit.
+    State is guarded by a thread lock rather than asyncio primitives, so one
+    limiter covers every thread and event loop in the process.
+    """
+
+    def __init__(
+        self,
+        provider_limits: dict[str, Limits] | None = None,
+        model_limits: dict[str, Limits] | None = None,
+    ):
+        self._lock = threading.Lock()
+        self._windows: dict[str, _Window] = {}
+        self._limits = {
+            **{f"provider:{name}": limits for name, limits in (provider_limits or {}).items()},
+            **{f"model:{name}": limits for name, limits in (model_limits or {}).items()},
+        }
+        self.requests = 0
+        self.delayed = 0
+        self.wait_seconds = 0.0
+
+    def set_limits(
+        self, limits: Limits, provider: str | None = None, model: str | None = None
+    ) -> None:
+        """Replace the limits for a provider or a model."""
+        key = f"provider:{provider}" if provider else f"model:{model}"
+        with self._lock:
+            self._limits[key] = limits
+            if key in self._windows:
+                self._windows[key].limits = limits
+
+    def _windows_for(self, provider: str, model: str) -> list[_Window]:
+        windows = []
+        for key in (f"provider:{provider}", f"model:{model}"):
+            if key not in self._limits:
+                continue
+            if key not in self._windows:
+                self._windows[key] = _Window(self._limits[key])
+            windows.append(self._windows[key])
+        return windows
+
+    def _try_acquire(self, provider: str, model: str, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            windows = self._windows_for(provider, model)
+            wait = max((window.wait_time(tokens, now) for window in windows), default=0.0)
+            if wait == 0:
+                for window in windows:
+                    window.admit(tokens, now)
+            return wait
+
+    def _release(self, provider: str, model: str) -> None:
+        with self._lock:
+            for window in self._windows_for(provider, model):
+                window.in_flight -= 1
+
+    def _record(self, waited: float) -> None:
+        with self._lock:
+            self.requests += 1
+            if waited > 0:
+                self.delayed += 1
+                self.wait_seconds += waited
+
+    @contextmanager
+    def limit(self, provider: str, model: str, tokens: int):
+        waited = 0.0
+        while (wait := self._try_acquire(provider, model, tokens)) > 0:
+            time.sleep(wait)
+            waited += wait
+        self._record(waited)
+        try:
+            yield
+        finally:
+            self._release(provider, model)
+
+    @asynccontextmanager
+    async def limit_async(self, provider: str, model: str, tokens: int):
+        waited = 0.0
+        while (wait := self._try_acquire(provider, model, tokens)) > 0:
+            await asyncio.sleep(wait)
+            waited += wait
+        self._record(waited)
+        try:
+            yield
+        finally:
+            self._release(provider, model)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "delayed": self.delayed,
+            "wait_seconds": round(self.wait_seconds, 3),
+        }
@@ -0,0 +1,43 @@
+import json
+import os
+from typing import Any
+
+from podcaist.disk_cache import DiskCache, default_cache_dir
+
+# Model responses keyed by everything that determines them (see
+# model_garden.response_cache_key). Reruns of a paper/model pair, e.g. with
+# new custom_instructions, only pay for the calls whose prompt changed.
+RESPONSE_CACHE = DiskCache(
+    os.path.join(default_cache_dir(), "responses"),
+    max_bytes=int(os.getenv("PODCAIST_RESPONSE_CACHE_MAX_BYTES", 256 * 1024**2)),
+    suffix=".json",
+    max_age_seconds=float(
+        os.getenv("PODCAIST_RESPONSE_CACHE_MAX_AGE", 30 * 24 * 3600)
+    ),
+)
+
+
+def response_cache_enabled() -> bool:
+    """False when PODCAIST_NO_RESPONSE_CACHE=1 bypasses the cache."""
+    return os.getenv("PODCAIST_NO_RESPONSE_CACHE", "") in ("", "0")
+
+
+def get_cached_response(key: str) -> str | dict | None:
+    data = RESPONSE_CACHE.get_bytes(key)
+    if data is None:
+        return None
+    try:
+        return json.loads(data)["response"]
+    except (ValueError, KeyError):  # truncated or foreign file
+        return None
+
+
+def put_cached_response(key: str, response: Any) -> None:
+    try:
+        payload = json.dumps({"response": response}).encode("utf-8")
+    except TypeError:  # not JSON-serialisable, don't cache it
+        return
+    try:
+        RESPONSE_CACHE.put_bytes(key, payload)
+    except OSError as e:
+        print(f"Warning: Could not write response cache entry: {e}")
@@ -1,5 +1,16 @@
 from podcaist.model_garden import generate_text_response, generate_text_response_async
-from podcaist.utils import format_contributions
+from podcaist.utils import PdfSource, format_contributions
+
+# The results stage mostly reads the experiments and their tables.
+SECTION_KEYWORDS = (
+    "experiment",
+    "result",
+    "evaluation",
+    "benchmark",
+    "ablation",
+    "analysis",
+    "comparison",
+)
 
 prompt = """Attached is a pdf of a research paper. Here are what I think the main contributions are \
 from the paper. I want you to dive into the results and answer the question of whether the results \
@@ -14,7 +25,7 @@ Here are the contributions listed:
 
 
 def results(
-    pdf_file_path: str, contributions: list[str], model: str = "gpt-4o-mini-2024-07-18", api_key: str | None = None
+    pdf_file_path: PdfSource, contributions: list[str], model: str = "gpt-4o-mini-2024-07-18", api_key: str | None = None
 ) -> str:
     formatted_contributions = format_contributions(contributions)
     input = [
@@ -30,12 +41,14 @@ def results(
 
 
 async def results_async(
-    pdf_file_path: str, contributions: list[str], model: str = "gpt-4o-mini-2024-07-18", api_key: str | None = None
+    pdf_file_path: PdfSource, contributions: list[str], model: str = "gpt-4o-mini-2024-07-18", api_key: str | None = None
 ) -> str:
     formatted_contributions = format_contributions(contributions)
     input = [
         ("pdf", pdf_file_path),
         ("text", prompt.format(contributions=formatted_contributions)),
     ]
-    response = await generate_text_response_async(input, model, api_key=api_key)
+    response = await generate_text_response_async(
+        input, model, api_key=api_key, stage="results"
+    )
     return response
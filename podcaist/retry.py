@@ -0,0 +1,243 @@
+import asyncio
+import email.utils
+import functools
+import inspect
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import httpx
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 6
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+    # total seconds one call may spend sleeping between attempts
+    budget_seconds: float = 300.0
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+_lock = threading.Lock()
+# (provider, "retries" | "gave_up" | "recovered") → count
+RETRY_STATS: Counter = Counter()
+
+
+def _record(provider: str, event: str) -> None:
+    with _lock:
+        RETRY_STATS[(provider, event)] += 1
+
+
+def retry_stats() -> dict:
+    with _lock:
+        return {f"{provider}.{event}": count for (provider, event), count in RETRY_STATS.items()}
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """Seconds from a Retry-After header: delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+def _headers_retry_after(headers) -> float | None:
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")  # OpenAI sends this too
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    return _parse_retry_after(headers.get("retry-after"))
+
+
+def _network_error(error: BaseException) -> bool:
+    if isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return True
+    try:
+        import requests
+    except ImportError:
+        return False
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+def _classify_openai(error: BaseException) -> tuple[bool, float | None]:
+    import openai
+
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True, None
+    if isinstance(error, openai.APIStatusError):
+        return (
+            error.status_code in RETRYABLE_STATUS,
+            _headers_retry_after(error.response.headers),
+        )
+    return _network_error(error), None
+
+
+def _gemini_retry_delay(error) -> float | None:
+    """RetryInfo.retryDelay ("37s") from a Gemini error body, if present."""
+    details = getattr(error, "details", None)
+    if not isinstance(details, dict):
+        return None
+    for detail in details.get("error", {}).get("details", []) or []:
+        delay = isinstance(detail, dict) and detail.get("retryDelay")
+        match = delay and re.fullmatch(r"([\d.]+)s", delay)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def _classify_gemini(error: BaseException) -> tuple[bool, float | None]:
+    from google.genai import errors
+
+    if isinstance(error, errors.APIError):
+        response = getattr(error, "response", None)
+        retry_after = _gemini_retry_delay(error) or _headers_retry_after(
+            getattr(response, "headers", None)
+        )
+        return error.code in RETRYABLE_STATUS, retry_after
+    return _network_error(error), None
+
+
+def _classify_http(error: BaseException) -> tuple[bool, float | None]:
+    """Errors from plain HTTP clients (requests / httpx) and the ElevenLabs SDK."""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status is not None:
+        headers = getattr(error, "headers", None) or getattr(response, "headers", None)
+        return status in RETRYABLE_STATUS, _headers_retry_after(headers)
+    return _network_error(error), None
+
+
+CLASSIFIERS: dict[str, Callable[[BaseException], tuple[bool, float | None]]] = {
+    "openai": _classify_openai,
+    "google": _classify_gemini,
+    "inworld": _classify_http,
+    "elevenlabs": _classify_http,
+}
+
+
+class _Backoff:
+    """Decorrelated jitter delays, bounded by the policy's time budget."""
+
+    def __init__(self, provider: str, policy: RetryPolicy):
+        self.provider = provider
+        self.policy = policy
+        self.attempt = 0
+        self.slept = 0.0
+        self.delay = policy.base_delay
+
+    def next_delay(self, error: BaseException) -> float | None:
+        """Seconds to wait before retrying error, or None to give up."""
+        self.attempt += 1
+        retryable, retry_after = CLASSIFIERS[self.provider](error)
+        if not retryable or self.attempt >= self.policy.max_attempts:
+            return None
+        self.delay = min(
+            self.policy.max_delay,
+            random.uniform(self.policy.base_delay, self.delay * 3),
+        )
+        delay = max(self.delay, retry_after or 0.0)
+        if self.slept + delay > self.policy.budget_seconds:
+            return None
+        self.slept += delay
+        _record(self.provider, "retries")
+        print(
+            f"Warning: {self.provider} call failed ({type(error).__name__}: {error}), "
+            f"retry {self.attempt} in {delay:.1f}s"
+        )
+        return delay
+
+
+def call_with_retry(
+    provider: str,
+    function: Callable,
+    *args,
+    policy: RetryPolicy = DEFAULT_POLICY,
+    **kwargs,
+) -> Any:
+    backoff = _Backoff(provider, policy)
+    while True:
+        try:
+            result = function(*args, **kwargs)
+        except Exception as e:
+            delay = backoff.next_delay(e)
+            if delay is None:
+                if backoff.attempt > 1:
+                    _record(provider, "gave_up")
+                raise
+            time.sleep(delay)
+        else:
+            if backoff.attempt:
+                _record(provider, "recovered")
+            return result
+
+
+async def call_with_retry_async(
+    provider: str,
+    function: Callable,
+    *args,
+    policy: RetryPolicy = DEFAULT_POLICY,
+    **kwargs,
+) -> Any:
+    backoff = _Backoff(provider, policy)
+    while True:
+        try:
+            result = await function(*args, **kwargs)
+        except Exception as e:
+            delay = backoff.next_delay(e)
+            if delay is None:
+                if backoff.attempt > 1:
+                    _record(provider, "gave_up")
+                raise
+            await asyncio.sleep(delay)
+        else:
+            if backoff.attempt:
+                _record(provider, "recovered")
+            return result
+
+
+def single_attempt(function: Callable) -> Callable:
+    """The function under a with_retries decorator, which makes one attempt
+    per call, for callers that wrap each attempt and retry it themselves."""
+    return getattr(function, "__wrapped__", function)
+
+
+def with_retries(provider: str, policy: RetryPolicy = DEFAULT_POLICY) -> Callable:
+    """Decorator form of call_with_retry(_async) for sync or async functions."""
+
+    def decorator(function: Callable) -> Callable:
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                return await call_with_retry_async(
+                    provider, function, *args, policy=policy, **kwargs
+                )
+
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            return call_with_retry(provider, function, *args, policy=policy, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,69 @@
+import asyncio
+import copy
+import threading
+import weakref
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the call; callers arriving while it is in
+    flight wait for it and receive (a deep copy of) the same result or
+    exception. Sync callers coalesce across threads, async callers within
+    their event loop.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._sync: dict[str, Future] = {}
+        self._async: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def run(self, key: str, call: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._sync.get(key)
+            leader = future is None
+            if leader:
+                future = self._sync[key] = Future()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return copy.deepcopy(future.result())
+
+        try:
+            result = call()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._sync[key]
+
+    async def run_async(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        with self._lock:
+            in_flight = self._async.setdefault(asyncio.get_running_loop(), {})
+            task = in_flight.get(key)
+            leader = task is None
+            if leader:
+                task = in_flight[key] = asyncio.ensure_future(call())
+                task.add_done_callback(lambda _: in_flight.pop(key, None))
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        # shielded so one waiter being cancelled does not cancel the call for
+        # everyone else sharing it
+        result = await asyncio.shield(task)
+        return result if leader else copy.deepcopy(result)
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "coalesced": self.coalesced}
@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Callable
+
+from podcaist.utils import sha256_bytes
+
+
+def account_fingerprint(api_key: str | None) -> str:
+    """Short, non-reversible tag for the account an upload belongs to."""
+    return sha256_bytes(api_key.encode("utf-8"))[:16] if api_key else "default"
+
+
+class UploadIndex:
+    """
+    Persistent map from a content key to the id of a file already uploaded
+    to a provider, so each document is uploaded once per account.
+
+    Entries older than max_age_seconds are treated as gone (for providers
+    that expire uploads). Entries last confirmed more than
+    validate_after_seconds ago are checked with the validate callback on
+    their next use and dropped if the provider no longer has the file.
+    Lookups for the same key are serialised, so concurrent requests for one
+    document share a single upload.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_age_seconds: float | None = None,
+        validate_after_seconds: float | None = None,
+    ):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self.validate_after_seconds = validate_after_seconds
+        self.uploads = 0
+        self.reuses = 0
+        self._lock = threading.Lock()
+        self._key_locks: dict[str, threading.Lock] = {}
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _update(self, key: str, entry: dict | None) -> None:
+        """Re-read, change one entry and write back atomically, so processes
+        sharing the file only ever overwrite each other's entry for key."""
+        with self._lock:
+            entries = self._read()
+            if entry is None:
+                entries.pop(key, None)
+            else:
+                entries[key] = entry
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(self.path) or ".", suffix=".tmp"
+            )
+            with os.fdopen(fd, "w") as f:
+                json.dump(entries, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, key: str) -> dict | None:
+        entry = self._read().get(key)
+        if entry is None:
+            return None
+        if (
+            self.max_age_seconds is not None
+            and time.time() - entry["uploaded_at"] > self.max_age_seconds
+        ):
+            return None
+        return entry
+
+    def discard(self, key: str) -> None:
+        self._update(key, None)
+
+    def get_or_upload(
+        self,
+        key: str,
+        upload: Callable[[], str],
+        validate: Callable[[str], bool] | None = None,
+    ) -> str:
+        """File id for key, calling upload() only if no usable entry exists."""
+        with self._key_lock(key):
+            entry = self.get(key)
+            if entry is not None:
+                now = time.time()
+                stale = (
+                    validate is not None
+                    and self.validate_after_seconds is not None
+                    and now - entry["checked_at"] > self.validate_after_seconds
+                )
+                if not stale:
+                    self.reuses += 1
+                    return entry["file_id"]
+                if validate(entry["file_id"]):
+                    self._update(key, {**entry, "checked_at": now})
+                    self.reuses += 1
+                    return entry["file_id"]
+
+            file_id = upload()
+            now = time.time()
+            self._update(key, {"file_id": file_id, "uploaded_at": now, "checked_at": now})
+            self.uploads += 1
+            return file_id
+
+    def stats(self) -> dict:
+        return {"uploads": self.uploads, "reuses": self.reuses}
@@ -0,0 +1,32 @@
+import threading
+from collections import Counter
+
+_lock = threading.Lock()
+# model → counts of requests, input_tokens, cached_tokens, output_tokens
+# (output includes thinking tokens)
+TOKEN_USAGE: dict[str, Counter] = {}
+
+
+def record_usage(
+    model: str,
+    input_tokens: int | None,
+    cached_tokens: int | None = None,
+    output_tokens: int | None = None,
+) -> None:
+    with _lock:
+        usage = TOKEN_USAGE.setdefault(model, Counter())
+        usage["requests"] += 1
+        usage["input_tokens"] += input_tokens or 0
+        usage["cached_tokens"] += cached_tokens or 0
+        usage["output_tokens"] += output_tokens or 0
+
+
+def token_usage() -> dict[str, dict[str, int]]:
+    """Tokens reported by the providers so far, per model."""
+    with _lock:
+        return {model: dict(usage) for model, usage in TOKEN_USAGE.items()}
+
+
+def reset_usage() -> None:
+    with _lock:
+        TOKEN_USAGE.clear()
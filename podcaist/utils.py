@@ -1,6 +1,74 @@
 import base64
+import hashlib
 import json
-from typing import List
+import mmap
+import os
+import tempfile
+import threading
+from functools import cached_property
+from typing import Any, Callable, List
+
+# Files at least this large are memory-mapped instead of read into memory.
+MMAP_THRESHOLD_BYTES = int(os.getenv("PODCAIST_MMAP_THRESHOLD_BYTES", 16 * 1024**2))
+
+
+class PdfDocument:
+    """
+    A paper loaded once for a whole run and shared by every stage.
+
+    The file is read a single time (memory-mapped from MMAP_THRESHOLD_BYTES
+    up), its hash is computed on first use, and payloads derived from it —
+    the bytes object SDKs want, inline parts, upload ids, base64 — are built
+    once per key with payload() and reused by later requests.
+    """
+
+    def __init__(self, data: bytes | memoryview, path: str | None = None):
+        self.data = data
+        self.path = path
+        self._payloads: dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._key_locks: dict[str, threading.Lock] = {}
+
+    @classmethod
+    def load(cls, pdf: "PdfSource") -> "PdfDocument":
+        if isinstance(pdf, PdfDocument):
+            return pdf
+        if isinstance(pdf, (bytes, memoryview)):
+            return cls(pdf)
+        if os.path.getsize(pdf) >= MMAP_THRESHOLD_BYTES:
+            with open(pdf, "rb") as f:
+                # the mapping stays valid after the file is closed
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return cls(memoryview(mapped), path=pdf)
+        return cls(read_pdf_file_bytes(pdf), path=pdf)
+
+    def __len__(self) -> int:
+        return self.data.nbytes if isinstance(self.data, memoryview) else len(self.data)
+
+    @cached_property
+    def sha256(self) -> str:
+        return hashlib.sha256(self.data).hexdigest()
+
+    def payload(self, key: str, build: Callable[[], Any]) -> Any:
+        """build() the first time key is asked for, the stored result after.
+        Concurrent callers for one key wait for a single build."""
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self._payloads:
+                self._payloads[key] = build()
+            return self._payloads[key]
+
+    def tobytes(self) -> bytes:
+        """The document as bytes, copied out of a memory map at most once."""
+        if isinstance(self.data, bytes):
+            return self.data
+        return self.payload("bytes", self.data.tobytes)
+
+
+# A PDF handed to the pipeline: a path on disk, the document's bytes, or a
+# PdfDocument loaded once for the run.
+PdfSource = str | bytes | memoryview | PdfDocument
 
 
 def format_contributions(contributions: list[str]) -> str:
@@ -9,9 +77,11 @@ def format_contributions(contributions: list[str]) -> str:
     return "\n".join(f"- {contribution.strip()}" for contribution in contributions)
 
 
-def convert_pdf_to_base64(pdf_path: str) -> str:
-    with open(pdf_path, "rb") as pdf_file:
-        return base64.b64encode(pdf_file.read()).decode("utf-8")
+def convert_pdf_to_base64(pdf: PdfSource) -> str:
+    document = PdfDocument.load(pdf)
+    return document.payload(
+        "base64", lambda: base64.b64encode(document.data).decode("utf-8")
+    )
 
 
 def read_json_file(file_path: str) -> dict:
@@ -41,7 +111,20 @@ def format_podcast(sections: tuple[str, str]) -> str:
 def read_pdf_file_bytes(file_path: str) -> bytes:
     with open(file_path, "rb") as f:
         return f.read()
-    
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(file_path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def split_text_at_line_breaks(text: str, max_length: int = 3000) -> List[str]:
     """Split text into chunks at line breaks, ensuring no chunk exceeds max_length."""
     if len(text) <= max_length:
@@ -61,4 +144,29 @@ def split_text_at_line_breaks(text: str, max_length: int = 3000) -> List[str]:
     if current_chunk:
         chunks.append(current_chunk.strip())
 
-    return chunks
\ No newline at end of file
+    return chunks
+
+
+def combine_mp3_files(file_paths: List[str]) -> str:
+    """Concatenate mp3 files in order into a new temp file and delete the parts.
+
+    A single file is returned as is.
+    """
+    if not file_paths:
+        raise ValueError("No mp3 files to combine")
+    if len(file_paths) == 1:
+        return file_paths[0]
+
+    from pydub import AudioSegment
+
+    combined = AudioSegment.from_mp3(file_paths[0])
+    for file_path in file_paths[1:]:
+        combined += AudioSegment.from_mp3(file_path)
+
+    final_temp_file = tempfile.NamedTemporaryFile(suffix=".mp3", delete=False)
+    combined.export(final_temp_file.name, format="mp3")
+
+    for file_path in file_paths:
+        os.unlink(file_path)
+
+    return final_temp_file.name